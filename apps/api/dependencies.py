@@ -8,5 +8,9 @@ sys.path.insert(0, str(root_dir))
 
 from faststream.rabbit import RabbitBroker
 from core.config import settings
+from apps.stream.messaging.metrics import MetricsMiddleware
+from apps.stream.messaging.codec import CodecMiddleware, decode_message
 
-publisher_broker = RabbitBroker(settings.BROKER_URL)
+publisher_broker = RabbitBroker(
+    settings.BROKER_URL, middlewares=[MetricsMiddleware, CodecMiddleware], decoder=decode_message,
+)
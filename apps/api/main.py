@@ -1,3 +1,4 @@
+import logging
 import sys
 from pathlib import Path
 
@@ -9,8 +10,11 @@ sys.path.insert(0, str(root_dir))
 
 from fastapi import FastAPI
 from core.config import settings
-from apps.api.routes import checkin, vagas, robos, operacao
+from apps.api.routes import checkin, vagas, robos, operacao, fluxo, metricas
 from apps.api.dependencies import publisher_broker
+from apps.api.utils.idempotency import key_pruner
+
+logger = logging.getLogger(__name__)
 
 
 def create_app() -> FastAPI:
@@ -28,25 +32,31 @@ def create_app() -> FastAPI:
     # registrando rotas
 
     app.include_router(checkin.router, prefix="/api", tags=["check-in"])
-    # app.include_router(vagas.router, prefix="/api", tags=["vagas"])
-    # app.include_router(robos.router, prefix="/api", tags=["robos"])
-    # app.include_router(operacao.router, prefix="/api", tags=["operacoes"])
+    app.include_router(fluxo.router, prefix="/api", tags=["fluxo"])
+    app.include_router(vagas.router, prefix="/api", tags=["vagas"])
+    app.include_router(robos.router, prefix="/api", tags=["robos"])
+    app.include_router(operacao.router, prefix="/api", tags=["operacoes"])
+    # fora de /api: caminho padrão do scrape do Prometheus
+    app.include_router(metricas.router, tags=["metricas"])
 
     @app.on_event("startup")
     async def startup_event():
         """
-        Conecta o publisher da API ao RabbitMQ no início da aplicação
+        Conecta o broker da API ao RabbitMQ no início da aplicação:
+        publica eventos e assina o fanout de mudanças de status
         """
-        await publisher_broker.connect()
-        print("[API] Conectado ao RabbitMQ para publicação de eventos")
+        await publisher_broker.start()
+        logger.info("[API] Conectado ao RabbitMQ para publicação e assinatura de eventos")
+        await key_pruner.start()
 
     @app.on_event("shutdown")
     async def shutdown_event():
         """
         Fecha a conexão do publisher com RabbitMQ ao desligar a API
         """
+        await key_pruner.stop()
         await publisher_broker.close()
-        print("[API] Conexão com RabbitMQ encerrada")
+        logger.info("[API] Conexão com RabbitMQ encerrada")
 
     return app
 
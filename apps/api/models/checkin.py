@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, constr
-from typing import Optional, Dict
+from typing import Any, Optional, Dict, List
 from uuid import UUID, uuid4
 
 
@@ -114,4 +114,49 @@ class ProcessingApiResponse(BaseModel):
                     "checkInId": "b12d2c77-51db-4eaf-89dc-482c9f88f650"
                 }
             }
-        }
\ No newline at end of file
+        }
+
+
+# -------------------------------
+# 4. Submissão de check-ins em lote
+# -------------------------------
+class CheckInBatchRequest(BaseModel):
+    """
+    Estrutura enviada no POST /api/submeterCheckinLote.
+    Cada item é validado individualmente como VehicleCheckInData,
+    para que um item inválido não rejeite o lote inteiro.
+    """
+    items: List[Dict[str, Any]] = Field(..., min_length=1, description="Check-ins a submeter")
+
+
+class CheckInBatchItemResult(BaseModel):
+    """
+    Resultado de um item do lote
+    """
+    index: int = Field(..., description="Posição do item no lote enviado")
+    success: bool = Field(..., description="Indica se o check-in foi aceito e publicado")
+    message: str = Field(..., description="Mensagem explicativa do resultado")
+    checkInId: Optional[str] = Field(default=None, description="ID gerado quando o item é aceito")
+
+
+class CheckInBatchResponse(BaseModel):
+    """
+    Resposta do lote, com um resultado por item na ordem de envio
+    """
+    accepted: int = Field(..., description="Quantidade de itens publicados")
+    rejected: int = Field(..., description="Quantidade de itens recusados")
+    results: List[CheckInBatchItemResult]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "accepted": 1,
+                "rejected": 1,
+                "results": [
+                    {"index": 0, "success": True, "message": "Check-in submetido com sucesso",
+                     "checkInId": "b12d2c77-51db-4eaf-89dc-482c9f88f650"},
+                    {"index": 1, "success": False, "message": "licensePlate: String should have at least 6 characters",
+                     "checkInId": None},
+                ],
+            }
+        }
@@ -0,0 +1,61 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+# -------------------------------
+# 1. Robô manobrista
+# -------------------------------
+
+
+class Robot(BaseModel):
+    """
+    Robô designado para levar o veículo até a vaga reservada
+    """
+
+    robotId: str = Field(..., description="Identificador do robô")
+    level: Optional[str] = Field(None, description="Nível/andar atendido pelo robô")
+    position: Optional[str] = Field(None, description="Posição da vaga em que o robô termina a tarefa")
+    busyUntil: Optional[str] = Field(
+        None, description="Data/hora prevista para o robô ficar livre (ISO 8601)"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "robotId": "R2-03",
+                "level": "2",
+                "position": "A3",
+                "busyUntil": "2025-09-27T17:32:00Z",
+            }
+        }
+
+
+# -------------------------------
+# 2. Robô designado (GET /api/robo-designado)
+# -------------------------------
+
+
+class RobotAssignmentResponse(BaseModel):
+    """
+    Resposta com o robô designado para o check-in
+    """
+
+    success: bool = Field(..., description="Indica se já há robô designado")
+    message: str = Field(..., description="Mensagem de feedback para o usuário")
+    assignedRobot: Optional[Robot] = Field(
+        None, description="Informações do robô designado, se houver"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "success": True,
+                "message": "Robô designado com sucesso",
+                "assignedRobot": {
+                    "robotId": "R2-03",
+                    "level": "2",
+                    "position": "A3",
+                    "busyUntil": "2025-09-27T17:32:00Z",
+                },
+            }
+        }
@@ -1,47 +1,200 @@
-from fastapi import APIRouter, Depends
+import asyncio
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from pydantic import ValidationError
 
 from uuid import uuid4
 
-from apps.api.models.checkin import VehicleCheckInData, ProcessingApiResponse
+from core.config import settings
+from apps.api.models.checkin import (
+    VehicleCheckInData,
+    ProcessingApiResponse,
+    CheckInBatchRequest,
+    CheckInBatchItemResult,
+    CheckInBatchResponse,
+)
 from apps.api.dependencies import publisher_broker
+from apps.api.utils.admission import admission
+from apps.api.utils.idempotency import claim_key, event_id_for_key, find_key, release_key, request_fingerprint
 from apps.stream.messaging.topic import CHECKIN_SUBMITTED
+from apps.stream.messaging.partitioning import route
+from apps.stream.messaging.dedup import with_event_id
 
 router = APIRouter()
 
+SECURITY_CHECKS_MESSAGE = "Todos os itens de segurança devem ser selecionados"
+
 
 # Dependência para injetar o broker
 async def get_publisher():
     return publisher_broker
 
 
+def _security_checks_ok(data: VehicleCheckInData) -> bool:
+    return all(data.securityChecks.dict().values())
+
+
+def _event_payload(check_in_id: str, data: VehicleCheckInData) -> dict:
+    return with_event_id({
+        "checkInId": check_in_id,
+        "vehicleCategory": data.vehicleCategory,
+        "cpf": data.cpf,
+        "phone": data.phone,
+        "licensePlate": data.licensePlate,
+    })
+
+
+def _admit(request: Request, client_id: Optional[str], cost: int = 1):
+    """
+    Controle de admissão: recusa com 429 e Retry-After antes de publicar qualquer coisa
+    """
+    # totens atrás do mesmo NAT se distinguem pelo X-Client-Id; sem ele, vale o IP
+    client = client_id or (request.client.host if request.client else "")
+    rejection = admission.check(client, cost)
+    if rejection is None:
+        return
+    detail = (
+        "Muitos check-ins deste cliente; tente novamente em instantes"
+        if rejection.reason == "rate"
+        else "Sistema sobrecarregado; tente novamente em instantes"
+    )
+    raise HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(rejection.retry_after_s)})
+
+
+def _replayed(claim) -> ProcessingApiResponse:
+    if not claim.same_request:
+        raise HTTPException(status_code=422, detail="Idempotency-Key já utilizada com outro payload")
+    return ProcessingApiResponse(
+        success=True,
+        message="Check-in já submetido anteriormente",
+        data={"checkInId": claim.check_in_id},
+    )
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in exc.errors()
+    )
+
+
 @router.post("/submeterCheckin", response_model=ProcessingApiResponse)
-async def submeter_checkin(data: VehicleCheckInData, broker=Depends(get_publisher)):
+async def submeter_checkin(
+    data: VehicleCheckInData,
+    request: Request,
+    broker=Depends(get_publisher),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    client_id: Optional[str] = Header(None, alias="X-Client-Id", max_length=255),
+):
     """
-    Endpoint para receber os dados do Kiosk na etapa de checkin
+    Endpoint para receber os dados do Kiosk na etapa de checkin.
+    Com o header Idempotency-Key, retentativas do cliente devolvem o mesmo
+    checkInId em vez de abrir um novo fluxo; elas são respondidas antes do
+    controle de admissão (não recebem 429 nem consomem a cota).
+    Acima da cota do cliente ou com o pipeline cheio, responde 429 com Retry-After.
     """
 
-    if not all(data.securityChecks.dict().values()):
+    fingerprint = request_fingerprint(data.model_dump()) if idempotency_key else None
+    if idempotency_key:
+        replay = await find_key(idempotency_key, fingerprint)
+        if replay is not None:
+            return _replayed(replay)
+
+    if not _security_checks_ok(data):
         return ProcessingApiResponse(
-            success=False, message="Todos os itens de segurança devem ser selecionados"
+            success=False, message=SECURITY_CHECKS_MESSAGE
         )
 
+    # só requisições válidas consomem a cota
+    _admit(request, client_id)
+
     # Gera um checkInId único
     check_in_id = str(uuid4())
+    payload = _event_payload(check_in_id, data)
 
-    # Cria um payload
-    event_payload = {
-        "checkInId": check_in_id,
-        "vehicleCategory": data.vehicleCategory,
-        "cpf": data.cpf,
-        "phone": data.phone,
-        "licensePlate": data.licensePlate,
-    }
+    if idempotency_key:
+        # a chave pode ter sido gravada por uma requisição concorrente desde a leitura
+        claim = await claim_key(idempotency_key, check_in_id, fingerprint)
+        if not claim.created:
+            return _replayed(claim)
+        payload["eventId"] = event_id_for_key(idempotency_key)
 
-    # Publica no broker a mensagem
-    await broker.publish(event_payload, CHECKIN_SUBMITTED)
+    # Publica no broker a mensagem; o fluxo entra na conta do backlog antes,
+    # para que requisições concorrentes já o vejam
+    admission.track(check_in_id)
+    try:
+        await broker.publish(payload, route(CHECKIN_SUBMITTED, payload))
+    except Exception:
+        admission.release(check_in_id)
+        if idempotency_key:
+            await release_key(idempotency_key, check_in_id)
+        raise
 
     return ProcessingApiResponse(
         success=True,
         message="Check-in submetido com sucesso",
         data={"checkInId": check_in_id},
     )
+
+
+@router.post("/submeterCheckinLote", response_model=CheckInBatchResponse)
+async def submeter_checkin_lote(
+    batch: CheckInBatchRequest,
+    request: Request,
+    broker=Depends(get_publisher),
+    client_id: Optional[str] = Header(None, alias="X-Client-Id", max_length=255),
+):
+    """
+    Endpoint para gateways de Kiosk e ferramentas de replay: recebe vários check-ins,
+    valida todos numa passada e publica os aceitos em paralelo (confirmações do
+    RabbitMQ em pipeline, em vez de uma ida e volta por item).
+    Os itens válidos do lote passam juntos pelo controle de admissão: cada um
+    custa um check-in; itens recusados na validação não consomem a cota.
+    """
+
+    if len(batch.items) > settings.CHECKIN_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lote excede o limite de {settings.CHECKIN_BATCH_MAX_ITEMS} itens",
+        )
+
+    results = []
+    valid = []
+    for index, item in enumerate(batch.items):
+        try:
+            data = VehicleCheckInData.model_validate(item)
+        except ValidationError as exc:
+            results.append(CheckInBatchItemResult(index=index, success=False, message=_validation_message(exc)))
+            continue
+
+        if not _security_checks_ok(data):
+            results.append(CheckInBatchItemResult(index=index, success=False, message=SECURITY_CHECKS_MESSAGE))
+            continue
+
+        result = CheckInBatchItemResult(index=index, success=True, message="Check-in submetido com sucesso")
+        results.append(result)
+        valid.append((result, data))
+
+    if valid:
+        _admit(request, client_id, len(valid))
+
+    to_publish = []
+    for result, data in valid:
+        result.checkInId = str(uuid4())
+        to_publish.append((result, _event_payload(result.checkInId, data)))
+        admission.track(result.checkInId)
+
+    published = await asyncio.gather(
+        *(broker.publish(payload, route(CHECKIN_SUBMITTED, payload)) for _, payload in to_publish),
+        return_exceptions=True,
+    )
+    for (result, _), outcome in zip(to_publish, published):
+        if isinstance(outcome, Exception):
+            admission.release(result.checkInId)
+            result.success = False
+            result.message = "Falha ao publicar o check-in"
+            result.checkInId = None
+
+    accepted = sum(1 for r in results if r.success)
+    return CheckInBatchResponse(accepted=accepted, rejected=len(results) - accepted, results=results)
@@ -0,0 +1,104 @@
+# apps/api/routes/fluxo.py
+import asyncio, json
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+
+from apps.api.utils.status_hub import hub
+from apps.stream.read_models.flow_status_repo import find_status
+
+router = APIRouter()
+
+# Status após os quais o stream é encerrado pelo servidor
+TERMINAL_STATUSES = {"robot_assigned", "checkin_failed", "reservation_expired"}
+HEARTBEAT_S = 15.0
+
+_SNAPSHOT_KEYS = ("status", "version", "updatedAt")
+
+
+def _snapshot_event(check_in_id: str, status: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    status = status or {}
+    return {
+        "checkInId": check_in_id,
+        "status": status.get("status"),
+        "version": status.get("version", 0),
+        "data": {k: v for k, v in status.items() if k not in _SNAPSHOT_KEYS},
+    }
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    return f"id: {event['version']}\nevent: status\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+@router.get("/fluxo/{checkInId}/eventos")
+async def fluxo_eventos(checkInId: UUID, request: Request):
+    """
+    Server-sent events: envia o estado atual do check-in e, em seguida, cada
+    transição (checkin_submitted, spots_consulted, spot_reserved, robot_assigned
+    ou checkin_failed) assim que o worker a grava. Não há releitura periódica do banco.
+    O primeiro evento traz o estado completo; os seguintes, só as chaves alteradas.
+    """
+    cid = str(checkInId)
+
+    async def stream():
+        # inscreve antes de ler o estado atual para não perder transições no intervalo
+        with hub.subscribe(cid) as queue:
+            event = _snapshot_event(cid, await find_status(cid))
+            last_version = event["version"]
+            if event["status"]:
+                yield _sse(event)
+            if event["status"] in TERMINAL_STATUSES:
+                return
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if event["version"] <= last_version:
+                    continue
+                last_version = event["version"]
+                yield _sse(event)
+                if event["status"] in TERMINAL_STATUSES:
+                    return
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/fluxo/{checkInId}/aguardar")
+async def fluxo_aguardar(
+    checkInId: UUID,
+    versao: int = Query(0, ge=0, description="Última versão já conhecida pelo cliente"),
+    timeout: float = Query(25.0, gt=0, le=60, description="Tempo máximo de espera em segundos"),
+):
+    """
+    Long-poll: responde assim que o fluxo passar da `versao` informada,
+    ou com o estado atual ao fim do `timeout`.
+    """
+    cid = str(checkInId)
+    with hub.subscribe(cid) as queue:
+        current = _snapshot_event(cid, await find_status(cid))
+        if current["version"] > versao:
+            return {"changed": True, **current}
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                event = await asyncio.wait_for(queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if event["version"] > versao:
+                return {"changed": True, **event}
+
+    return {"changed": False, **current}
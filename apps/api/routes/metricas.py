@@ -0,0 +1,14 @@
+# apps/api/routes/metricas.py
+from fastapi import APIRouter, Response
+
+from core.metrics import CONTENT_TYPE, registry
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    GET: métricas deste processo da API no formato texto do Prometheus
+    """
+    return Response(registry.render(), media_type=CONTENT_TYPE)
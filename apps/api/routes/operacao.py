@@ -0,0 +1,124 @@
+# apps/api/routes/operacao.py
+import base64, binascii, time
+from datetime import datetime, timezone
+from typing import Dict, Literal, Optional, Tuple
+from uuid import UUID
+
+from fastapi import APIRouter, HTTPException, Query
+
+from core.config import settings
+from apps.stream.read_models.counters import RATE_SLOTS
+from apps.stream.read_models.flow_status_repo import counters, list_flows, normalize_plate
+from apps.stream.saga.checkin_saga import CHECKIN_SAGA
+from apps.stream.saga.engine import get_saga, saga_counts
+
+router = APIRouter()
+
+
+@router.get("/operacao/sagas")
+async def sagas_resumo():
+    """
+    GET: quantidade de sagas por estado; as em andamento também por passo (`running:<passo>`)
+    """
+    return {
+        "steps": [step.name for step in CHECKIN_SAGA.steps],
+        "counts": await saga_counts(),
+    }
+
+
+@router.get("/operacao/sagas/{checkInId}")
+async def saga_detalhe(checkInId: UUID):
+    """
+    GET: estado persistido da saga de um check-in (passo, tentativa, prazo da resposta)
+    """
+    saga = await get_saga(str(checkInId))
+    if saga is None:
+        raise HTTPException(status_code=404, detail="Saga não encontrada")
+    steps = CHECKIN_SAGA.steps
+    return {**saga, "stepName": steps[saga["step"]].name if saga["step"] < len(steps) else None}
+
+
+def _encode_cursor(updated_ms: int, check_in_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{updated_ms}:{check_in_id}".encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[int, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        updated_ms, check_in_id = raw.split(":", 1)
+        return int(updated_ms), check_in_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+@router.get("/operacao/fluxos")
+async def fluxos_listar(
+    status: Optional[str] = None,
+    licensePlate: Optional[str] = None,
+    olderThanS: Optional[float] = Query(None, ge=0),
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+):
+    """
+    GET: fluxos por status e/ou placa, ordenados pela última transição (`asc` = mais
+    antigos primeiro). `olderThanS` filtra os parados há pelo menos N segundos.
+    Paginação por cursor: repita a consulta com `cursor=nextCursor` até vir null.
+    """
+    plate = normalize_plate(licensePlate)
+    if status is None and plate is None:
+        raise HTTPException(status_code=400, detail="Informe status e/ou licensePlate")
+    after = _decode_cursor(cursor) if cursor else None
+    updated_before_ms = int((time.time() - olderThanS) * 1000) if olderThanS is not None else None
+    # uma linha a mais só para saber se há próxima página
+    rows = await list_flows(status, plate, updated_before_ms, after, order == "desc", limit + 1)
+    page = rows[:limit]
+    return {
+        "items": [
+            {
+                "checkInId": row.check_in_id,
+                "status": row.status,
+                "vehicleCategory": row.vehicle_category,
+                "licensePlate": row.license_plate,
+                "spotId": row.spot_id,
+                "updatedAt": row.updated_at,
+                "version": row.version,
+            }
+            for row in page
+        ],
+        "nextCursor": _encode_cursor(page[-1].updated_ms, page[-1].check_in_id) if len(rows) > limit else None,
+    }
+
+
+@router.get("/operacao/painel")
+async def painel(expiringWithinMin: int = Query(settings.OPS_EXPIRING_WINDOW_MIN, ge=1, le=120)):
+    """
+    GET: contadores do painel, lidos de agregados mantidos a cada transição (sem varrer
+    os fluxos): fluxos por status, vagas ocupadas por nível e categoria, reservas
+    vencendo nos próximos `expiringWithinMin` minutos (resolução de 1 minuto; `overdue`
+    são as vencidas ainda não liberadas) e check-ins por minuto em janela deslizante.
+    """
+    now_ms = int(time.time() * 1000)
+    current = await counters()
+
+    occupied: Dict[str, Dict[str, int]] = {}
+    for key, count in sorted(current.occupied.items()):
+        level, category = key.split(":", 1)
+        occupied.setdefault(level, {})[category] = count
+
+    now_min, until_min = now_ms // 60000, (now_ms + expiringWithinMin * 60000) // 60000
+    now_s = now_ms // 1000
+    return {
+        "generatedAt": datetime.fromtimestamp(now_ms / 1000, timezone.utc).replace(tzinfo=None).isoformat() + "Z",
+        "flowsByStatus": dict(sorted(current.by_status.items())),
+        "occupiedSpots": occupied,
+        "reservations": {
+            "withinMinutes": expiringWithinMin,
+            "expiring": sum(n for minute, n in current.expiring.items() if now_min <= minute <= until_min),
+            "overdue": sum(n for minute, n in current.expiring.items() if minute < now_min),
+        },
+        "checkinsPerMinute": {
+            "last1m": sum(n for second, n in current.checkins.items() if second > now_s - 60),
+            f"avg{RATE_SLOTS // 60}m": round(sum(current.checkins.values()) / (RATE_SLOTS / 60), 1),
+        },
+    }
@@ -0,0 +1,36 @@
+# apps/api/routes/robos.py
+from fastapi import APIRouter, Query
+from uuid import UUID
+from apps.api.models.robos import Robot, RobotAssignmentResponse
+from apps.api.utils.flow_cache import flow_cache
+
+router = APIRouter()
+
+
+def _robot_assignment_response(status) -> RobotAssignmentResponse:
+    status = status or {}
+    if status.get("status") == "checkin_failed":
+        return RobotAssignmentResponse(
+            success=False,
+            message=f"Check-in não concluído na etapa {status.get('failedStep')}",
+            assignedRobot=None,
+        )
+    if not status.get("robot"):
+        return RobotAssignmentResponse(success=False, message="Designação de robô em processamento", assignedRobot=None)
+
+    return RobotAssignmentResponse(
+        success=True,
+        message="Robô designado com sucesso",
+        assignedRobot=Robot(**status["robot"]),
+    )
+
+
+@router.get("/robo-designado", response_model=RobotAssignmentResponse)
+async def robo_designado(
+    checkInId: UUID = Query(..., description="ID do check-in")
+):
+    """
+    GET: retorna o robô designado pela saga do check-in.
+    Se ainda não houver robô, informa status pendente.
+    """
+    return await flow_cache.view(str(checkInId), "robo-designado", _robot_assignment_response)
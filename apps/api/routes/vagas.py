@@ -1,23 +1,67 @@
 # apps/api/routes/vagas.py
-from fastapi import APIRouter, Query
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Response
 from uuid import UUID
 from apps.api.models.vagas import Spot, SpotQueryResponse, SpotSelectionResponse
-from apps.stream.read_models.flow_status_repo import get_status
+from apps.api.utils.availability_cache import availability_cache
+from apps.api.utils.flow_cache import flow_cache
+from apps.stream.inventory.spot_inventory import inventory
 
 router = APIRouter()
 
+
+def _spot_query_response(status) -> SpotQueryResponse:
+    spots = (status or {}).get("spots") or []
+    return SpotQueryResponse(totalAvailable=len(spots), spots=[Spot(**s) for s in spots])
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # comparação fraca (RFC 9110): W/"x" equivale a "x"
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def _spot_selection_response(status) -> SpotSelectionResponse:
+    if not status or not status.get("spot"):
+        return SpotSelectionResponse(success=False, message="Seleção de vaga em processamento", assignedSpot=None)
+
+    return SpotSelectionResponse(
+        success=True,
+        message="Vaga reservada com sucesso",
+        assignedSpot=Spot(**status["spot"])
+    )
+
+
 @router.get("/consultar-vagas", response_model=SpotQueryResponse)
 async def consultar_vagas(
     checkInId: UUID = Query(..., description="ID do check-in"),
-    vehicleCategory: str = Query(..., description="Categoria do veículo")
+    vehicleCategory: str = Query(..., description="Categoria do veículo"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
 ):
     """
-    GET: apenas lê o read model.
-    Retorna a última lista de vagas consultadas para este checkInId.
+    GET: apenas lê o read model (via cache do status do fluxo).
+    Depois da consulta do check-in, retorna o snapshot de disponibilidade da
+    categoria (versão igual ou mais nova que a consultada), com ETag:
+    um `If-None-Match` com a mesma versão recebe 304 sem corpo.
+    Categoria fora do inventário: 404.
     """
-    status = await get_status(str(checkInId))
-    spots = (status or {}).get("spots") or []
-    return SpotQueryResponse(totalAvailable=len(spots), spots=[Spot(**s) for s in spots])
+    if not inventory.has_category(vehicleCategory):
+        raise HTTPException(status_code=404, detail="Categoria de veículo desconhecida")
+    status = await flow_cache.get(str(checkInId))
+    version = (status or {}).get("spotsVersion")
+    if version is None:
+        # ainda não consultado, ou fluxo gravado com a lista de vagas no próprio registro
+        return await flow_cache.view(str(checkInId), "consultar-vagas", _spot_query_response)
+
+    snapshot = await availability_cache.get(status.get("vehicleCategory") or vehicleCategory, version)
+    if snapshot is None:
+        return SpotQueryResponse(totalAvailable=0, spots=[])
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
 
 @router.get("/selecionar-vaga", response_model=SpotSelectionResponse)
 async def selecionar_vaga(
@@ -27,13 +71,12 @@ async def selecionar_vaga(
     GET: retorna a vaga já reservada pela pipeline.
     Se ainda não houver vaga, informa status pendente.
     """
-    status = await get_status(str(checkInId))
-    if not status or not status.get("spot"):
-        return SpotSelectionResponse(success=False, message="Seleção de vaga em processamento", assignedSpot=None)
+    return await flow_cache.view(str(checkInId), "selecionar-vaga", _spot_selection_response)
 
-    spot = status["spot"]
-    return SpotSelectionResponse(
-        success=True,
-        message="Vaga reservada com sucesso",
-        assignedSpot=Spot(**spot)
-    )
+@router.get("/vagas/cache")
+async def estatisticas_cache():
+    """
+    GET: contadores do cache de status de fluxo (hits, misses, evictions, invalidações)
+    e do cache de snapshots de disponibilidade
+    """
+    return {**flow_cache.stats(), "availability": availability_cache.stats()}
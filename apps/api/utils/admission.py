@@ -0,0 +1,163 @@
+# apps/api/utils/admission.py
+import math, time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, NamedTuple, Optional
+
+from core.config import settings
+from core.metrics import registry
+from apps.stream.saga.checkin_saga import CHECKIN_SAGA
+
+# Status em que o fluxo deixa de ocupar o pipeline
+TERMINAL_STATUSES = frozenset({CHECKIN_SAGA.steps[-1].status, CHECKIN_SAGA.failed_status, "reservation_expired"})
+
+# Janela usada para estimar a vazão de conclusão (Retry-After do gate de backlog)
+DRAIN_WINDOW_S = 10.0
+
+admission_rejected = registry.counter(
+    "admission_rejected_total", "Check-ins recusados com 429 pelo controle de admissão", ("reason",),
+)
+
+
+class Rejection(NamedTuple):
+    reason: str  # "rate" (token bucket do cliente) | "backlog" (fluxos em andamento)
+    retry_after_s: int
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, tokens: float, updated_at: float):
+        self.tokens = tokens
+        self.updated_at = updated_at
+
+
+class AdmissionController:
+    """
+    Controle de admissão das submissões de check-in, por processo da API.
+
+    - Token bucket por cliente: `rate` check-ins/s com rajada de até `burst`.
+      Um lote maior que a rajada deixa o saldo negativo, limitado a `-burst`:
+      a espera seguinte nunca passa de duas rajadas, qualquer que seja o lote.
+    - Gate de backlog: recusa quando os fluxos em andamento passariam de
+      `max_inflight`. Em andamento = publicados por esta API e ainda sem
+      status terminal, mais os que o fanout de status mostra ativos (de
+      outras instâncias). Um fluxo publicado e ainda parado na fila do broker
+      já conta: é justamente o backlog que cresce quando o worker atrasa.
+
+    Entradas sem notícia há `inflight_ttl_s` saem da conta (notificação perdida
+    ou fluxo abandonado). `rate=0` ou `max_inflight=0` desativam cada parte.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_clients: int,
+        max_inflight: int,
+        inflight_ttl_s: float,
+        retry_after_max_s: int,
+    ):
+        self._rate = rate
+        self._burst = max(1, burst)
+        self._max_clients = max_clients
+        self._max_inflight = max_inflight
+        self._inflight_ttl_s = inflight_ttl_s
+        self._retry_after_max_s = max(1, retry_after_max_s)
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        # checkInId -> instante em que entrou na conta (ordem de entrada)
+        self._inflight: Dict[str, float] = {}
+        self._completed: Deque[float] = deque()
+
+    def __len__(self):
+        return len(self._inflight)
+
+    def check(self, client: str, cost: int = 1, now: Optional[float] = None) -> Optional[Rejection]:
+        """
+        Reserva `cost` check-ins para o cliente; devolve a recusa ou None se admitido.
+        Nada é consumido numa recusa.
+        """
+        now = time.monotonic() if now is None else now
+        if self._max_inflight > 0:
+            self._expire(now)
+            excess = len(self._inflight) + cost - self._max_inflight
+            if excess > 0:
+                return self._reject("backlog", self._drain_wait(excess, now))
+
+        if self._rate > 0:
+            bucket = self._bucket(client, now)
+            # um lote maior que a rajada entra com o bucket cheio e deixa o saldo
+            # negativo (no máximo uma rajada de dívida): o cliente paga o excesso
+            # esperando antes da próxima submissão
+            needed = min(cost, self._burst)
+            if bucket.tokens < needed:
+                return self._reject("rate", math.ceil((needed - bucket.tokens) / self._rate))
+            bucket.tokens = max(bucket.tokens - cost, -float(self._burst))
+        return None
+
+    def track(self, check_in_id: str, now: Optional[float] = None):
+        """
+        Conta um fluxo publicado por esta API até que ele chegue a um status terminal
+        """
+        self._inflight.setdefault(check_in_id, time.monotonic() if now is None else now)
+
+    def release(self, check_in_id: str):
+        """
+        Tira da conta um fluxo cuja publicação falhou
+        """
+        self._inflight.pop(check_in_id, None)
+
+    def observe(self, event: Dict[str, Any], now: Optional[float] = None):
+        """
+        Atualiza a conta com uma mudança de status recebida do fanout
+        """
+        now = time.monotonic() if now is None else now
+        check_in_id = event["checkInId"]
+        if event.get("status") in TERMINAL_STATUSES:
+            if self._inflight.pop(check_in_id, None) is not None:
+                self._completed.append(now)
+        else:
+            self._inflight.setdefault(check_in_id, now)
+
+    def _bucket(self, client: str, now: float) -> _Bucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = _Bucket(float(self._burst), now)
+            if len(self._buckets) > self._max_clients:
+                # o cliente mais antigo volta com o bucket cheio: no pior caso, uma rajada extra
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+            bucket.tokens = min(float(self._burst), bucket.tokens + (now - bucket.updated_at) * self._rate)
+            bucket.updated_at = now
+        return bucket
+
+    def _expire(self, now: float):
+        limit = now - self._inflight_ttl_s
+        while self._inflight:
+            check_in_id, since = next(iter(self._inflight.items()))
+            if since > limit:
+                break
+            del self._inflight[check_in_id]
+        while self._completed and self._completed[0] < now - DRAIN_WINDOW_S:
+            self._completed.popleft()
+
+    def _drain_wait(self, excess: int, now: float) -> int:
+        if not self._completed:
+            return self._retry_after_max_s
+        # vazão de conclusão recente: tempo até `excess` fluxos terminarem
+        rate = len(self._completed) / max(now - self._completed[0], 1.0)
+        return min(self._retry_after_max_s, max(1, math.ceil(excess / rate)))
+
+    def _reject(self, reason: str, retry_after_s: int) -> Rejection:
+        admission_rejected.inc(reason)
+        return Rejection(reason, min(self._retry_after_max_s, max(1, retry_after_s)))
+
+
+admission = AdmissionController(
+    rate=settings.ADMISSION_CLIENT_RATE,
+    burst=settings.ADMISSION_CLIENT_BURST,
+    max_clients=settings.ADMISSION_MAX_CLIENTS,
+    max_inflight=settings.ADMISSION_MAX_INFLIGHT,
+    inflight_ttl_s=settings.ADMISSION_INFLIGHT_TTL_S,
+    retry_after_max_s=settings.ADMISSION_RETRY_AFTER_MAX_S,
+)
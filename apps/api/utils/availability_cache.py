@@ -0,0 +1,61 @@
+# apps/api/utils/availability_cache.py
+import time
+from typing import Dict, Optional
+
+from core.config import settings
+from apps.stream.inventory.spot_inventory import inventory, normalize_category
+from apps.stream.read_models.availability_repo import get_snapshot
+
+
+class CachedAvailability:
+    __slots__ = ("category", "version", "etag", "body", "expires_at")
+
+    def __init__(self, category: str, version: int, body: str, expires_at: float):
+        self.category = category
+        self.version = version
+        self.etag = f'"{category}-{version}"'
+        # corpo já codificado: a resposta não reserializa a lista a cada requisição
+        self.body = body.encode("utf-8")
+        self.expires_at = expires_at
+
+
+class AvailabilityCache:
+    """
+    Cache (TTL) dos snapshots de disponibilidade por categoria, na frente do read model.
+
+    Uma entrada mais velha que a versão que o fluxo já consultou é relida na hora,
+    sem esperar o TTL: a resposta nunca é anterior à consulta do próprio check-in.
+    """
+
+    def __init__(self, ttl_s: float):
+        self._ttl_s = ttl_s
+        self._entries: Dict[str, CachedAvailability] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, category: str, min_version: int = 0) -> Optional[CachedAvailability]:
+        category = normalize_category(category)
+        if not inventory.has_category(category):
+            # nunca tem snapshot: não vai ao banco nem ocupa entrada no cache
+            return None
+        entry = self._entries.get(category)
+        if entry is not None and entry.version >= min_version and entry.expires_at > time.monotonic():
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        snapshot = await get_snapshot(category)
+        if snapshot is None:
+            return entry
+        if entry is None or snapshot.version >= entry.version:
+            entry = self._entries[category] = CachedAvailability(
+                category, snapshot.version, snapshot.body, time.monotonic() + self._ttl_s,
+            )
+        return entry
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+availability_cache = AvailabilityCache(ttl_s=settings.SPOT_SNAPSHOT_CACHE_TTL_S)
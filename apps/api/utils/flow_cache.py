@@ -0,0 +1,112 @@
+# apps/api/utils/flow_cache.py
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from core.config import settings
+from apps.stream.read_models.flow_status_repo import find_status
+
+Loader = Callable[[str], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class _Entry:
+    __slots__ = ("status", "expires_at", "views")
+
+    def __init__(self, status: Optional[Dict[str, Any]], expires_at: float):
+        self.status = status
+        self.expires_at = expires_at
+        # respostas já validadas, construídas a partir deste status
+        self.views: Dict[str, Any] = {}
+
+
+class FlowStatusCache:
+    """
+    Cache read-through (LRU + TTL) do status de fluxo na frente do read model.
+
+    A invalidação é feita por checkInId quando o worker grava uma nova transição
+    (fanout de mudanças); o TTL só limita o tempo de vida caso uma notificação se perca.
+    Uma leitura em andamento durante uma invalidação não é guardada, para que um
+    valor lido antes da transição nunca volte para o cache.
+    """
+
+    def __init__(self, loader: Loader, max_entries: int, ttl_s: float):
+        self._loader = loader
+        self._max_entries = max_entries
+        self._ttl_s = ttl_s
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # checkInId -> token da leitura em andamento (None = invalidada no meio do caminho)
+        self._loading: Dict[str, Optional[object]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def _entry(self, check_in_id: str) -> _Entry:
+        entry = self._entries.get(check_in_id)
+        if entry is not None:
+            if entry.expires_at > time.monotonic():
+                self._entries.move_to_end(check_in_id)
+                self.hits += 1
+                return entry
+            del self._entries[check_in_id]
+            self.expirations += 1
+
+        self.misses += 1
+        token = object()
+        self._loading[check_in_id] = token
+        try:
+            status = await self._loader(check_in_id)
+        finally:
+            current = self._loading.get(check_in_id)
+            fresh = current is token
+            if fresh or current is None:
+                self._loading.pop(check_in_id, None)
+
+        entry = _Entry(status, time.monotonic() + self._ttl_s)
+        if fresh:
+            self._entries[check_in_id] = entry
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    async def get(self, check_in_id: str) -> Optional[Dict[str, Any]]:
+        return (await self._entry(check_in_id)).status
+
+    async def view(self, check_in_id: str, name: str, build: Callable[[Optional[Dict[str, Any]]], Any]) -> Any:
+        """
+        Devolve a resposta `name` construída por `build(status)`, memorizada junto da entrada
+        """
+        entry = await self._entry(check_in_id)
+        view = entry.views.get(name)
+        if view is None:
+            view = entry.views[name] = build(entry.status)
+        return view
+
+    def invalidate(self, check_in_id: str):
+        if check_in_id in self._loading:
+            self._loading[check_in_id] = None
+        if self._entries.pop(check_in_id, None) is not None:
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+flow_cache = FlowStatusCache(
+    find_status,
+    max_entries=settings.FLOW_CACHE_MAX_ENTRIES,
+    ttl_s=settings.FLOW_CACHE_TTL_S,
+)
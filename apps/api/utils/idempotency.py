@@ -0,0 +1,150 @@
+# apps/api/utils/idempotency.py
+import asyncio, hashlib, json, logging, sqlite3, time
+from typing import Any, Dict, NamedTuple, Optional
+from uuid import uuid5
+
+from core.config import settings
+from core.db import SQLiteStore, get_store
+from apps.stream.messaging.dedup import EVENT_NAMESPACE
+
+logger = logging.getLogger(__name__)
+
+_store = get_store()
+
+
+class IdempotencyClaim(NamedTuple):
+    check_in_id: str
+    created: bool  # True: primeira requisição com esta chave
+    same_request: bool  # False: chave reutilizada com outro payload
+
+
+@_store.add_schema
+def _create_schema(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            idem_key TEXT PRIMARY KEY,
+            check_in_id TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            created_at REAL NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_idempotency_keys_at ON idempotency_keys (created_at)")
+
+def _lookup(conn: sqlite3.Connection, key: str, fingerprint: str, since: float) -> Optional[IdempotencyClaim]:
+    row = conn.execute(
+        "SELECT check_in_id, fingerprint FROM idempotency_keys WHERE idem_key = ? AND created_at >= ?", (key, since)
+    ).fetchone()
+    return None if row is None else IdempotencyClaim(row[0], False, row[1] == fingerprint)
+
+def _claim(conn: sqlite3.Connection, key: str, check_in_id: str, fingerprint: str, since: float) -> IdempotencyClaim:
+    # chave vencida e ainda não expurgada: vale como nova
+    conn.execute("DELETE FROM idempotency_keys WHERE idem_key = ? AND created_at < ?", (key, since))
+    cur = conn.execute(
+        "INSERT OR IGNORE INTO idempotency_keys (idem_key, check_in_id, fingerprint, created_at) VALUES (?, ?, ?, ?)",
+        (key, check_in_id, fingerprint, time.time()),
+    )
+    if cur.rowcount:
+        return IdempotencyClaim(check_in_id, True, True)
+    existing_cid, existing_fp = conn.execute(
+        "SELECT check_in_id, fingerprint FROM idempotency_keys WHERE idem_key = ?", (key,)
+    ).fetchone()
+    return IdempotencyClaim(existing_cid, False, existing_fp == fingerprint)
+
+def _release(conn: sqlite3.Connection, key: str, check_in_id: str):
+    conn.execute("DELETE FROM idempotency_keys WHERE idem_key = ? AND check_in_id = ?", (key, check_in_id))
+
+def _prune(conn: sqlite3.Connection, before: float, limit: int) -> int:
+    return conn.execute(
+        "DELETE FROM idempotency_keys WHERE idem_key IN "
+        "(SELECT idem_key FROM idempotency_keys WHERE created_at < ? LIMIT ?)",
+        (before, limit),
+    ).rowcount
+
+
+def request_fingerprint(data: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def event_id_for_key(key: str) -> str:
+    # o mesmo Idempotency-Key gera sempre o mesmo eventId: o worker descarta republicações
+    return str(uuid5(EVENT_NAMESPACE, f"idempotency-key/{key}"))
+
+
+def _since() -> float:
+    return time.time() - settings.IDEMPOTENCY_KEY_TTL_S
+
+
+async def find_key(key: str, fingerprint: str) -> Optional[IdempotencyClaim]:
+    """
+    Leitura sem escrita da chave dentro da janela de retenção: retentativas são
+    respondidas antes do controle de admissão
+    """
+    return await _store.read(_lookup, key, fingerprint, _since())
+
+
+async def claim_key(key: str, check_in_id: str, fingerprint: str) -> IdempotencyClaim:
+    """
+    Associa a chave ao checkInId de forma atômica; se ela já existia, devolve o checkInId original
+    """
+    return await _store.write(_claim, key, check_in_id, fingerprint, _since())
+
+
+async def release_key(key: str, check_in_id: str):
+    """
+    Desfaz a associação quando a publicação falha, para que o cliente possa tentar de novo
+    """
+    await _store.write(_release, key, check_in_id)
+
+
+class ExpiredKeyPruner:
+    """
+    Expurga as chaves fora da retenção em lotes (transações curtas do escritor),
+    na subida da API e depois a cada `interval_s`
+    """
+
+    def __init__(self, store: SQLiteStore, retention_s: float, interval_s: float, batch: int):
+        self._store = store
+        self._retention_s = retention_s
+        self._interval_s = interval_s
+        self._batch = batch
+        self._task: Optional[asyncio.Task] = None
+
+    async def prune(self) -> int:
+        before = time.time() - self._retention_s
+        pruned = 0
+        while True:
+            deleted = await self._store.write(_prune, before, self._batch)
+            pruned += deleted
+            if deleted < self._batch:
+                return pruned
+
+    async def start(self):
+        if self._interval_s > 0:
+            self._task = asyncio.create_task(self._run(), name="idempotency-keys-prune")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                pruned = await self.prune()
+                if pruned:
+                    logger.info("[Idempotência] %d chaves expurgadas", pruned)
+            except Exception:
+                logger.exception("[Idempotência] Falha ao expurgar chaves vencidas")
+            await asyncio.sleep(self._interval_s)
+
+
+key_pruner = ExpiredKeyPruner(
+    _store,
+    retention_s=settings.IDEMPOTENCY_KEY_TTL_S,
+    interval_s=settings.IDEMPOTENCY_PRUNE_INTERVAL_S,
+    batch=settings.IDEMPOTENCY_PRUNE_BATCH,
+)
@@ -0,0 +1,67 @@
+# apps/api/utils/status_hub.py
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Set
+from uuid import uuid4
+
+from faststream.rabbit import RabbitQueue
+
+from apps.api.dependencies import publisher_broker
+from apps.api.utils.admission import admission
+from apps.api.utils.flow_cache import flow_cache
+from apps.stream.messaging.status_fanout import FLOW_STATUS_EXCHANGE
+
+# Eventos pendentes por conexão; um cliente lento perde os mais antigos, não trava o hub
+STREAM_QUEUE_SIZE = 16
+
+
+class StatusHub:
+    """
+    Distribui as mudanças de status recebidas do broker para as conexões
+    abertas (SSE / long-poll) do mesmo checkInId.
+
+    Cada conexão é só uma asyncio.Queue pequena num dicionário por checkInId:
+    milhares de streams simultâneos não custam threads nem leituras no banco.
+    """
+
+    def __init__(self, queue_size: int = STREAM_QUEUE_SIZE):
+        self._queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def __len__(self):
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    @contextmanager
+    def subscribe(self, check_in_id: str) -> Iterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(self._queue_size)
+        self._subscribers.setdefault(check_in_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(check_in_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[check_in_id]
+
+    def publish(self, event: Dict[str, Any]):
+        for queue in self._subscribers.get(event["checkInId"], ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+
+hub = StatusHub()
+
+# Fila exclusiva por processo da API, ligada ao fanout de mudanças do read model
+_status_queue = RabbitQueue(
+    f"api.flow-status.{uuid4().hex[:12]}", auto_delete=True, exclusive=True
+)
+
+
+@publisher_broker.subscriber(_status_queue, FLOW_STATUS_EXCHANGE)
+async def on_flow_status_changed(event: dict):
+    # invalida antes de notificar: quem reagir ao evento já relê o estado novo
+    flow_cache.invalidate(event["checkInId"])
+    admission.observe(event)
+    hub.publish(event)
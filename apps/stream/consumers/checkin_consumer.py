@@ -1,10 +1,14 @@
+import logging
+
 from apps.stream.utils.connection import broker
 from apps.stream.messaging.topic import CHECKIN_SUBMITTED
 
+logger = logging.getLogger(__name__)
+
 @broker.subscriber(CHECKIN_SUBMITTED)
 async def handle_checkin_submitted(message:dict):
     """
     Consumer que processa eventos de check-in submetidos.
     """
     
-    print(f"[WORKER] Evento recebido em '{CHECKIN_SUBMITTED}': {message}")
\ No newline at end of file
+    logger.info("[WORKER] Evento recebido em '%s': %s", CHECKIN_SUBMITTED, message)
@@ -1,83 +1,27 @@
 from faststream import Logger
 from apps.stream.utils.connection import broker
-from apps.stream.messaging import topic
-from apps.stream.read_models.flow_status_repo import (
-    set_status,
-)
+from apps.stream.messaging.partitioning import partitioned_subscriber
+from apps.stream.saga.checkin_saga import CHECKIN_SAGA, checkin_saga
 
-from time import sleep
 
-@broker.subscriber(topic.CHECKIN_SUBMITTED)
+@partitioned_subscriber(broker, CHECKIN_SAGA.trigger)
 async def on_checkin_submitted(msg: dict, logger: Logger):
     # mensagem esperada : { checkInId, vehicleCategory, licensePlate}
     cid = msg["checkInId"]
-    logger.info(
-        f"[Orchestrator] Novo check-in recebido. ID={cid} Categoria={msg.get('vehicleCategory')}"
-    )
+    logger.info("[Orchestrator] Novo check-in recebido. ID=%s Categoria=%s", cid, msg.get("vehicleCategory"))
 
-    await set_status(cid, "checkin_submitted", extra=msg)
-    sleep(10)
-    
-    # 1 solicitar consulta vagas
+    # passos, prazos, novas tentativas e compensações estão declarados em CHECKIN_SAGA
+    await checkin_saga.begin(msg)
 
-    await broker.publish(
-        {"checkInId": cid, "vehicleCategory": msg["vehicleCategory"]},
-        routing_key=topic.SPOT_CONSULT_REQUESTED,
-    )
 
-    logger.info(
-        f"[Orchestrator] Evento publicado -> {topic.SPOT_CONSULT_REQUESTED} para ID={cid}"
-    )
+def _reply_handler(routing_key: str):
+    async def on_saga_reply(msg: dict, logger: Logger):
+        logger.info("[Orchestrator] Resposta %s para ID=%s", routing_key, msg["checkInId"])
+        await checkin_saga.on_reply(routing_key, msg)
 
+    on_saga_reply.__name__ = f"on_{routing_key.replace('.', '_')}"
+    return on_saga_reply
 
-@broker.subscriber(topic.SPOT_CONSULT_COMPLETED)
-async def on_spot_consult_completed(msg: dict, logger: Logger):
-    cid = msg["checkInId"]
-
-    spots = msg.get("spots", [])
-    logger.info(
-        f"[Orchestrator] Consulta concluída para ID={cid}, {len(spots)} vagas encontradas."
-    )
-
-
-    await set_status(cid, "spots_consulted", extra={"spots": msg.get("spots", [])})
-    sleep(30)
-
-    # 2) solicitar reserva de vaga
-    await broker.publish(
-        {"checkInId": cid, "vehicleCategory": msg.get("vehicleCategory")},
-        routing_key=topic.SPOT_RESERVE_REQUESTED,
-    )
-
-    logger.info(
-        f"[Orchestrator] Evento publicado -> {topic.SPOT_RESERVE_REQUESTED} para ID={cid}"
-    )
-
-
-@broker.subscriber(topic.SPOT_RESERVED)
-async def on_spot_reserved(msg: dict, logger: Logger):
-    """
-    3 Recebe a confirmação de vaga reservada,
-    salva no read model e inicia a etapa de seleção de robô.
-    """
-    cid = msg["checkInId"]
-    spot = msg.get("spot")
-    sleep(30)
-
-    if not spot:
-        logger.warning(f"[Orchestrator] Nenhuma vaga reservada para ID={cid}.")
-        return
-
-    logger.info(f"[Orchestrator] Vaga reservada para ID={cid}, Vaga={spot['spotId']}")
-
-    await set_status(cid, "spot_reserved", extra={"spot": spot})
-
-    await broker.publish(
-        {"checkInId": cid, "spot": spot},
-        topic=topic.ROBOT_ASSIGN_REQUESTED,
-    )
 
-    logger.info(
-        # f"[ROBÔS] Evento publicado -> {topic.ROBOT_ASSIGN_REQUESTED} para ID={cid}"
-        f"[ROBÔS] Evento publicado -> Robo assino para ID={cid}"
-    )
+for _reply in CHECKIN_SAGA.reply_topics():
+    partitioned_subscriber(broker, _reply)(_reply_handler(_reply))
@@ -0,0 +1,17 @@
+from apps.stream.utils.connection import broker
+from apps.stream.messaging import topic
+from apps.stream.messaging.partitioning import partitioned_subscriber
+from apps.stream.inventory.robot_dispatch import dispatcher
+from faststream import Logger
+
+
+# ---------- Designação de robô ----------
+@partitioned_subscriber(broker, topic.ROBOT_ASSIGN_REQUESTED)
+async def on_robot_assign_requested(msg: dict, logger: Logger):
+    cid = msg["checkInId"]
+    spot = msg.get("spot") or {}
+    logger.info("[RobotConsumer] Evento recebido: %s | checkInId=%s vaga=%s", topic.ROBOT_ASSIGN_REQUESTED, cid, spot.get("spotId"))
+
+    # o pedido entra no próximo lote do dispatcher; a resposta (robot.assigned) sai pelo outbox.
+    # Se o worker cair antes do lote, o prazo do passo na saga reenvia o pedido.
+    dispatcher.submit(msg)
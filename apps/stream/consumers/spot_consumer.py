@@ -1,55 +1,205 @@
-from datetime import datetime, timedelta
+import logging, time
+from typing import Optional
+from core.config import settings
 from apps.stream.utils.connection import broker
 from apps.stream.messaging import topic
-from apps.stream.read_models.flow_status_repo import save_spot_list, get_status, set_reserved_spot
+from apps.stream.messaging.partitioning import partitioned_subscriber
+from apps.stream.messaging.outbox import OutgoingMessage, relay
+from apps.stream.messaging.dedup import with_event_id
+from apps.stream.messaging.batching import MicroBatcher
+from apps.stream.inventory.spot_inventory import inventory, normalize_category
+from apps.stream.inventory.expiry import expiry
+from apps.stream.inventory.availability import availability
+from apps.stream.read_models.flow_status_repo import (
+    FlowPatch, VersionConflict, get_status, get_statuses, patch_status, patch_status_many, set_reserved_spot,
+)
 from faststream import Logger
 
+logger = logging.getLogger(__name__)
+
+# Tentativas de reserva quando outra transição altera o fluxo ao mesmo tempo
+RESERVE_MAX_ATTEMPTS = 3
+
 # ---------- Consulta de vagas ----------
-@broker.subscriber(topic.SPOT_CONSULT_REQUESTED)
-async def on_spot_consult_requested(msg: dict, logger: Logger):
-    cid = msg["checkInId"]
-    logger.info(f"[SpotConsumer] Evento recebido: {topic.SPOT_CONSULT_REQUESTED} | checkInId={cid}")
+async def _consult_batch(msgs: list):
+    """
+    Consulta um lote: o snapshot de disponibilidade de cada categoria é lido (ou
+    regravado) uma vez, e os fluxos guardam só a versão consultada. Fluxos e
+    eventos são gravados numa única transação
+    """
+    by_category = {}
+    patches = []
+    for msg in msgs:
+        cid = msg["checkInId"]
+        category = normalize_category(msg.get("vehicleCategory"))
+        current = by_category.get(category)
+        if current is None:
+            current = by_category[category] = await availability.current(category)
+        # sem vaga livre a resposta vai sem versão: a saga trata como consulta vazia
+        completed = with_event_id(
+            {
+                "checkInId": cid,
+                "vehicleCategory": msg.get("vehicleCategory"),
+                "spotsVersion": current.version if current.total else None,
+                "totalAvailable": current.total,
+            },
+            msg, topic.SPOT_CONSULT_COMPLETED,
+        )
+        # versão 0 (categoria desconhecida): sem snapshot, a API responde pela lista vazia do fluxo
+        patches.append(FlowPatch(cid, "spots_consulted", {"spotsVersion": current.version or None}, outbox=[OutgoingMessage(topic.SPOT_CONSULT_COMPLETED, completed)]))
+    await patch_status_many(patches)
+    logger.info("[SpotConsumer] Publicando %s para %d check-ins", topic.SPOT_CONSULT_COMPLETED, len(patches))
+
+consult_batcher = MicroBatcher("spot-consult", _consult_batch, settings.SPOT_BATCH_MAX_ITEMS, settings.SPOT_BATCH_WINDOW_MS)
 
-    # MOCK de vagas disponíveis
-    available_spots = [
-        {"spotId": "S-12", "level": "2", "position": "A3", "isAvailable": True, "reservedUntil": None},
-        {"spotId": "S-15", "level": "2", "position": "B1", "isAvailable": True, "reservedUntil": None},
-    ]
-    logger.info(f"[SpotConsumer] Vagas encontradas: {available_spots}")
+@partitioned_subscriber(broker, topic.SPOT_CONSULT_REQUESTED)
+async def on_spot_consult_requested(msg: dict, logger: Logger):
+    logger.info("[SpotConsumer] Evento recebido: %s | checkInId=%s", topic.SPOT_CONSULT_REQUESTED, msg["checkInId"])
+    # retorna (e confirma a mensagem) quando o lote em que ela entrou for gravado
+    await consult_batcher.submit(msg)
 
-    await save_spot_list(cid, available_spots)
+def _reserve_in_inventory(cid: str, category: str, consulted: list, taken: Optional[set] = None) -> dict:
+    """
+    Tenta as vagas consultadas na ordem (CAS no inventário) e, se todas já foram
+    tomadas por outros check-ins, qualquer vaga livre da categoria. Só fluxos
+    gravados antes dos snapshots de disponibilidade têm a lista de vagas; os
+    demais vão direto à primeira vaga livre, a mesma que a consulta listaria.
+    `taken` acumula as vagas já ocupadas dentro de um lote: check-ins que consultaram
+    a mesma lista não repetem as tentativas que já falharam.
+    """
+    until = time.time() + settings.SPOT_RESERVATION_TTL_S
+    for spot in consulted:
+        if taken is not None and spot["spotId"] in taken:
+            continue
+        reserved = inventory.reserve(spot["spotId"], cid, until)
+        if taken is not None:
+            taken.add(spot["spotId"])
+        if reserved:
+            return reserved
+    reserved = inventory.reserve_any(category, cid, until)
+    if reserved and taken is not None:
+        taken.add(reserved["spotId"])
+    return reserved
 
-    logger.info(f"[SpotConsumer] Publicando {topic.SPOT_CONSULT_COMPLETED} para checkInId={cid}")
-    await broker.publish(
-        {"checkInId": cid, "vehicleCategory": msg.get("vehicleCategory"), "spots": available_spots},
-        routing_key=topic.SPOT_CONSULT_COMPLETED,
+def _reserved_reply(msg: dict, spot) -> OutgoingMessage:
+    return OutgoingMessage(
+        topic.SPOT_RESERVED, with_event_id({"checkInId": msg["checkInId"], "spot": spot}, msg, topic.SPOT_RESERVED)
     )
 
 # ---------- Reserva automática de vaga ----------
-@broker.subscriber(topic.SPOT_RESERVE_REQUESTED)
-async def on_spot_reserve_requested(msg: dict, logger: Logger):
+async def _reserve_one(msg: dict, reserved_spot=None):
+    """
+    Reserva de um único check-in, relendo o fluxo a cada conflito de versão
+    (caminho dos itens que conflitaram dentro de um lote)
+    """
     cid = msg["checkInId"]
-    logger.info(f"[SpotConsumer] Evento recebido: {topic.SPOT_RESERVE_REQUESTED} | checkInId={cid}")
+    for _ in range(RESERVE_MAX_ATTEMPTS):
+        current = await get_status(cid) or {}
 
-    current = await get_status(cid)
+        # Caso já exista vaga reservada, evita duplicidade
+        if current.get("spot"):
+            previous = current["spot"]
+            if reserved_spot and reserved_spot["spotId"] != previous["spotId"]:
+                inventory.release(reserved_spot["spotId"], cid)
+            reserved_spot = previous
+            logger.warning("[SpotConsumer] Vaga já reservada previamente para checkInId=%s: %s", cid, reserved_spot["spotId"])
+            break
 
-    # Caso já exista vaga reservada, evita duplicidade
-    if current and current.get("spot"):
-        reserved_spot = current["spot"]
-        logger.warning(f"[SpotConsumer] Vaga já reservada previamente para checkInId={cid}: {reserved_spot}")
-    else:
-        spots = (current or {}).get("spots") or []
-        if not spots:
-            logger.error(f"[SpotConsumer] Nenhuma vaga disponível para checkInId={cid}")
-            await broker.publish({"checkInId": cid, "spot": None}, topic=topic.SPOT_RESERVED)
+        category = msg.get("vehicleCategory") or current.get("vehicleCategory")
+        reserved_spot = _reserve_in_inventory(cid, category, current.get("spots") or [])
+        if not reserved_spot:
+            logger.error("[SpotConsumer] Nenhuma vaga disponível para checkInId=%s", cid)
+            await relay.enqueue([_reserved_reply(msg, None)])
             return
 
-        reserved_spot = {**spots[0]}
-        reserved_spot["isAvailable"] = False
-        reserved_spot["reservedUntil"] = (datetime.utcnow() + timedelta(minutes=5)).isoformat() + "Z"
+        # Grava só se ninguém alterou o fluxo desde a leitura (compare-and-set pela versão);
+        # o evento de reserva entra no outbox na mesma transação
+        try:
+            await set_reserved_spot(
+                cid, reserved_spot, expected_version=current.get("version", 0),
+                outbox=[_reserved_reply(msg, reserved_spot)],
+            )
+        except VersionConflict:
+            logger.warning("[SpotConsumer] Transição concorrente para checkInId=%s, relendo o fluxo", cid)
+            continue
+
+        expiry.track(reserved_spot["spotId"], cid)
+        logger.info("[SpotConsumer] Vaga reservada com sucesso para checkInId=%s: %s", cid, reserved_spot["spotId"])
+        return
+    else:
+        if reserved_spot:
+            inventory.release(reserved_spot["spotId"], cid)
+        logger.error("[SpotConsumer] Não foi possível reservar vaga para checkInId=%s após %d tentativas", cid, RESERVE_MAX_ATTEMPTS)
+        return
+
+    # vaga já gravada no fluxo por uma entrega anterior: republica a confirmação
+    await relay.enqueue([_reserved_reply(msg, reserved_spot)])
 
-        await set_reserved_spot(cid, reserved_spot)
-        logger.info(f"[SpotConsumer] Vaga reservada com sucesso para checkInId={cid}: {reserved_spot}")
+async def _reserve_batch(msgs: list):
+    """
+    Reserva um lote: uma leitura dos fluxos, reservas no inventário em memória e
+    uma única transação com as gravações (compare-and-set por versão) e as respostas
+    """
+    current_by_cid = await get_statuses([msg["checkInId"] for msg in msgs])
+    patches, reserved, replies = [], [], []
+    taken = set()
+    for msg in msgs:
+        cid = msg["checkInId"]
+        current = current_by_cid.get(cid) or {}
 
-    logger.info(f"[SpotConsumer] Publicando {topic.SPOT_RESERVED} para checkInId={cid}")
-    await broker.publish({"checkInId": cid, "spot": reserved_spot}, routing_key=topic.SPOT_RESERVED)
+        # vaga já gravada no fluxo por uma entrega anterior: republica a confirmação
+        if current.get("spot"):
+            logger.warning("[SpotConsumer] Vaga já reservada previamente para checkInId=%s: %s", cid, current["spot"]["spotId"])
+            replies.append(_reserved_reply(msg, current["spot"]))
+            continue
+
+        category = msg.get("vehicleCategory") or current.get("vehicleCategory")
+        reserved_spot = _reserve_in_inventory(cid, category, current.get("spots") or [], taken)
+        if not reserved_spot:
+            logger.error("[SpotConsumer] Nenhuma vaga disponível para checkInId=%s", cid)
+            replies.append(_reserved_reply(msg, None))
+            continue
+
+        patches.append(FlowPatch(
+            cid, "spot_reserved", {"spot": reserved_spot}, current.get("version", 0),
+            [_reserved_reply(msg, reserved_spot)],
+        ))
+        reserved.append((msg, reserved_spot))
+
+    results = await patch_status_many(patches, replies)
+    for (msg, reserved_spot), result in zip(reserved, results):
+        cid = msg["checkInId"]
+        if isinstance(result, VersionConflict):
+            logger.warning("[SpotConsumer] Transição concorrente para checkInId=%s, relendo o fluxo", cid)
+            await _reserve_one(msg, reserved_spot)
+            continue
+        expiry.track(reserved_spot["spotId"], cid)
+    logger.info("[SpotConsumer] %d vagas reservadas num lote de %d pedidos", len(reserved), len(msgs))
+
+reserve_batcher = MicroBatcher("spot-reserve", _reserve_batch, settings.SPOT_BATCH_MAX_ITEMS, settings.SPOT_BATCH_WINDOW_MS)
+
+@partitioned_subscriber(broker, topic.SPOT_RESERVE_REQUESTED)
+async def on_spot_reserve_requested(msg: dict, logger: Logger):
+    logger.info("[SpotConsumer] Evento recebido: %s | checkInId=%s", topic.SPOT_RESERVE_REQUESTED, msg["checkInId"])
+    await reserve_batcher.submit(msg)
+
+# ---------- Liberação de vaga (compensação da saga) ----------
+@partitioned_subscriber(broker, topic.SPOT_RELEASE_REQUESTED)
+async def on_spot_release_requested(msg: dict, logger: Logger):
+    cid = msg["checkInId"]
+    spot_id = (msg.get("spot") or {}).get("spotId")
+    logger.info("[SpotConsumer] Evento recebido: %s | checkInId=%s vaga=%s", topic.SPOT_RELEASE_REQUESTED, cid, spot_id)
+    if not spot_id:
+        return
+
+    released = OutgoingMessage(
+        topic.SPOT_RELEASED,
+        with_event_id({"checkInId": cid, "spotId": spot_id, "reason": msg.get("reason", "compensation")}, msg, topic.SPOT_RELEASED),
+    )
+    current = await get_status(cid) or {}
+    if (current.get("spot") or {}).get("spotId") == spot_id:
+        # o status fica como a saga deixou (ex.: checkin_failed); só a vaga sai do fluxo
+        await patch_status(cid, None, {"spot": None}, outbox=[released])
+    else:
+        await relay.enqueue([released])
+    inventory.release(spot_id, cid)
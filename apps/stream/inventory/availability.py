@@ -0,0 +1,115 @@
+# apps/stream/inventory/availability.py
+import asyncio, json, logging
+from typing import Dict, NamedTuple, Optional
+
+from core.config import settings
+from apps.stream.messaging.partitioning import owns
+from apps.stream.inventory.spot_inventory import SpotInventory, inventory, normalize_category
+from apps.stream.read_models.availability_repo import load_versions, save_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class Availability(NamedTuple):
+    version: int  # 0: categoria fora do inventário, sem snapshot
+    total: int  # vagas livres da categoria na versão
+
+
+class AvailabilitySnapshots:
+    """
+    Snapshot versionado da disponibilidade de cada categoria, compartilhado por
+    todos os check-ins da categoria: o fluxo guarda só a versão que consultou, e
+    a API serve o JSON gravado aqui (com ETag derivado da versão).
+
+    O inventário conta as reservas e liberações de cada categoria; uma categoria
+    cujo contador mudou desde o último snapshot ganha uma versão nova na próxima
+    consulta ou no próximo tick (`interval_s`), o que vier antes. Várias mudanças
+    entre dois snapshots viram uma versão só, e remontar o snapshot custa
+    `limit` vagas lidas das free-lists, não a categoria inteira.
+
+    Só as categorias deste processo (partição dona) são gravadas.
+    """
+
+    def __init__(self, inventory: SpotInventory, limit: int, interval_s: float):
+        self._inventory = inventory
+        self._limit = limit
+        self._interval_s = interval_s
+        self._versions: Dict[str, int] = {}
+        # categoria -> contador de mudanças do inventário na versão gravada
+        self._synced: Dict[str, int] = {}
+        self._totals: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self.snapshots = 0
+
+    async def warm_up(self):
+        # versões seguem de onde pararam: ETags antigos nunca voltam a valer
+        self._versions = await load_versions()
+        self._synced.clear()
+
+    async def current(self, category: str) -> Availability:
+        """
+        Versão atual da categoria, gravando um snapshot novo se a disponibilidade mudou.
+        Categoria que o inventário não conhece não ganha snapshot (nem lock): a
+        categoria vem do check-in e não pode encher o store de chaves arbitrárias.
+        """
+        category = normalize_category(category)
+        if not self._inventory.has_category(category):
+            return Availability(0, 0)
+        lock = self._locks.get(category)
+        if lock is None:
+            lock = self._locks[category] = asyncio.Lock()
+        async with lock:
+            changes = self._inventory.changes(category)
+            if self._synced.get(category) == changes:
+                return Availability(self._versions[category], self._totals[category])
+
+            version = self._versions.get(category, 0) + 1
+            total = self._inventory.count_available(category)
+            body = json.dumps(
+                {"totalAvailable": total, "spots": self._inventory.available(category, limit=self._limit)},
+                ensure_ascii=False, separators=(",", ":"),
+            )
+            await save_snapshot(category, version, body)
+            self._versions[category], self._synced[category], self._totals[category] = version, changes, total
+            self.snapshots += 1
+            return Availability(version, total)
+
+    async def refresh(self):
+        """
+        Grava os snapshots das categorias deste processo que mudaram
+        """
+        for category in self._inventory.categories():
+            if owns(category) and self._synced.get(category) != self._inventory.changes(category):
+                await self.current(category)
+
+    async def start(self):
+        await self.warm_up()
+        await self.refresh()
+        if self._interval_s > 0:
+            self._task = asyncio.create_task(self._run(), name="availability-snapshots")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._interval_s)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("[Availability] Falha ao gravar snapshots de disponibilidade")
+
+
+availability = AvailabilitySnapshots(
+    inventory,
+    limit=settings.SPOT_CONSULT_LIMIT,
+    interval_s=settings.SPOT_SNAPSHOT_INTERVAL_S,
+)
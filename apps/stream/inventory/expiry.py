@@ -0,0 +1,147 @@
+# apps/stream/inventory/expiry.py
+import asyncio, heapq, logging, time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from core.config import settings
+from apps.stream.messaging import topic
+from apps.stream.messaging.partitioning import checkin_lock, owns
+from apps.stream.messaging.outbox import OutgoingMessage, relay
+from apps.stream.messaging.dedup import with_event_id
+from apps.stream.inventory.spot_inventory import SpotInventory, inventory
+from apps.stream.read_models.flow_status_repo import VersionConflict, get_status, list_held_spots
+from apps.stream.saga.checkin_saga import checkin_saga
+from apps.stream.saga.engine import SagaConflict
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_iso(value: Optional[str]) -> float:
+    if not value:
+        return 0.0
+    return datetime.fromisoformat(value.rstrip("Z")).replace(tzinfo=timezone.utc).timestamp()
+
+
+class ReservationExpiry:
+    """
+    Libera reservas vencidas.
+
+    As reservas ativas ficam num min-heap por reservedUntil; a cada tick só o topo
+    vencido é examinado, nunca a tabela inteira. Entradas obsoletas (vaga já liberada
+    ou reservada de novo) são descartadas ao sair do heap.
+
+    Uma reserva vencida encerra a saga do check-in (SagaEngine.abort), sob o
+    lock do checkInId: o status final, a saga e o evento de liberação são
+    gravados juntos, e respostas que cheguem depois (robô designado) são
+    descartadas pela saga.
+    """
+
+    def __init__(self, inventory: SpotInventory, interval_s: float, batch: int):
+        self._inventory = inventory
+        self._interval_s = interval_s
+        self._batch = batch
+        # (reservedUntil, spotId, checkInId)
+        self._heap: List[Tuple[float, str, str]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def track(self, spot_id: str, check_in_id: str):
+        reservation = self._inventory.reservation(spot_id)
+        if reservation and reservation[0] == check_in_id:
+            heapq.heappush(self._heap, (reservation[1], spot_id, check_in_id))
+
+    async def rebuild(self):
+        """
+        Restaura no inventário as vagas presas a fluxos do read model e indexa as
+        que ainda estão em `spot_reserved`
+        """
+        self._heap = []
+        for cid, status, spot in await list_held_spots():
+            # no modo particionado, cada processo só restaura as categorias que consome
+            if not owns(self._inventory.category_of(spot["spotId"]) or ""):
+                continue
+            until = _parse_iso(spot.get("reservedUntil"))
+            if not self._inventory.reserve(spot["spotId"], cid, until):
+                logger.warning("[Expiry] Vaga %s do fluxo %s já está ocupada", spot["spotId"], cid)
+                continue
+            if status == "spot_reserved":
+                self._heap.append((until, spot["spotId"], cid))
+        heapq.heapify(self._heap)
+        logger.info("[Expiry] %d reservas ativas indexadas", len(self._heap))
+
+    async def start(self):
+        await self.rebuild()
+        self._task = asyncio.create_task(self._run(), name="reservation-expiry")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            expired = self._pop_expired(time.time())
+            if expired:
+                try:
+                    await self._release(expired)
+                except Exception:
+                    logger.exception("[Expiry] Falha ao liberar lote de %d reservas", len(expired))
+            if len(expired) < self._batch:
+                await asyncio.sleep(self._interval_s)
+
+    def _pop_expired(self, now: float) -> List[Tuple[float, str, str]]:
+        expired = []
+        while self._heap and self._heap[0][0] <= now and len(expired) < self._batch:
+            until, spot_id, cid = heapq.heappop(self._heap)
+            # descarta entradas obsoletas
+            if self._inventory.reservation(spot_id) == (cid, until):
+                expired.append((until, spot_id, cid))
+        return expired
+
+    async def _release(self, expired: List[Tuple[float, str, str]]):
+        released, orphans = 0, []
+        for until, spot_id, cid in expired:
+            async with checkin_lock(cid):
+                # a resposta do passo seguinte pode ter sido tratada enquanto esperava o lock
+                if self._inventory.reservation(spot_id) != (cid, until):
+                    continue
+                current = await get_status(cid)
+                if current and current.get("status") != "spot_reserved":
+                    # o fluxo avançou (ex.: robô designado): a vaga segue ocupada
+                    continue
+                event = OutgoingMessage(
+                    topic.SPOT_RELEASED, with_event_id({"checkInId": cid, "spotId": spot_id, "reason": "expired"})
+                )
+                if current:
+                    # status final, fim da saga e evento de liberação na mesma transação (outbox)
+                    try:
+                        await checkin_saga.abort(
+                            cid, "reservation_expired", {"spot": None},
+                            outbox=[event], expected_version=current["version"],
+                        )
+                    except (VersionConflict, SagaConflict):
+                        # o fluxo ou a saga mudou entre a leitura e a escrita; reavalia no próximo tick
+                        self.track(spot_id, cid)
+                        continue
+                else:
+                    orphans.append(event)
+                self._inventory.release(spot_id, cid)
+                released += 1
+
+        if orphans:
+            await relay.enqueue(orphans)
+        if released:
+            logger.info("[Expiry] %d reservas vencidas liberadas", released)
+
+
+expiry = ReservationExpiry(
+    inventory,
+    interval_s=settings.SPOT_EXPIRY_INTERVAL_S,
+    batch=settings.SPOT_EXPIRY_BATCH,
+)
@@ -0,0 +1,259 @@
+# apps/stream/inventory/robot_dispatch.py
+import asyncio, logging, time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from apps.stream.messaging import topic
+from apps.stream.messaging.outbox import OutgoingMessage, relay
+from apps.stream.messaging.dedup import with_event_id
+from apps.stream.inventory.robot_fleet import RobotFleet, fleet
+from apps.stream.inventory.spot_inventory import grid_position
+
+logger = logging.getLogger(__name__)
+
+# Desconto no custo por segundo de espera (em casas do grid): pedidos antigos
+# acabam atendidos mesmo quando há vagas mais próximas dos robôs livres
+AGE_WEIGHT = 1.0
+
+
+def min_cost_matching(cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Emparelhamento de custo mínimo numa matriz retangular (algoritmo húngaro com
+    caminhos aumentantes mais curtos). Devolve (linhas, colunas) emparelhadas;
+    são min(n, m) pares. O laço Python roda O(min(n, m)²) vezes e cada volta é
+    uma operação vetorizada sobre o lado maior.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+    if n == 0:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty
+
+    # índices 1-based como na formulação clássica; coluna 0 é a raiz da busca
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=np.intp)  # linha emparelhada a cada coluna (0 = livre)
+    way = np.zeros(m + 1, dtype=np.intp)
+    for i in range(1, n + 1):
+        owner[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = owner[j0]
+            free = ~used
+            free[0] = False
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free[1:] & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free[1:], minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            u[owner[used]] += delta
+            v[used] -= delta
+            minv[free] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+
+    cols = np.nonzero(owner[1:])[0]
+    rows = owner[1:][cols] - 1
+    if transposed:
+        rows, cols = cols, rows
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+def travel_costs(robot_xy: np.ndarray, spot_xy: np.ndarray) -> np.ndarray:
+    """
+    Distância Manhattan no grid (fila, coluna) entre cada robô e cada vaga
+    """
+    return np.abs(robot_xy[:, None, :] - spot_xy[None, :, :]).sum(axis=2).astype(np.float64)
+
+
+class _Pending:
+    __slots__ = ("msg", "level", "xy", "received_at")
+
+    def __init__(self, msg: Dict[str, Any], level: Optional[int], xy: Tuple[int, int], received_at: float):
+        self.msg = msg
+        self.level = level
+        self.xy = xy
+        self.received_at = received_at
+
+
+class _Problem(NamedTuple):
+    """
+    Emparelhamento de um nível: pedidos (colunas) x robôs livres (linhas)
+    """
+
+    cids: List[str]
+    robots: List[str]
+    cost: Optional[np.ndarray]
+
+
+def _solve(problems: List[_Problem]):
+    empty = np.empty(0, dtype=np.intp)
+    return [(empty, empty) if p.cost is None else min_cost_matching(p.cost) for p in problems]
+
+
+class RobotDispatcher:
+    """
+    Designa robôs em lote.
+
+    Os pedidos se acumulam por uma janela curta (ou até encher o lote) e cada
+    nível é resolvido como um emparelhamento de custo mínimo entre robôs livres
+    e vagas reservadas, com a matriz de distâncias montada em NumPy a partir de
+    `level`/`position`. Pedidos sem robô livre ficam para a próxima janela e são
+    respondidos com robot=None após `max_wait_s`, devolvendo a decisão à saga.
+    """
+
+    def __init__(self, fleet: RobotFleet, window_s: float, max_batch: int, max_wait_s: float, task_s: float):
+        self._fleet = fleet
+        self._window_s = window_s
+        self._max_batch = max_batch
+        self._max_wait_s = max_wait_s
+        self._task_s = task_s
+        # checkInId -> pedido (um pedido repetido substitui o anterior)
+        self._pending: Dict[str, _Pending] = {}
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.batches = 0
+        self.assigned = 0
+        self.expired = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def submit(self, msg: Dict[str, Any], now: Optional[float] = None):
+        spot = msg.get("spot") or {}
+        try:
+            level = int(spot.get("level"))
+        except (TypeError, ValueError):
+            level = None
+        previous = self._pending.get(msg["checkInId"])
+        received_at = previous.received_at if previous else (now or time.time())
+        self._pending[msg["checkInId"]] = _Pending(msg, level, grid_position(spot.get("position")), received_at)
+        self._wakeup.set()
+        if len(self._pending) >= self._max_batch:
+            self._full.set()
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run(), name="robot-dispatch")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            # janela de coleta: encerra antes se o lote encher
+            try:
+                await asyncio.wait_for(self._full.wait(), self._window_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self._full.clear()
+            try:
+                now = time.time()
+                replies, problems = self._collect(now)
+                # lotes grandes levam segundos: o emparelhamento roda fora do loop
+                matches = await asyncio.to_thread(_solve, problems) if problems else []
+                replies += self._apply(problems, matches, now)
+                if replies:
+                    await self._publish(replies)
+            except Exception:
+                logger.exception("[Dispatch] Falha ao resolver lote de %d pedidos", len(self._pending))
+            if self._pending:
+                # pedidos aguardando robô: tenta de novo na próxima janela
+                self._wakeup.set()
+
+    def plan(self, now: float) -> List[Tuple[Dict[str, Any], Optional[dict]]]:
+        """
+        Resolve os pedidos pendentes; devolve (pedido, robô ou None) dos que foram decididos
+        """
+        replies, problems = self._collect(now)
+        return replies + self._apply(problems, _solve(problems), now)
+
+    def _collect(self, now: float) -> Tuple[List[Tuple[Dict[str, Any], Optional[dict]]], List[_Problem]]:
+        replies: List[Tuple[Dict[str, Any], Optional[dict]]] = []
+        by_level: Dict[Optional[int], List[str]] = {}
+        for cid, pending in list(self._pending.items())[: self._max_batch]:
+            # reentrega de um pedido já atendido: responde com o mesmo robô
+            current = self._fleet.held_by(cid, now)
+            if current is not None:
+                replies.append((self._pending.pop(cid).msg, current))
+                continue
+            by_level.setdefault(pending.level, []).append(cid)
+
+        problems = []
+        for level, cids in by_level.items():
+            robots = self._fleet.free(level, now) if level is not None else []
+            if not robots:
+                problems.append(_Problem(cids, robots, None))
+                continue
+            robot_xy = np.array([self._fleet.position(r) for r in robots], dtype=np.int64)
+            spot_xy = np.array([self._pending[cid].xy for cid in cids], dtype=np.int64)
+            waited = now - np.fromiter((self._pending[cid].received_at for cid in cids), dtype=np.float64, count=len(cids))
+            problems.append(_Problem(cids, robots, travel_costs(robot_xy, spot_xy) - AGE_WEIGHT * waited[None, :]))
+        if by_level:
+            self.batches += 1
+        return replies, problems
+
+    def _apply(self, problems: List[_Problem], matches, now: float) -> List[Tuple[Dict[str, Any], Optional[dict]]]:
+        replies: List[Tuple[Dict[str, Any], Optional[dict]]] = []
+        for problem, (rows, cols) in zip(problems, matches):
+            for r, c in zip(rows, cols):
+                pending = self._pending.pop(problem.cids[c], None)
+                if pending is None:
+                    continue
+                spot = pending.msg.get("spot") or {}
+                robot = self._fleet.assign(problem.robots[r], problem.cids[c], now, now + self._task_s, spot.get("position"))
+                replies.append((pending.msg, robot))
+                self.assigned += 1
+
+            for cid in problem.cids:
+                pending = self._pending.get(cid)
+                if pending is not None and now - pending.received_at >= self._max_wait_s:
+                    replies.append((self._pending.pop(cid).msg, None))
+                    self.expired += 1
+        return replies
+
+    async def _publish(self, replies: List[Tuple[Dict[str, Any], Optional[dict]]]):
+        # robot=None é a resposta de falha: a saga decide se tenta de novo ou compensa
+        await relay.enqueue([
+            OutgoingMessage(
+                topic.ROBOT_ASSIGNED,
+                with_event_id({"checkInId": msg["checkInId"], "robot": robot}, msg, topic.ROBOT_ASSIGNED),
+            )
+            for msg, robot in replies
+        ])
+        assigned = sum(1 for _, robot in replies if robot)
+        logger.info("[Dispatch] Lote resolvido: %d robôs designados, %d pedidos sem robô", assigned, len(replies) - assigned)
+
+
+dispatcher = RobotDispatcher(
+    fleet,
+    window_s=settings.ROBOT_DISPATCH_WINDOW_MS / 1000,
+    max_batch=settings.ROBOT_DISPATCH_MAX_BATCH,
+    max_wait_s=settings.ROBOT_DISPATCH_MAX_WAIT_S,
+    task_s=settings.ROBOT_TASK_S,
+)
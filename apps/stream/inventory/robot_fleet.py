@@ -0,0 +1,107 @@
+# apps/stream/inventory/robot_fleet.py
+import math, threading
+from typing import Dict, List, Optional, Tuple
+
+from core.config import settings
+from apps.stream.inventory.spot_inventory import _iso, grid_label, grid_position
+
+
+class RobotFleet:
+    """
+    Frota de robôs manobristas em memória, agrupada por nível.
+
+    Cada robô atende um único nível e fica ocupado por um tempo fixo após ser
+    designado (`busy_until`); não há timer por robô, a disponibilidade é
+    decidida comparando `busy_until` com o instante da designação. Ao concluir
+    uma tarefa o robô fica na posição da vaga que atendeu.
+    """
+
+    def __init__(self):
+        self._by_level: Dict[int, List[str]] = {}
+        self._level_of: Dict[str, int] = {}
+        self._position: Dict[str, Tuple[int, int]] = {}
+        self._busy_until: Dict[str, float] = {}
+        self._holders: Dict[str, str] = {}
+        self._by_holder: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_layout(cls, levels: int, robots_per_level: int, spots_per_level: int) -> "RobotFleet":
+        """
+        Distribui os robôs de cada nível ao longo das filas do layout, na coluna 1
+        """
+        rows = max(1, math.ceil(spots_per_level / 10))
+        fleet = cls()
+        for level in range(1, levels + 1):
+            for n in range(robots_per_level):
+                fleet.add_robot(f"R{level}-{n + 1:02d}", level, grid_label(n * rows // robots_per_level, 0))
+        return fleet
+
+    def __len__(self):
+        return len(self._level_of)
+
+    def add_robot(self, robot_id: str, level: int, position: str = "A1"):
+        with self._lock:
+            if robot_id in self._level_of:
+                raise ValueError(f"Robô duplicado: {robot_id}")
+            self._by_level.setdefault(level, []).append(robot_id)
+            self._level_of[robot_id] = level
+            self._position[robot_id] = grid_position(position)
+            self._busy_until[robot_id] = 0.0
+
+    # ---------- Consulta ----------
+
+    def to_dict(self, robot_id: str) -> dict:
+        return {
+            "robotId": robot_id,
+            "level": str(self._level_of[robot_id]),
+            "position": grid_label(*self._position[robot_id]),
+            "busyUntil": _iso(self._busy_until[robot_id]),
+        }
+
+    def levels(self) -> List[int]:
+        return sorted(self._by_level)
+
+    def position(self, robot_id: str) -> Tuple[int, int]:
+        return self._position[robot_id]
+
+    def free(self, level: int, now: float) -> List[str]:
+        return [r for r in self._by_level.get(level, ()) if self._busy_until[r] <= now]
+
+    def held_by(self, holder: str, now: Optional[float] = None) -> Optional[dict]:
+        """
+        Robô ainda ocupado com `holder` (com `now`, ignora tarefas já encerradas)
+        """
+        robot_id = self._by_holder.get(holder)
+        if robot_id is None or (now is not None and self._busy_until[robot_id] <= now):
+            return None
+        return self.to_dict(robot_id)
+
+    # ---------- Designação (compare-and-set) ----------
+
+    def assign(self, robot_id: str, holder: str, now: float, busy_until: float, position: Optional[str] = None) -> Optional[dict]:
+        """
+        Livre -> ocupado para o robô indicado; None se ele já estiver ocupado com outro.
+        O robô termina a tarefa em `position` (a vaga atendida).
+        """
+        with self._lock:
+            if robot_id not in self._level_of:
+                return None
+            if self._busy_until[robot_id] > now:
+                return self.to_dict(robot_id) if self._holders.get(robot_id) == holder else None
+            previous = self._holders.get(robot_id)
+            if previous is not None:
+                self._by_holder.pop(previous, None)
+            self._busy_until[robot_id] = busy_until
+            self._holders[robot_id] = holder
+            self._by_holder[holder] = robot_id
+            if position is not None:
+                self._position[robot_id] = grid_position(position)
+            return self.to_dict(robot_id)
+
+
+fleet = RobotFleet.from_layout(
+    settings.SPOT_LEVELS,
+    settings.ROBOTS_PER_LEVEL,
+    settings.SPOTS_PER_LEVEL_PER_CATEGORY,
+)
@@ -0,0 +1,254 @@
+# apps/stream/inventory/spot_inventory.py
+import string, threading
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.config import settings
+
+# Estados possíveis de uma vaga
+FREE, RESERVED = 0, 1
+
+
+def normalize_category(category: Optional[str]) -> str:
+    return (category or "").strip().lower()
+
+
+def grid_position(position: Optional[str]) -> Tuple[int, int]:
+    """
+    (fila, coluna) a partir da posição gerada pelo layout (`"C7"` -> (2, 6)); (0, 0) se inválida
+    """
+    if not position or not position[0].isalpha() or not position[1:].isdigit():
+        return 0, 0
+    return ord(position[0].upper()) - ord("A"), int(position[1:]) - 1
+
+
+def grid_label(row: int, col: int) -> str:
+    return f"{string.ascii_uppercase[row % 26]}{col + 1}"
+
+
+def _iso(ts: float) -> Optional[str]:
+    if not ts:
+        return None
+    return datetime.fromtimestamp(ts, tz=timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+
+
+class SpotInventory:
+    """
+    Inventário de vagas em memória.
+
+    Cada vaga é um índice inteiro em arrays paralelos (estado, nível, categoria,
+    validade da reserva), sem um objeto Python por vaga. As vagas livres ficam em
+    free-lists por (categoria, nível): reservar e liberar são O(1).
+    Toda mudança de estado é um compare-and-set feito sob um lock, sem `await`
+    no meio, portanto atômica também entre consumers concorrentes.
+    """
+
+    def __init__(self):
+        self._ids: List[str] = []
+        self._positions: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._levels = array("H")
+        self._category_codes = array("B")
+        self._state = array("B")
+        self._reserved_until = array("d")
+        self._holders: List[Optional[str]] = []
+        self._by_holder: Dict[str, int] = {}
+
+        self._categories: List[str] = []
+        self._category_index: Dict[str, int] = {}
+        # categoria -> nível -> conjunto ordenado (dict) de índices livres
+        self._free: Dict[int, Dict[int, Dict[int, None]]] = {}
+        # categoria -> número de reservas e liberações (detecta snapshots de disponibilidade obsoletos)
+        self._changes: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_layout(cls, levels: int, categories: Iterable[str], spots_per_level: int) -> "SpotInventory":
+        """
+        Gera o layout: para cada nível e categoria, `spots_per_level` vagas em filas de 10
+        """
+        inventory = cls()
+        for level in range(1, levels + 1):
+            for category in categories:
+                prefix = normalize_category(category)[:3].upper()
+                for n in range(spots_per_level):
+                    row, col = divmod(n, 10)
+                    inventory.add_spot(
+                        f"L{level}-{prefix}-{n + 1:03d}",
+                        category,
+                        level,
+                        grid_label(row, col),
+                    )
+        return inventory
+
+    def __len__(self):
+        return len(self._ids)
+
+    # ---------- Cadastro ----------
+
+    def _category_code(self, category: str) -> int:
+        category = normalize_category(category)
+        code = self._category_index.get(category)
+        if code is None:
+            code = len(self._categories)
+            self._categories.append(category)
+            self._category_index[category] = code
+            self._free[code] = {}
+            self._changes[code] = 0
+        return code
+
+    def add_spot(self, spot_id: str, category: str, level: int, position: str):
+        with self._lock:
+            if spot_id in self._index:
+                raise ValueError(f"Vaga duplicada: {spot_id}")
+            idx = len(self._ids)
+            code = self._category_code(category)
+            self._ids.append(spot_id)
+            self._positions.append(position)
+            self._index[spot_id] = idx
+            self._levels.append(level)
+            self._category_codes.append(code)
+            self._state.append(FREE)
+            self._reserved_until.append(0.0)
+            self._holders.append(None)
+            self._free[code].setdefault(level, {})[idx] = None
+            self._changes[code] += 1
+
+    # ---------- Consulta ----------
+
+    def to_dict(self, idx: int) -> dict:
+        return {
+            "spotId": self._ids[idx],
+            "level": str(self._levels[idx]),
+            "position": self._positions[idx],
+            "isAvailable": self._state[idx] == FREE,
+            "reservedUntil": _iso(self._reserved_until[idx]),
+        }
+
+    def get(self, spot_id: str) -> Optional[dict]:
+        idx = self._index.get(spot_id)
+        return None if idx is None else self.to_dict(idx)
+
+    def category_of(self, spot_id: str) -> Optional[str]:
+        idx = self._index.get(spot_id)
+        return None if idx is None else self._categories[self._category_codes[idx]]
+
+    def available(self, category: str, level: Optional[int] = None, limit: Optional[int] = None) -> List[dict]:
+        code = self._category_index.get(normalize_category(category))
+        if code is None:
+            return []
+        spots = []
+        with self._lock:
+            by_level = self._free[code]
+            levels = [level] if level is not None else sorted(by_level)
+            for lvl in levels:
+                for idx in by_level.get(lvl, ()):
+                    if limit is not None and len(spots) >= limit:
+                        return spots
+                    spots.append(self.to_dict(idx))
+        return spots
+
+    def categories(self) -> List[str]:
+        return list(self._categories)
+
+    def has_category(self, category: str) -> bool:
+        return normalize_category(category) in self._category_index
+
+    def changes(self, category: str) -> int:
+        """
+        Contador de mudanças de disponibilidade da categoria (só cresce)
+        """
+        code = self._category_index.get(normalize_category(category))
+        return 0 if code is None else self._changes[code]
+
+    def count_available(self, category: str) -> int:
+        code = self._category_index.get(normalize_category(category))
+        if code is None:
+            return 0
+        return sum(len(free) for free in self._free[code].values())
+
+    def reservation(self, spot_id: str) -> Optional[Tuple[str, float]]:
+        """
+        (holder, reservedUntil em epoch) da vaga, ou None se estiver livre
+        """
+        idx = self._index.get(spot_id)
+        if idx is None or self._state[idx] == FREE:
+            return None
+        return self._holders[idx], self._reserved_until[idx]
+
+    def held_by(self, holder: str) -> Optional[dict]:
+        idx = self._by_holder.get(holder)
+        return None if idx is None else self.to_dict(idx)
+
+    # ---------- Reserva / liberação (compare-and-set) ----------
+
+    def _take(self, idx: int, holder: str, until: float):
+        self._free[self._category_codes[idx]][self._levels[idx]].pop(idx)
+        self._changes[self._category_codes[idx]] += 1
+        self._state[idx] = RESERVED
+        self._holders[idx] = holder
+        self._reserved_until[idx] = until
+        self._by_holder[holder] = idx
+
+    def reserve(self, spot_id: str, holder: str, until: float) -> Optional[dict]:
+        """
+        FREE -> RESERVED para a vaga indicada. Idempotente para o mesmo `holder`;
+        retorna None se a vaga não existe ou já pertence a outro.
+        """
+        with self._lock:
+            idx = self._index.get(spot_id)
+            if idx is None:
+                return None
+            if self._state[idx] != FREE:
+                return self.to_dict(idx) if self._holders[idx] == holder else None
+            if holder in self._by_holder:
+                return None
+            self._take(idx, holder, until)
+            return self.to_dict(idx)
+
+    def reserve_any(self, category: str, holder: str, until: float, level: Optional[int] = None) -> Optional[dict]:
+        """
+        Reserva a primeira vaga livre da categoria (opcionalmente de um nível).
+        Se o `holder` já tem vaga, devolve a mesma.
+        """
+        code = self._category_index.get(normalize_category(category))
+        with self._lock:
+            current = self._by_holder.get(holder)
+            if current is not None:
+                return self.to_dict(current)
+            if code is None:
+                return None
+            by_level = self._free[code]
+            for lvl in ([level] if level is not None else sorted(by_level)):
+                free = by_level.get(lvl)
+                if free:
+                    idx = next(iter(free))
+                    self._take(idx, holder, until)
+                    return self.to_dict(idx)
+            return None
+
+    def release(self, spot_id: str, holder: Optional[str] = None) -> bool:
+        """
+        RESERVED -> FREE. Com `holder`, só libera se a vaga ainda pertencer a ele.
+        """
+        with self._lock:
+            idx = self._index.get(spot_id)
+            if idx is None or self._state[idx] == FREE:
+                return False
+            if holder is not None and self._holders[idx] != holder:
+                return False
+            self._by_holder.pop(self._holders[idx], None)
+            self._state[idx] = FREE
+            self._holders[idx] = None
+            self._reserved_until[idx] = 0.0
+            self._free[self._category_codes[idx]][self._levels[idx]][idx] = None
+            self._changes[self._category_codes[idx]] += 1
+            return True
+
+
+inventory = SpotInventory.from_layout(
+    settings.SPOT_LEVELS,
+    settings.SPOT_CATEGORIES,
+    settings.SPOTS_PER_LEVEL_PER_CATEGORY,
+)
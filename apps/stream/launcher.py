@@ -0,0 +1,57 @@
+"""
+Sobe N workers FastStream particionados na mesma máquina.
+
+Cada processo recebe WORKER_PARTITIONS=N e WORKER_PARTITION=k e consome apenas
+as filas `<tópico>.p<k>`; as mensagens de um checkInId caem sempre na mesma partição.
+
+Uso:
+    python -m apps.stream.launcher --workers 4 --prefetch 32
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inicia workers particionados")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--prefetch", type=int, default=None, help="WORKER_PREFETCH por partição")
+    args = parser.parse_args()
+
+    procs = []
+    for partition in range(args.workers):
+        env = {
+            **os.environ,
+            "WORKER_PARTITIONS": str(args.workers),
+            "WORKER_PARTITION": str(partition),
+        }
+        if args.prefetch is not None:
+            env["WORKER_PREFETCH"] = str(args.prefetch)
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "faststream", "run", "apps.stream.main:app"],
+            env=env,
+        ))
+        print(f"[Launcher] Worker da partição {partition} iniciado (pid={procs[-1].pid})")
+
+    def stop(signum, frame):
+        for proc in procs:
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    # se um worker cair, derruba os demais: partição sem consumidor para o fluxo
+    while all(proc.poll() is None for proc in procs):
+        time.sleep(0.5)
+    stop(None, None)
+    for proc in procs:
+        proc.wait()
+    sys.exit(max(proc.returncode or 0 for proc in procs))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,82 @@
 from faststream import FastStream
 from apps.stream.utils.connection import broker
+from apps.stream.messaging.outbox import relay
+from apps.stream.inventory.expiry import expiry
+from apps.stream.inventory.availability import availability
+from apps.stream.inventory.robot_dispatch import dispatcher
+from apps.stream.messaging.dedup import processed_events
+from apps.stream.messaging.event_log import event_log
+from apps.stream.messaging.status_fanout import FLOW_STATUS_EXCHANGE, status_change_event
+from apps.stream.read_models.flow_status_repo import add_change_listener
+from apps.stream.read_models.rebuild import snapshots
+from apps.stream.read_models.reconcile import reconciler
+from apps.stream.read_models.retention import retention
+from apps.stream.saga.checkin_saga import checkin_saga
+from core.config import settings
+from core.metrics import metrics_server
 
 
 # Importa os consumers para que eles sejam registrados automaticamente
 from apps.stream.consumers import orchestrator
 from apps.stream.consumers import spot_consumer
+from apps.stream.consumers import robot_consumer
 
 app = FastStream(broker)
 
+
+@add_change_listener
+async def publish_status_change(check_in_id: str, status: str, version: int, data: dict):
+    # toda transição gravada no read model vai para o fanout consumido pela API. Aviso
+    # de melhor esforço, publicado depois do commit: se o broker falhar, o repositório só
+    # registra o erro (a transição já é durável) e a API segue pelo read model (TTL do cache)
+    await broker.publish(
+        status_change_event(check_in_id, status, version, data),
+        exchange=FLOW_STATUS_EXCHANGE,
+    )
+
+
+@app.on_startup
+async def restore_state():
+    # reconstrói inventário, índice de expiração, filtro de duplicidade e sagas antes de consumir mensagens
+    await expiry.start()
+    # depois das reservas restauradas: o primeiro snapshot já reflete o inventário real
+    await availability.start()
+    await processed_events.start()
+    await checkin_saga.start()
+    await dispatcher.start()
+
+
+@app.after_startup
+async def start_relay():
+    await relay.start(broker)
+    # snapshots, contadores e retenção cobrem todas as partições: basta um processo cuidar deles
+    if settings.WORKER_PARTITION in (None, 0):
+        await snapshots.start()
+        await reconciler.start()
+        await retention.start()
+
+
+@app.after_startup
+async def start_metrics():
+    if settings.WORKER_METRICS_PORT:
+        # um servidor por processo: cada partição soma seu índice à porta base
+        await metrics_server.start(settings.METRICS_HOST, settings.WORKER_METRICS_PORT + (settings.WORKER_PARTITION or 0))
+
+
+@app.on_shutdown
+async def stop_background_tasks():
+    await relay.stop()
+    await checkin_saga.stop()
+    await dispatcher.stop()
+    await expiry.stop()
+    await processed_events.stop()
+    await availability.stop()
+    await snapshots.stop()
+    await reconciler.stop()
+    await retention.stop()
+    await metrics_server.stop()
+    event_log.close()
+
 if __name__ == "__main__":
     import asyncio
     asyncio.run(app.run())
\ No newline at end of file
@@ -0,0 +1,96 @@
+# apps/stream/messaging/batching.py
+import asyncio, logging, time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Processa um lote de mensagens; o lote inteiro falha junto se a função levantar
+BatchHandler = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+
+class MicroBatcher:
+    """
+    Agrupa as mensagens de um tópico em micro-lotes.
+
+    Cada handler entrega sua mensagem com `submit` e aguarda o lote em que ela
+    entrou: o lote fecha com `max_items` mensagens ou `window_ms` após a
+    primeira, o que vier antes, e é processado de uma vez (uma transação e uma
+    rajada de publicações). Como todos os handlers do lote retornam juntos, o
+    ack das mensagens também sai junto; se o lote falhar, todas voltam para a
+    fila. O tamanho real do lote é limitado pelo prefetch do canal.
+
+    Com `max_items <= 1` não há espera: cada mensagem é um lote de uma.
+    """
+
+    def __init__(self, name: str, handler: BatchHandler, max_items: int, window_ms: float):
+        self.name = name
+        self._handler = handler
+        self._max_items = max(1, max_items)
+        self._window_s = max(window_ms, 0.0) / 1000
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+
+        self.batches = 0
+        self.items = 0
+        self.busy_s = 0.0
+
+    @property
+    def max_items(self) -> int:
+        return self._max_items
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "busy_s": round(self.busy_s, 3),
+        }
+
+    async def submit(self, msg: Dict[str, Any]):
+        if self._max_items <= 1:
+            await self._process([msg])
+            return
+
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((msg, fut))
+        if len(self._pending) >= self._max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._window_s, self._flush)
+        await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._run(batch), name=f"batch:{self.name}")
+        # mantém referência até o fim (o loop só guarda referências fracas às tarefas)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        try:
+            await self._process([msg for msg, _ in batch])
+        except Exception as exc:
+            logger.exception("[Batch] Lote de %d mensagens falhou em %s", len(batch), self.name)
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(exc)
+        else:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_result(None)
+
+    async def _process(self, msgs: List[Dict[str, Any]]):
+        started = time.perf_counter()
+        try:
+            await self._handler(msgs)
+        finally:
+            self.batches += 1
+            self.items += len(msgs)
+            self.busy_s += time.perf_counter() - started
@@ -0,0 +1,152 @@
+# apps/stream/messaging/codec.py
+"""
+Codecs dos payloads de eventos e dos dados de fluxo gravados no read model.
+
+- json: texto JSON (application/json), o formato original
+- msgpack: binário compacto (application/vnd.msgpack). Todo payload começa com
+  o cabeçalho [0xC1][versão do schema]: a versão é o sufixo `.vN` do tópico
+  (eventos) ou FLOW_DATA_SCHEMA_VERSION (read model). 0xC1 nunca inicia um
+  msgpack nem um JSON, então um valor gravado é reconhecível sem metadados.
+
+Quem lê escolhe o codec pelo content-type da mensagem (ou pelo tipo do valor
+gravado), nunca pela configuração: produtores e consumidores de versões
+diferentes convivem durante um rollout. MESSAGE_CODEC e FLOW_DATA_CODEC só
+decidem como este processo escreve; mude-os depois que todos os leitores já
+entenderem o codec novo.
+"""
+import json, re
+from typing import Any, Dict, Optional
+
+import msgpack
+from faststream import BaseMiddleware
+
+from core.config import settings
+from apps.stream.messaging.partitioning import base_topic
+
+_MAGIC = 0xC1
+_VERSION_SUFFIX = re.compile(r"\.v(\d+)$")
+
+# Versão do formato dos dados de fluxo (data_json) gravados em binário
+FLOW_DATA_SCHEMA_VERSION = 1
+
+
+class CodecError(ValueError):
+    """
+    Payload que o codec não reconhece, ou de uma versão de schema diferente da esperada
+    """
+
+
+def schema_version(topic: str) -> int:
+    """
+    Versão do schema de um tópico pelo sufixo (`spot.reserved.v1` -> 1); 1 se não houver
+    """
+    match = _VERSION_SUFFIX.search(base_topic(topic or ""))
+    return int(match.group(1)) if match else 1
+
+
+class Codec:
+    name = ""
+    content_type = ""
+
+    def encode(self, obj: Any, version: int = 1) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes, version: Optional[int] = None) -> Any:
+        """
+        `version` é a versão de schema esperada pelo leitor (None aceita qualquer uma)
+        """
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    # JSON não leva cabeçalho: a versão é só a do tópico, como antes
+    name = "json"
+    content_type = "application/json"
+
+    def encode(self, obj: Any, version: int = 1) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, data: bytes, version: Optional[int] = None) -> Any:
+        return json.loads(data)
+
+
+class MsgpackCodec(Codec):
+    name = "msgpack"
+    content_type = "application/vnd.msgpack"
+
+    def encode(self, obj: Any, version: int = 1) -> bytes:
+        return bytes((_MAGIC, version)) + msgpack.packb(obj)
+
+    def decode(self, data: bytes, version: Optional[int] = None) -> Any:
+        if len(data) < 2 or data[0] != _MAGIC:
+            raise CodecError("Payload msgpack sem o cabeçalho de versão")
+        if version is not None and data[1] != version:
+            raise CodecError(f"Schema v{data[1]} recebido onde v{version} era esperado")
+        return msgpack.unpackb(memoryview(data)[2:])
+
+
+json_codec = JsonCodec()
+msgpack_codec = MsgpackCodec()
+
+CODECS: Dict[str, Codec] = {codec.name: codec for codec in (json_codec, msgpack_codec)}
+_BY_CONTENT_TYPE: Dict[str, Codec] = {codec.content_type: codec for codec in CODECS.values()}
+
+
+def codec_named(name: str) -> Codec:
+    codec = CODECS.get(name.strip().lower())
+    if codec is None:
+        raise ValueError(f"Codec desconhecido: {name} (opções: {', '.join(CODECS)})")
+    return codec
+
+
+def codec_for_content_type(content_type: Optional[str]) -> Optional[Codec]:
+    if not content_type:
+        return None
+    return _BY_CONTENT_TYPE.get(content_type.split(";", 1)[0].strip().lower())
+
+
+def decode_stored(value: Any) -> Any:
+    """
+    Decodifica um valor gravado por qualquer codec: texto é JSON; bytes com o
+    cabeçalho são msgpack, sem ele são JSON
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        if len(value) and value[0] == _MAGIC:
+            return msgpack_codec.decode(value)
+        return json.loads(bytes(value))
+    return json.loads(value)
+
+
+# codec com que este processo publica eventos
+message_codec = codec_named(settings.MESSAGE_CODEC)
+
+
+def _message_topic(raw: Any) -> str:
+    # fanout (mudanças de status) não tem routing key: o tópico é o nome da exchange
+    return getattr(raw, "routing_key", None) or getattr(raw, "exchange", None) or ""
+
+
+async def decode_message(msg, original_decoder):
+    """
+    Decoder do broker: escolhe o codec pelo content-type de cada mensagem.
+    JSON e mensagens sem content-type seguem pelo decoder padrão do FastStream.
+    """
+    codec = codec_for_content_type(msg.content_type)
+    if codec is None or codec is json_codec:
+        return await original_decoder(msg)
+    return codec.decode(msg.body, schema_version(_message_topic(msg.raw_message)))
+
+
+class CodecMiddleware(BaseMiddleware):
+    """
+    Serializa os eventos publicados com MESSAGE_CODEC, marcando o content-type.
+    Deve ser o último middleware do broker: os anteriores veem o dict original.
+    """
+
+    async def publish_scope(self, call_next, msg, *args, **kwargs):
+        if message_codec is not json_codec and isinstance(msg, (dict, list)):
+            exchange = kwargs.get("exchange")
+            topic = kwargs.get("routing_key") or getattr(exchange, "name", exchange) or ""
+            msg = message_codec.encode(msg, schema_version(topic))
+            kwargs["content_type"] = message_codec.content_type
+        return await super().publish_scope(call_next, msg, *args, **kwargs)
@@ -0,0 +1,283 @@
+# apps/stream/messaging/dedup.py
+import asyncio, hashlib, logging, math, sqlite3, time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from uuid import NAMESPACE_URL, uuid4, uuid5
+
+from faststream import BaseMiddleware
+
+from core.config import settings
+from core.db import SQLiteStore, get_store
+from apps.stream.messaging.partitioning import base_topic
+
+logger = logging.getLogger(__name__)
+
+EVENT_NAMESPACE = uuid5(NAMESPACE_URL, "event-driven-app/events")
+
+
+def event_id_for(parent: Optional[Mapping[str, Any]], routing_key: str) -> str:
+    """
+    eventId de um evento derivado: determinístico a partir do evento que o causou,
+    para que o reprocessamento de uma reentrega republique o mesmo id
+    """
+    parent_id = (parent or {}).get("eventId")
+    if not parent_id:
+        return str(uuid4())
+    return str(uuid5(EVENT_NAMESPACE, f"{parent_id}/{routing_key}"))
+
+
+def with_event_id(payload: Dict[str, Any], parent: Optional[Mapping[str, Any]] = None, routing_key: str = "") -> Dict[str, Any]:
+    return {**payload, "eventId": event_id_for(parent, routing_key)}
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom de tamanho fixo (bytearray), com k posições por double hashing
+    """
+
+    __slots__ = ("bits", "size", "hashes", "count")
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.size = max(8, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+def _create_schema(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS processed_events (
+            event_key TEXT PRIMARY KEY,
+            processed_at REAL NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_processed_events_at ON processed_events (processed_at)")
+
+def _exists(conn: sqlite3.Connection, event_key: str) -> bool:
+    return conn.execute("SELECT 1 FROM processed_events WHERE event_key = ?", (event_key,)).fetchone() is not None
+
+def _mark(conn: sqlite3.Connection, event_key: str, processed_at: float):
+    conn.execute(
+        "INSERT OR IGNORE INTO processed_events (event_key, processed_at) VALUES (?, ?)",
+        (event_key, processed_at),
+    )
+
+def _prune(conn: sqlite3.Connection, before: float, limit: int) -> int:
+    return conn.execute(
+        "DELETE FROM processed_events WHERE event_key IN "
+        "(SELECT event_key FROM processed_events WHERE processed_at < ? LIMIT ?)",
+        (before, limit),
+    ).rowcount
+
+def _nth_newest(conn: sqlite3.Connection, n: int) -> Optional[float]:
+    row = conn.execute(
+        "SELECT processed_at FROM processed_events ORDER BY processed_at DESC LIMIT 1 OFFSET ?", (n - 1,)
+    ).fetchone()
+    return None if row is None else row[0]
+
+def _page(conn: sqlite3.Connection, after: Tuple[float, str], limit: int):
+    return conn.execute("""
+        SELECT event_key, processed_at FROM processed_events
+        WHERE (processed_at, event_key) > (?, ?) ORDER BY processed_at, event_key LIMIT ?
+    """, (*after, limit)).fetchall()
+
+
+class _Generation:
+    __slots__ = ("filter", "newest")
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.filter = BloomFilter(capacity, fp_rate)
+        self.newest = 0.0  # processed_at do evento mais recente da geração
+
+
+class ProcessedEventIndex:
+    """
+    Índice de eventos já processados por consumer.
+
+    Um filtro de Bloom em memória responde "nunca visto" sem tocar o disco, que é o
+    caso comum; só um possível positivo consulta a tabela `processed_events`.
+    Ao atingir a capacidade, o filtro atual é fechado e um novo é iniciado; uma
+    geração só sai da memória quando todos os seus eventos saíram da retenção
+    (e da tabela), então dentro de `retention_s` o filtro não tem falso negativo.
+
+    A memória é limitada a `generations` filtros, ou seja, `capacity * generations`
+    eventos por `retention_s`. Acima disso a geração mais antiga é descartada
+    antes da hora e, até os eventos dela saírem da retenção, toda resposta
+    negativa do filtro é conferida no disco: a deduplicação segue correta, só
+    mais lenta.
+
+    Os registros fora da retenção são expurgados na subida e depois a cada
+    `prune_interval_s`, em lotes (transações curtas do escritor).
+    """
+
+    def __init__(
+        self,
+        store: SQLiteStore,
+        capacity: int,
+        fp_rate: float,
+        retention_s: float,
+        generations: int = 8,
+        prune_interval_s: float = 0.0,
+        prune_batch: int = 5000,
+    ):
+        self._store = store
+        self._store.add_schema(_create_schema)
+        self._capacity = capacity
+        self._fp_rate = fp_rate
+        self._retention_s = retention_s
+        self._prune_interval_s = prune_interval_s
+        self._prune_batch = prune_batch
+        self._task: Optional[asyncio.Task] = None
+        self._max_generations = max(1, generations)
+        # da mais antiga para a mais nova; a última recebe os eventos
+        self._generations: List[_Generation] = [_Generation(capacity, fp_rate)]
+        # até quando as respostas negativas do filtro precisam ser conferidas no disco
+        self._disk_until = 0.0
+
+        self.filter_negatives = 0
+        self.disk_lookups = 0
+        self.duplicates = 0
+
+    def _forget_expired(self, now: float):
+        before = now - self._retention_s
+        while len(self._generations) > 1 and self._generations[0].newest < before:
+            self._generations.pop(0)
+
+    def _drop_oldest(self):
+        dropped = self._generations.pop(0)
+        self._disk_until = max(self._disk_until, dropped.newest + self._retention_s)
+        logger.warning(
+            "[Dedup] Geração do filtro descartada dentro da retenção (%d eventos); negativos vão ao disco até %.0f",
+            dropped.filter.count, self._disk_until,
+        )
+
+    def _remember(self, event_key: str, processed_at: float):
+        current = self._generations[-1]
+        if current.filter.count >= self._capacity:
+            self._forget_expired(processed_at)
+            if len(self._generations) >= self._max_generations:
+                self._drop_oldest()
+            current = _Generation(self._capacity, self._fp_rate)
+            self._generations.append(current)
+        current.filter.add(event_key)
+        current.newest = max(current.newest, processed_at)
+
+    async def warm_up(self):
+        """
+        Remove registros fora da retenção e recarrega no filtro os que ficaram
+        """
+        pruned = await self.prune()
+        # no máximo o que cabe nas gerações, do mais antigo ao mais novo, em páginas
+        oldest = await self._store.read(_nth_newest, self._capacity * self._max_generations)
+        if oldest is not None:
+            # registros mais antigos ficam fora do filtro: conferidos no disco enquanto valem
+            self._disk_until = oldest + self._retention_s
+        after, loaded = (float("-inf") if oldest is None else oldest, ""), 0
+        while True:
+            rows = await self._store.read(_page, after, self._capacity)
+            for event_key, processed_at in rows:
+                self._remember(event_key, processed_at)
+            loaded += len(rows)
+            if len(rows) < self._capacity:
+                break
+            after = (rows[-1][1], rows[-1][0])
+        logger.info("[Dedup] %d eventos recentes carregados, %d expurgados", loaded, pruned)
+
+    async def prune(self) -> int:
+        now = time.time()
+        self._forget_expired(now)
+        before = now - self._retention_s
+        pruned = 0
+        while True:
+            deleted = await self._store.write(_prune, before, self._prune_batch)
+            pruned += deleted
+            if deleted < self._prune_batch:
+                return pruned
+
+    async def start(self):
+        await self.warm_up()
+        if self._prune_interval_s > 0:
+            self._task = asyncio.create_task(self._run(), name="processed-events-prune")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._prune_interval_s)
+            try:
+                pruned = await self.prune()
+                if pruned:
+                    logger.info("[Dedup] %d eventos expurgados", pruned)
+            except Exception:
+                logger.exception("[Dedup] Falha ao expurgar eventos processados")
+
+    async def seen(self, event_key: str) -> bool:
+        in_filter = any(event_key in generation.filter for generation in reversed(self._generations))
+        if not in_filter and time.time() >= self._disk_until:
+            self.filter_negatives += 1
+            return False
+        self.disk_lookups += 1
+        return await self._store.read(_exists, event_key)
+
+    async def mark(self, event_key: str):
+        processed_at = time.time()
+        await self._store.write(_mark, event_key, processed_at)
+        self._remember(event_key, processed_at)
+
+
+processed_events = ProcessedEventIndex(
+    get_store(),
+    capacity=settings.DEDUP_BLOOM_CAPACITY,
+    fp_rate=settings.DEDUP_BLOOM_FP_RATE,
+    retention_s=settings.DEDUP_RETENTION_S,
+    generations=settings.DEDUP_BLOOM_GENERATIONS,
+    prune_interval_s=settings.DEDUP_PRUNE_INTERVAL_S,
+    prune_batch=settings.DEDUP_PRUNE_BATCH,
+)
+
+
+class IdempotencyMiddleware(BaseMiddleware):
+    """
+    Pula mensagens cujo eventId já foi processado pelo consumer do tópico
+    (reentregas do RabbitMQ após queda do worker). O evento só é marcado como
+    processado depois que o handler termina sem erro.
+    """
+
+    async def consume_scope(self, call_next, msg):
+        body = await msg.decode()
+        event_id = body.get("eventId") if isinstance(body, dict) else None
+        routing_key = getattr(msg.raw_message, "routing_key", None)
+        if not event_id or not routing_key:
+            return await super().consume_scope(call_next, msg)
+
+        # sem o sufixo de partição: o registro sobrevive a mudanças de WORKER_PARTITIONS
+        event_key = f"{base_topic(routing_key)}:{event_id}"
+        if await processed_events.seen(event_key):
+            processed_events.duplicates += 1
+            logger.warning("[Dedup] Evento duplicado ignorado: %s", event_key)
+            return None
+
+        result = await super().consume_scope(call_next, msg)
+        await processed_events.mark(event_key)
+        return result
+
@@ -0,0 +1,398 @@
+# apps/stream/messaging/event_log.py
+"""
+Log de eventos append-only, em segmentos.
+
+Cada segmento `<baseOffset>.log` guarda registros com prefixo de tamanho:
+
+    [tamanho u32][crc32 u32][offset u64][timestamp f64][len(tópico) u16][tópico][payload JSON]
+
+e um índice esparso `<baseOffset>.index` com (offset, posição, timestamp) a cada
+EVENT_LOG_INDEX_INTERVAL_BYTES. A leitura usa mmap e devolve um registro por vez,
+então replay e tail percorrem milhões de eventos com memória constante.
+
+Uso (auditoria):
+    python -m apps.stream.messaging.event_log --topic spot.reserved.v1 --since 2025-01-01T00:00:00
+"""
+import argparse, asyncio, json, logging, mmap, os, struct, sys, time, zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, BinaryIO, Iterator, List, NamedTuple, Optional
+
+from faststream import BaseMiddleware
+
+from core.config import settings
+from apps.stream.messaging.partitioning import SUBSCRIBED_TOPICS, base_topic
+from apps.stream.messaging.codec import codec_for_content_type, json_codec
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("<IIQdH")  # tamanho do corpo, crc32, offset, timestamp, len(tópico)
+_INDEX_ENTRY = struct.Struct("<QQd")  # offset, posição no .log, timestamp
+
+
+class LogRecord(NamedTuple):
+    offset: int
+    timestamp: float
+    topic: str
+    payload: bytes
+
+    def event(self) -> Any:
+        return json.loads(self.payload)
+
+
+class _Segment:
+    __slots__ = ("base_offset", "log_path", "index_path", "offsets", "positions", "timestamps")
+
+    def __init__(self, directory: str, base_offset: int):
+        self.base_offset = base_offset
+        self.log_path = os.path.join(directory, f"{base_offset:020d}.log")
+        self.index_path = os.path.join(directory, f"{base_offset:020d}.index")
+        self.offsets = array("Q")
+        self.positions = array("Q")
+        self.timestamps = array("d")
+
+    def load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "rb") as f:
+            data = f.read()
+        usable = len(data) - len(data) % _INDEX_ENTRY.size
+        for offset, position, ts in _INDEX_ENTRY.iter_unpack(data[:usable]):
+            self.offsets.append(offset)
+            self.positions.append(position)
+            self.timestamps.append(ts)
+
+    def start_position(self, from_offset: int, since: Optional[float]) -> int:
+        """
+        Posição do último ponto indexado que ainda precede o offset e o instante pedidos
+        """
+        i = bisect_right(self.offsets, from_offset) - 1
+        if since is not None:
+            # bisect_left: registros com timestamp igual a `since` podem vir antes da entrada
+            i = max(i, bisect_left(self.timestamps, since) - 1)
+        return self.positions[i] if i >= 0 else 0
+
+
+class SegmentedEventLog:
+    """
+    Log local de eventos: um único escritor (o loop do worker) e leitores via mmap.
+    Com `readonly=True` (outro processo lendo o log), nada é truncado nem aberto
+    para escrita e cada leitura enxerga os segmentos como estão no disco.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int, index_interval: int, readonly: bool = False):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.index_interval = index_interval
+        self.readonly = readonly
+
+        self._segments: List[_Segment] = []
+        self._log: Optional[BinaryIO] = None
+        self._index: Optional[BinaryIO] = None
+        self._position = 0
+        self._last_indexed: Optional[int] = None
+        self._next_offset = 0
+        self._last_ts = 0.0
+
+    # ---------- Abertura e recuperação ----------
+
+    def open(self):
+        if self._log is not None:
+            return
+        if not self.readonly:
+            os.makedirs(self.directory, exist_ok=True)
+        elif not os.path.isdir(self.directory):
+            self._segments = []
+            return
+        self._segments = []
+        bases = sorted(int(name[:-4]) for name in os.listdir(self.directory) if name.endswith(".log"))
+        for base in bases:
+            segment = _Segment(self.directory, base)
+            segment.load_index()
+            self._segments.append(segment)
+        if self.readonly:
+            self._position = os.path.getsize(self._segments[-1].log_path) if self._segments else 0
+            return
+        if not self._segments:
+            self._segments.append(_Segment(self.directory, 0))
+        self._recover(self._segments[-1])
+
+    def _recover(self, segment: _Segment):
+        """
+        Revalida o segmento ativo a partir da última entrada do índice e descarta
+        um registro final incompleto (queda no meio da escrita)
+        """
+        position = segment.positions[-1] if segment.positions else 0
+        expected = segment.offsets[-1] if segment.offsets else segment.base_offset
+        last_ts = segment.timestamps[-1] if segment.timestamps else 0.0
+        size = os.path.getsize(segment.log_path) if os.path.exists(segment.log_path) else 0
+
+        with open(segment.log_path, "ab+") as f:
+            f.seek(position)
+            data = f.read()
+            cursor = 0
+            while cursor + _HEADER.size <= len(data):
+                length, crc, offset, ts, topic_len = _HEADER.unpack_from(data, cursor)
+                end = cursor + _HEADER.size + length
+                body = data[cursor + _HEADER.size:end]
+                if offset != expected or end > len(data) or zlib.crc32(body) != crc or topic_len > length:
+                    break
+                cursor, expected, last_ts = end, expected + 1, ts
+            valid_end = position + cursor
+            if valid_end < size:
+                logger.warning("[EventLog] %d bytes finais inválidos descartados em %s", size - valid_end, segment.log_path)
+                f.truncate(valid_end)
+
+        # entradas de índice que apontam para além do trecho válido
+        keep = bisect_right(segment.positions, max(valid_end - 1, 0)) if valid_end else 0
+        if keep < len(segment.offsets):
+            del segment.offsets[keep:], segment.positions[keep:], segment.timestamps[keep:]
+        with open(segment.index_path, "wb") as f:
+            for entry in zip(segment.offsets, segment.positions, segment.timestamps):
+                f.write(_INDEX_ENTRY.pack(*entry))
+
+        self._position = valid_end
+        self._last_indexed = segment.positions[-1] if segment.positions else None
+        self._next_offset = expected
+        self._last_ts = last_ts
+        self._log = open(segment.log_path, "ab")
+        self._index = open(segment.index_path, "ab")
+
+    # ---------- Escrita ----------
+
+    @property
+    def next_offset(self) -> int:
+        self.open()
+        return self._next_offset
+
+    def end_offset(self) -> int:
+        """
+        Offset seguinte ao último registro completo. No modo leitura é calculado a
+        partir da última entrada do índice do segmento ativo.
+        """
+        self.open()
+        if not self.readonly:
+            return self._next_offset
+        if not self._segments:
+            return 0
+        segment = self._segments[-1]
+        offset = segment.base_offset
+        for record in self._read_segment(segment, segment.offsets[-1] if segment.offsets else offset, None, None):
+            offset = record.offset + 1
+        return offset
+
+    def append(self, topic: str, payload: bytes) -> int:
+        """
+        Acrescenta um evento e devolve seu offset. O registro vai para o SO a cada
+        chamada (flush); o fsync acontece na troca de segmento e no fechamento.
+        """
+        self.open()
+        if self.readonly:
+            raise RuntimeError("Log aberto somente para leitura")
+        if self._position >= self.segment_bytes:
+            self._roll()
+
+        # timestamps não decrescentes: a busca por instante usa bisect no índice
+        ts = self._last_ts = max(time.time(), self._last_ts)
+        offset = self._next_offset
+        topic_bytes = topic.encode("utf-8")
+        body = topic_bytes + payload
+        record = _HEADER.pack(len(body), zlib.crc32(body), offset, ts, len(topic_bytes)) + body
+
+        if self._last_indexed is None or self._position - self._last_indexed >= self.index_interval:
+            segment = self._segments[-1]
+            segment.offsets.append(offset)
+            segment.positions.append(self._position)
+            segment.timestamps.append(ts)
+            self._index.write(_INDEX_ENTRY.pack(offset, self._position, ts))
+            self._last_indexed = self._position
+
+        self._log.write(record)
+        self._log.flush()
+        self._position += len(record)
+        self._next_offset += 1
+        return offset
+
+    def _roll(self):
+        self._close_active()
+        self._segments.append(_Segment(self.directory, self._next_offset))
+        self._log = open(self._segments[-1].log_path, "ab")
+        self._index = open(self._segments[-1].index_path, "ab")
+        self._position = 0
+        self._last_indexed = None
+
+    def _close_active(self):
+        for f in (self._index, self._log):
+            if f is not None:
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+        self._log = self._index = None
+
+    def close(self):
+        self._close_active()
+        self._segments = []
+
+    # ---------- Leitura ----------
+
+    def read(
+        self,
+        from_offset: int = 0,
+        since: Optional[float] = None,
+        topic: Optional[str] = None,
+    ) -> Iterator[LogRecord]:
+        """
+        Percorre os eventos a partir de um offset e/ou instante (epoch), opcionalmente
+        filtrando por tópico
+        """
+        self.open()
+        if self._log is not None:
+            self._log.flush()
+        first = bisect_right([s.base_offset for s in self._segments], from_offset) - 1
+        if since is not None:
+            starts = [s.timestamps[0] if s.timestamps else float("inf") for s in self._segments]
+            first = max(first, bisect_left(starts, since) - 1)
+        topic_bytes = topic.encode("utf-8") if topic else None
+
+        for segment in self._segments[max(first, 0):]:
+            yield from self._read_segment(segment, from_offset, since, topic_bytes)
+
+    def _read_segment(self, segment: _Segment, from_offset: int, since: Optional[float], topic_bytes: Optional[bytes]):
+        if segment is self._segments[-1]:
+            size = self._position
+        else:
+            size = os.path.getsize(segment.log_path)
+        if not size:
+            return
+        with open(segment.log_path, "rb") as f, mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            cursor = segment.start_position(from_offset, since)
+            while cursor + _HEADER.size <= size:
+                length, _, offset, ts, topic_len = _HEADER.unpack_from(mm, cursor)
+                start = cursor + _HEADER.size
+                cursor = start + length
+                if cursor > size:
+                    break  # registro ainda sendo escrito por outro processo
+                if offset < from_offset or (since is not None and ts < since):
+                    continue
+                if topic_bytes is not None and mm[start:start + topic_len] != topic_bytes:
+                    continue
+                yield LogRecord(
+                    offset, ts, mm[start:start + topic_len].decode("utf-8"), mm[start + topic_len:cursor]
+                )
+
+    async def tail(
+        self,
+        from_offset: Optional[int] = None,
+        topic: Optional[str] = None,
+        poll_s: float = 0.5,
+    ) -> AsyncIterator[LogRecord]:
+        """
+        Acompanha o log: entrega o que já existe a partir de `from_offset` (padrão:
+        só eventos novos) e depois os que forem chegando
+        """
+        offset = from_offset
+        if offset is None:
+            offset = 0 if self.readonly else self.next_offset
+        while True:
+            for record in self.read(offset, topic=topic):
+                offset = record.offset + 1
+                yield record
+            await asyncio.sleep(poll_s)
+
+
+def _log_dir() -> str:
+    # no modo particionado, cada worker escreve no diretório da sua partição
+    if settings.WORKER_PARTITION is None:
+        return settings.EVENT_LOG_DIR
+    return os.path.join(settings.EVENT_LOG_DIR, f"p{settings.WORKER_PARTITION}")
+
+
+event_log = SegmentedEventLog(
+    _log_dir(),
+    segment_bytes=settings.EVENT_LOG_SEGMENT_BYTES,
+    index_interval=settings.EVENT_LOG_INDEX_INTERVAL_BYTES,
+)
+
+
+class EventLogMiddleware(BaseMiddleware):
+    """
+    Grava no log todo evento consumido por este worker (já sem duplicatas) e os
+    eventos publicados em tópicos que nenhum consumer do processo assina, para
+    que cada evento apareça uma única vez somando os logs das partições.
+
+    Um evento consumido só entra no log depois que o handler termina sem erro:
+    uma tentativa que falha e é reentregue aparece uma vez, não uma por entrega.
+    A ordem por checkInId se mantém porque o registro é gravado ainda dentro do
+    lock do fluxo (CheckInOrderingMiddleware), antes do próximo evento dele.
+    """
+
+    async def consume_scope(self, call_next, msg):
+        result = await super().consume_scope(call_next, msg)
+        routing_key = getattr(msg.raw_message, "routing_key", None)
+        if routing_key and not getattr(msg.raw_message, "exchange", None):
+            # o log guarda sempre JSON (replay, auditoria e reconstrução independem do codec)
+            body = msg.body
+            if codec_for_content_type(msg.content_type) not in (None, json_codec):
+                body = json_codec.encode(await msg.decode())
+            event_log.append(base_topic(routing_key), body)
+        return result
+
+    async def publish_scope(self, call_next, msg, *args, **kwargs):
+        result = await super().publish_scope(call_next, msg, *args, **kwargs)
+        routing_key = kwargs.get("routing_key")
+        if routing_key and not kwargs.get("exchange") and isinstance(msg, dict):
+            topic = base_topic(routing_key)
+            if topic not in SUBSCRIBED_TOPICS:
+                event_log.append(topic, json.dumps(msg, ensure_ascii=False).encode("utf-8"))
+        return result
+
+
+def _print_record(record: LogRecord):
+    sys.stdout.write(json.dumps({
+        "offset": record.offset,
+        "timestamp": record.timestamp,
+        "topic": record.topic,
+        "event": record.event(),
+    }, ensure_ascii=False) + "\n")
+
+
+def _parse_since(value: str) -> float:
+    parsed = datetime.fromisoformat(value.rstrip("Z"))
+    return (parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lê o log de eventos (JSON por linha)")
+    parser.add_argument("--dir", default=_log_dir())
+    parser.add_argument("--from-offset", type=int, default=0)
+    parser.add_argument("--since", help="instante ISO-8601 (UTC se sem fuso)")
+    parser.add_argument("--topic")
+    parser.add_argument("--follow", action="store_true", help="continua lendo eventos novos")
+    args = parser.parse_args()
+
+    log = SegmentedEventLog(
+        args.dir, settings.EVENT_LOG_SEGMENT_BYTES, settings.EVENT_LOG_INDEX_INTERVAL_BYTES, readonly=True
+    )
+    since = _parse_since(args.since) if args.since else None
+    next_offset = args.from_offset
+    for record in log.read(args.from_offset, since, args.topic):
+        next_offset = record.offset + 1
+        _print_record(record)
+
+    if args.follow:
+        sys.stdout.flush()
+
+        async def follow():
+            async for record in log.tail(next_offset, args.topic):
+                _print_record(record)
+                sys.stdout.flush()
+
+        try:
+            asyncio.run(follow())
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
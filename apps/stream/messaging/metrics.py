@@ -0,0 +1,53 @@
+# apps/stream/messaging/metrics.py
+import time
+from typing import Any, Optional
+
+from faststream import BaseMiddleware
+
+from core.metrics import handler_duration, publish_latency, queue_delay
+from apps.stream.messaging.partitioning import base_topic
+
+# Instante da publicação (epoch, string) para medir a espera na fila
+PUBLISHED_AT_HEADER = "x-published-at"
+
+
+def _topic(routing_key: Optional[str], exchange: Any) -> str:
+    if routing_key:
+        return base_topic(routing_key)
+    # fanout (mudanças de status) não tem routing key: vale o nome da exchange
+    return getattr(exchange, "name", exchange) or ""
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Mede, por tópico, a duração de cada publicação e, no consumo, a espera da
+    mensagem desde a publicação e a duração do handler. Deve vir depois dos
+    demais middlewares de consumo (só o codec, que não atua no consumo, vem
+    depois): as esperas pelo lock do checkInId e pela checagem de duplicidade
+    contam como fila, não como handler. A duração da publicação inclui a
+    serialização pelo codec.
+    """
+
+    async def consume_scope(self, call_next, msg):
+        raw = msg.raw_message
+        topic = _topic(getattr(raw, "routing_key", None), getattr(raw, "exchange", None))
+        published_at = (msg.headers or {}).get(PUBLISHED_AT_HEADER)
+        if published_at is not None:
+            try:
+                # relógios de processos diferentes: uma diferença negativa vira zero
+                queue_delay.observe(max(0.0, time.time() - float(published_at)), topic)
+            except (TypeError, ValueError):
+                pass
+        started = time.perf_counter()
+        try:
+            return await super().consume_scope(call_next, msg)
+        finally:
+            handler_duration.observe(time.perf_counter() - started, topic)
+
+    async def publish_scope(self, call_next, msg, *args, **kwargs):
+        kwargs["headers"] = {**(kwargs.get("headers") or {}), PUBLISHED_AT_HEADER: f"{time.time():.6f}"}
+        started = time.perf_counter()
+        try:
+            return await super().publish_scope(call_next, msg, *args, **kwargs)
+        finally:
+            publish_latency.observe(time.perf_counter() - started, _topic(kwargs.get("routing_key"), kwargs.get("exchange")))
@@ -0,0 +1,234 @@
+# apps/stream/messaging/outbox.py
+import asyncio, json, logging, sqlite3, time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from core.config import settings
+from core.db import SQLiteStore, StoreGroup, flow_stores
+from apps.stream.messaging.partitioning import route
+
+logger = logging.getLogger(__name__)
+
+# Mensagens publicadas por rodada do relay (confirms em paralelo)
+RELAY_BATCH = 256
+# Tentativas de publicação antes de estacionar a mensagem (available_at = NULL)
+MAX_ATTEMPTS = 5
+RETRY_DELAY_S = 1.0
+# Por quanto tempo mensagens já enviadas ficam na tabela (auditoria)
+SENT_RETENTION_S = 3600.0
+PURGE_INTERVAL_S = 60.0
+
+
+class OutgoingMessage(NamedTuple):
+    routing_key: str
+    payload: Dict[str, Any]
+    delay_s: float = 0.0
+
+
+def _create_schema(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            message_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            available_at REAL,
+            routing_key TEXT NOT NULL,
+            payload_json TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            owner INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            sent_at REAL
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS ix_outbox_pending
+        ON outbox (owner, available_at) WHERE sent_at IS NULL
+    """)
+    # passos agendados pelo antigo DelayedStepScheduler viram mensagens com atraso
+    legacy = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'scheduled_steps'").fetchone()
+    if legacy:
+        conn.execute("""
+            INSERT INTO outbox (available_at, routing_key, payload_json, attempts, owner, created_at)
+            SELECT due_at, routing_key, payload_json, attempts, owner, due_at FROM scheduled_steps
+        """)
+        conn.execute("DROP TABLE scheduled_steps")
+
+def enqueue_sync(conn: sqlite3.Connection, messages: Sequence[OutgoingMessage]) -> Optional[float]:
+    """
+    Grava as mensagens na transação corrente do escritor (junto com a mudança de
+    estado que as originou). Retorna o menor available_at inserido.
+    """
+    now = time.time()
+    owner = settings.WORKER_PARTITION or 0
+    rows = [
+        (now + max(m.delay_s, 0.0), m.routing_key, json.dumps(m.payload, ensure_ascii=False), owner, now)
+        for m in messages
+    ]
+    conn.executemany(
+        "INSERT INTO outbox (available_at, routing_key, payload_json, owner, created_at) VALUES (?, ?, ?, ?, ?)",
+        rows,
+    )
+    return min((row[0] for row in rows), default=None)
+
+def _due(conn: sqlite3.Connection, owner: Optional[int], now: float, limit: int):
+    owner_filter = "" if owner is None else "AND owner = ?"
+    params = (now,) if owner is None else (now, owner)
+    return conn.execute(f"""
+        SELECT message_id, routing_key, payload_json, attempts FROM outbox
+        WHERE sent_at IS NULL AND available_at <= ? {owner_filter}
+        ORDER BY available_at, message_id LIMIT ?
+    """, (*params, limit)).fetchall()
+
+def _next_available(conn: sqlite3.Connection, owner: Optional[int]) -> Optional[float]:
+    if owner is None:
+        return conn.execute("SELECT min(available_at) FROM outbox WHERE sent_at IS NULL").fetchone()[0]
+    return conn.execute(
+        "SELECT min(available_at) FROM outbox WHERE sent_at IS NULL AND owner = ?", (owner,)
+    ).fetchone()[0]
+
+def _mark_sent(conn: sqlite3.Connection, message_ids: List[int], sent_at: float):
+    conn.executemany("UPDATE outbox SET sent_at = ? WHERE message_id = ?", [(sent_at, i) for i in message_ids])
+
+def _retry(conn: sqlite3.Connection, retries: List[Tuple[Optional[float], int]]):
+    conn.executemany(
+        "UPDATE outbox SET available_at = ?, attempts = attempts + 1 WHERE message_id = ?", retries
+    )
+
+def _purge_sent(conn: sqlite3.Connection, before: float) -> int:
+    return conn.execute("DELETE FROM outbox WHERE sent_at IS NOT NULL AND sent_at < ?", (before,)).rowcount
+
+
+class OutboxRelay:
+    """
+    Publica as mensagens do outbox.
+
+    As mensagens entram na mesma transação SQLite que grava o estado do fluxo, então
+    ou as duas coisas acontecem ou nenhuma. O relay lê lotes vencidos, publica o
+    lote com os confirms em paralelo e marca as linhas como enviadas. Uma queda
+    entre a publicação e a marcação reenvia o lote: a entrega é at-least-once e
+    o eventId determinístico faz o IdempotencyMiddleware descartar a cópia.
+
+    Com o read model em vários arquivos, cada um tem seu outbox (gravado junto
+    com os fluxos daquele arquivo) e o relay percorre todos.
+    """
+
+    def __init__(self, stores: StoreGroup):
+        self._stores = stores
+        self._stores.add_schema(_create_schema)
+        self._broker = None
+        self._wakeup = asyncio.Event()
+        self._next_due: Optional[float] = None
+        self._notifications = 0
+        self._task: Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+        self.published = 0
+
+    def notify(self, available_at: Optional[float]):
+        """
+        Chamado após o commit de novas mensagens; acorda o relay se alguma vence antes do previsto
+        """
+        if available_at is None:
+            return
+        self._notifications += 1
+        if self._next_due is None or available_at < self._next_due:
+            self._next_due = available_at
+            self._wakeup.set()
+
+    async def enqueue(self, messages: Sequence[OutgoingMessage]):
+        """
+        Enfileira mensagens sem mudança de estado associada (no store do checkInId de cada uma)
+        """
+        by_store: Dict[int, Tuple[SQLiteStore, List[OutgoingMessage]]] = {}
+        for m in messages:
+            store = self._stores.for_key(str(m.payload.get("checkInId") or ""))
+            by_store.setdefault(id(store), (store, []))[1].append(m)
+        for available_at in await asyncio.gather(*(store.write(enqueue_sync, group) for store, group in by_store.values())):
+            self.notify(available_at)
+
+    async def _next_available(self) -> Optional[float]:
+        due = [await store.read(_next_available, settings.WORKER_PARTITION) for store in self._stores]
+        return min((d for d in due if d is not None), default=None)
+
+    async def start(self, broker):
+        self._broker = broker
+        self._next_due = await self._next_available()
+        self._task = asyncio.create_task(self._run(), name="outbox-relay")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        failures = 0
+        while True:
+            try:
+                await self._step()
+                failures = 0
+            except Exception:
+                # banco ocupado/indisponível, broker fora: nada foi marcado como enviado,
+                # a próxima volta relê o que ficou pendente
+                failures += 1
+                delay = min(RETRY_DELAY_S * 2 ** (failures - 1), PURGE_INTERVAL_S)
+                logger.exception("[Outbox] Falha no relay; nova tentativa em %.1fs", delay)
+                self._next_due = time.time()
+                await asyncio.sleep(delay)
+
+    async def _step(self):
+        now = time.time()
+        if now - self._last_purge >= PURGE_INTERVAL_S:
+            for store in self._stores:
+                await store.write(_purge_sent, now - SENT_RETENTION_S)
+            self._last_purge = now
+
+        self._wakeup.clear()
+        if self._next_due is None or self._next_due > now:
+            timeout = None if self._next_due is None else self._next_due - now
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), min(timeout or PURGE_INTERVAL_S, PURGE_INTERVAL_S))
+            except asyncio.TimeoutError:
+                pass
+            return
+
+        seen = self._notifications
+        drained = True
+        for store in self._stores:
+            due = await store.read(_due, settings.WORKER_PARTITION, now, RELAY_BATCH)
+            if due:
+                await self._relay(store, due)
+            drained = drained and len(due) < RELAY_BATCH
+        if drained:
+            next_due = await self._next_available()
+            # notificação durante a leitura: ela pode não ter visto o commit novo, relê na próxima volta
+            self._next_due = next_due if seen == self._notifications else now
+
+    async def _relay(self, store: SQLiteStore, due):
+        payloads = [json.loads(payload_json) for _, _, payload_json, _ in due]
+        results = await asyncio.gather(
+            *(
+                self._broker.publish(payload, routing_key=route(routing_key, payload))
+                for (_, routing_key, _, _), payload in zip(due, payloads)
+            ),
+            return_exceptions=True,
+        )
+
+        sent, retries = [], []
+        for (message_id, routing_key, _, attempts), result in zip(due, results):
+            if not isinstance(result, Exception):
+                sent.append(message_id)
+            elif attempts + 1 >= MAX_ATTEMPTS:
+                logger.error("[Outbox] Mensagem %s -> %s estacionada após %d tentativas: %r", message_id, routing_key, attempts + 1, result)
+                retries.append((None, message_id))
+            else:
+                logger.warning("[Outbox] Falha ao publicar mensagem %s -> %s: %r", message_id, routing_key, result)
+                retries.append((time.time() + RETRY_DELAY_S * 2 ** attempts, message_id))
+
+        if sent:
+            await store.write(_mark_sent, sent, time.time())
+            self.published += len(sent)
+        if retries:
+            await store.write(_retry, retries)
+
+
+relay = OutboxRelay(flow_stores())
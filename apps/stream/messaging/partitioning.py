@@ -0,0 +1,149 @@
+# apps/stream/messaging/partitioning.py
+import asyncio, zlib
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, List, Mapping, Optional, Set
+
+from faststream import BaseMiddleware
+
+from core.config import settings
+from apps.stream.messaging import topic
+
+# Chave de partição por tópico (padrão: checkInId).
+# Consulta e reserva de vagas vão para o dono da categoria, que é o único
+# processo a alterar o inventário daquela categoria.
+PARTITION_KEYS: Dict[str, str] = {
+    topic.SPOT_CONSULT_REQUESTED: "vehicleCategory",
+    topic.SPOT_RESERVE_REQUESTED: "vehicleCategory",
+    topic.SPOT_RELEASE_REQUESTED: "vehicleCategory",
+    # robôs atendem um nível: a frota do nível fica num único processo
+    topic.ROBOT_ASSIGN_REQUESTED: "spot.level",
+}
+
+# Tópicos com consumer registrado neste processo (independente da partição)
+SUBSCRIBED_TOPICS: Set[str] = set()
+
+
+def partition_of(key: str, partitions: Optional[int] = None) -> int:
+    # crc32 é estável entre processos (hash() do Python não é)
+    return zlib.crc32(key.encode("utf-8")) % (partitions or settings.WORKER_PARTITIONS)
+
+
+def owned_partitions() -> List[int]:
+    """
+    Partições consumidas por este processo: a indicada em WORKER_PARTITION,
+    ou todas quando o worker roda sozinho
+    """
+    if settings.WORKER_PARTITION is None:
+        return list(range(settings.WORKER_PARTITIONS))
+    return [settings.WORKER_PARTITION]
+
+
+def owns(key: str) -> bool:
+    return settings.WORKER_PARTITIONS <= 1 or partition_of(key) in owned_partitions()
+
+
+def partition_key(routing_key: str, payload: Mapping[str, Any]) -> str:
+    field = PARTITION_KEYS.get(routing_key, "checkInId")
+    value: Any = payload
+    # campos aninhados com ponto (`spot.level`)
+    for part in field.split("."):
+        value = value.get(part) if isinstance(value, Mapping) else None
+    if field == "vehicleCategory":
+        value = (value or "").strip().lower()
+    return str(value or "")
+
+
+def route(routing_key: str, payload: Mapping[str, Any]) -> str:
+    """
+    Routing key efetiva da mensagem: `<tópico>.p<N>` no modo particionado
+    """
+    if settings.WORKER_PARTITIONS <= 1:
+        return routing_key
+    return f"{routing_key}.p{partition_of(partition_key(routing_key, payload))}"
+
+
+def base_topic(routing_key: str) -> str:
+    """
+    Tópico sem o sufixo de partição (`spot.reserved.v1.p3` -> `spot.reserved.v1`)
+    """
+    head, sep, tail = routing_key.rpartition(".p")
+    return head if sep and tail.isdigit() else routing_key
+
+
+def queues_for(routing_key: str) -> List[str]:
+    if settings.WORKER_PARTITIONS <= 1:
+        return [routing_key]
+    return [f"{routing_key}.p{n}" for n in owned_partitions()]
+
+
+def partitioned_subscriber(broker, routing_key: str, **kwargs: Any) -> Callable:
+    """
+    Equivalente a `@broker.subscriber(routing_key)`, assinando as filas das
+    partições deste processo
+    """
+    def decorator(handler: Callable) -> Callable:
+        SUBSCRIBED_TOPICS.add(routing_key)
+        for queue in queues_for(routing_key):
+            handler = broker.subscriber(queue, **kwargs)(handler)
+        return handler
+
+    return decorator
+
+
+class _KeyLock:
+    __slots__ = ("lock", "waiters")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.waiters = 0
+
+
+_key_locks: Dict[str, _KeyLock] = {}
+# checkInIds cujo lock já pertence ao contexto atual (publicação processada em linha,
+# como no TestRabbitBroker); evita auto-deadlock
+_held_keys: ContextVar[frozenset] = ContextVar("held_checkin_keys", default=frozenset())
+
+
+@asynccontextmanager
+async def checkin_lock(cid: str) -> AsyncIterator[None]:
+    """
+    Exclusão mútua por checkInId dentro do processo, compartilhada pelos consumers
+    e por tarefas de fundo (ex.: timeouts de saga). Reentrante no mesmo contexto.
+    """
+    if cid in _held_keys.get():
+        yield
+        return
+
+    entry = _key_locks.get(cid)
+    if entry is None:
+        entry = _key_locks[cid] = _KeyLock()
+    entry.waiters += 1
+    try:
+        # asyncio.Lock atende em ordem FIFO
+        async with entry.lock:
+            token = _held_keys.set(_held_keys.get() | {cid})
+            try:
+                yield
+            finally:
+                _held_keys.reset(token)
+    finally:
+        entry.waiters -= 1
+        if not entry.waiters:
+            del _key_locks[cid]
+
+
+class CheckInOrderingMiddleware(BaseMiddleware):
+    """
+    Serializa, dentro do processo, as mensagens de um mesmo checkInId na ordem
+    de chegada. Check-ins diferentes seguem em paralelo até o prefetch do canal.
+    """
+
+    async def consume_scope(self, call_next, msg):
+        body = await msg.decode()
+        cid = body.get("checkInId") if isinstance(body, dict) else None
+        if not cid:
+            return await super().consume_scope(call_next, msg)
+
+        async with checkin_lock(cid):
+            return await super().consume_scope(call_next, msg)
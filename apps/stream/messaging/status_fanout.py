@@ -0,0 +1,13 @@
+# apps/stream/messaging/status_fanout.py
+from typing import Any, Dict
+
+from faststream.rabbit import ExchangeType, RabbitExchange
+
+from apps.stream.messaging import topic
+
+# Exchange fanout: cada processo da API liga a ela uma fila exclusiva própria
+FLOW_STATUS_EXCHANGE = RabbitExchange(topic.FLOW_STATUS_CHANGED, type=ExchangeType.FANOUT)
+
+
+def status_change_event(check_in_id: str, status: str, version: int, data: Dict[str, Any]) -> Dict[str, Any]:
+    return {"checkInId": check_in_id, "status": status, "version": version, "data": data}
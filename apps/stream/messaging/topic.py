@@ -6,4 +6,15 @@ SPOT_CONSULT_REQUESTED = "spot.consult.requested.v1"
 SPOT_CONSULT_COMPLETED = "spot.consult.completed.v1"
 SPOT_RESERVE_REQUESTED = "spot.reserve.requested.v1"
 SPOT_RESERVED = "spot.reserved.v1"
+SPOT_RELEASED = "spot.released.v1"
+SPOT_RELEASE_REQUESTED = "spot.release.requested.v1"  # compensação da reserva
 
+# Robôs
+ROBOT_ASSIGN_REQUESTED = "robot.assign.requested.v1"
+ROBOT_ASSIGNED = "robot.assigned.v1"
+
+# Saga do check-in encerrada sem concluir todas as etapas
+CHECKIN_FAILED = "checkin.failed.v1"
+
+# Fanout de mudanças do read model (exchange, não fila)
+FLOW_STATUS_CHANGED = "flow.status.changed.v1"
@@ -0,0 +1,137 @@
+# apps/stream/read_models/archive.py
+"""
+Arquivo dos fluxos retirados da flow_status pela retenção.
+
+Os fluxos ficam em arquivos JSON Lines comprimidos por dia de término
+(`AAAA/MM/flows-AAAA-MM-DD.jsonl.gz`, data UTC da última transição). Cada lote
+arquivado é um membro gzip próprio anexado ao arquivo do dia: o arquivo segue
+legível por zcat, e um catálogo SQLite (checkInId -> arquivo, offset do membro)
+permite ler um fluxo descomprimindo só o lote dele.
+
+Arquivar o mesmo fluxo de novo (ex.: depois de uma reconstrução que o trouxe de
+volta do log) só aponta o catálogo para a cópia mais recente.
+"""
+import asyncio, gzip, json, os, sqlite3, zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from core.config import settings
+from core.db import SQLiteStore, get_store
+
+CHUNK_BYTES = 64 * 1024
+
+
+class ArchivedFlow(NamedTuple):
+    """
+    Um fluxo a arquivar: `flow` tem o mesmo formato devolvido por get_status
+    """
+
+    check_in_id: str
+    updated_ms: int
+    flow: Dict[str, Any]
+
+
+def partition_of(updated_ms: int) -> str:
+    day = datetime.fromtimestamp(updated_ms / 1000, timezone.utc)
+    return f"{day:%Y}/{day:%m}/flows-{day:%Y-%m-%d}.jsonl.gz"
+
+
+def _create_schema(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archived_flows (
+            check_in_id TEXT PRIMARY KEY,
+            partition TEXT NOT NULL,
+            offset INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+def _catalog(conn: sqlite3.Connection, entries: Sequence[Tuple[str, str, int]]):
+    conn.executemany(
+        "INSERT OR REPLACE INTO archived_flows (check_in_id, partition, offset) VALUES (?, ?, ?)", entries,
+    )
+
+def _locate(conn: sqlite3.Connection, check_in_id: str) -> Optional[Tuple[str, int]]:
+    return conn.execute("SELECT partition, offset FROM archived_flows WHERE check_in_id = ?", (check_in_id,)).fetchone()
+
+
+class FlowArchive:
+    """
+    Arquivos por dia + catálogo. Só um processo escreve (o job de retenção);
+    qualquer processo lê.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._store: Optional[SQLiteStore] = None
+
+    @property
+    def store(self) -> SQLiteStore:
+        # aberto no primeiro uso: quem nunca consulta o arquivo não cria o catálogo
+        if self._store is None:
+            self._store = get_store(os.path.join(self.directory, "catalog.db"))
+            self._store.add_schema(_create_schema)
+        return self._store
+
+    def _write_members(self, flows: Sequence[ArchivedFlow]) -> List[Tuple[str, str, int]]:
+        by_partition: Dict[str, List[ArchivedFlow]] = {}
+        for item in flows:
+            by_partition.setdefault(partition_of(item.updated_ms), []).append(item)
+
+        entries = []
+        for partition, items in by_partition.items():
+            path = os.path.join(self.directory, partition)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            lines = "".join(
+                json.dumps({**item.flow, "checkInId": item.check_in_id}, ensure_ascii=False) + "\n" for item in items
+            )
+            member = gzip.compress(lines.encode("utf-8"), mtime=0)
+            with open(path, "ab") as f:
+                offset = f.tell()
+                f.write(member)
+                f.flush()
+                # o catálogo só aponta para dados já em disco
+                os.fsync(f.fileno())
+            entries.extend((item.check_in_id, partition, offset) for item in items)
+        return entries
+
+    async def append(self, flows: Sequence[ArchivedFlow]) -> int:
+        """
+        Grava os fluxos nos arquivos dos seus dias e os registra no catálogo. Ao
+        retornar, estão duráveis: a remoção da flow_status pode seguir.
+        """
+        if not flows:
+            return 0
+        entries = await asyncio.to_thread(self._write_members, flows)
+        await self.store.write(_catalog, entries)
+        return len(entries)
+
+    def _read_member(self, partition: str, offset: int, check_in_id: str) -> Optional[Dict[str, Any]]:
+        decompressor = zlib.decompressobj(wbits=31)  # um membro gzip; o próximo fica em unused_data
+        data = bytearray()
+        with open(os.path.join(self.directory, partition), "rb") as f:
+            f.seek(offset)
+            while not decompressor.eof:
+                chunk = f.read(CHUNK_BYTES)
+                if not chunk:
+                    break
+                data += decompressor.decompress(chunk)
+        needle = json.dumps(check_in_id)
+        for line in data.decode("utf-8").splitlines():
+            if needle in line:
+                flow = json.loads(line)
+                if flow.get("checkInId") == check_in_id:
+                    return flow
+        return None
+
+    async def get(self, check_in_id: str) -> Optional[Dict[str, Any]]:
+        location = await self.store.read(_locate, check_in_id)
+        if location is None:
+            return None
+        try:
+            return await asyncio.to_thread(self._read_member, *location, check_in_id)
+        except FileNotFoundError:
+            # partição removida à mão depois de arquivada
+            return None
+
+
+flow_archive = FlowArchive(settings.FLOW_ARCHIVE_DIR)
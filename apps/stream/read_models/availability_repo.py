@@ -0,0 +1,59 @@
+# apps/stream/read_models/availability_repo.py
+import sqlite3, time
+from typing import Dict, NamedTuple, Optional
+
+from core.db import get_store
+
+# Snapshots de disponibilidade por categoria: gravados pelo worker dono da
+# categoria, lidos pela API. Ficam no FLOW_STATUS_DB também no backend sharded.
+_store = get_store()
+
+
+class AvailabilitySnapshot(NamedTuple):
+    category: str
+    version: int
+    body: str  # JSON pronto da resposta de /api/consultar-vagas
+
+
+@_store.add_schema
+def _create_schema(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS spot_availability (
+            category TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            body TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+def _save(conn: sqlite3.Connection, category: str, version: int, body: str):
+    # a versão só avança: um escritor atrasado não sobrescreve um snapshot mais novo
+    conn.execute(
+        """
+        INSERT INTO spot_availability (category, version, body, updated_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT(category) DO UPDATE SET
+            version = excluded.version, body = excluded.body, updated_at = excluded.updated_at
+        WHERE excluded.version > spot_availability.version
+        """,
+        (category, version, body, time.time()),
+    )
+
+def _get(conn: sqlite3.Connection, category: str) -> Optional[AvailabilitySnapshot]:
+    row = conn.execute("SELECT version, body FROM spot_availability WHERE category = ?", (category,)).fetchone()
+    return None if row is None else AvailabilitySnapshot(category, row[0], row[1])
+
+def _versions(conn: sqlite3.Connection) -> Dict[str, int]:
+    return dict(conn.execute("SELECT category, version FROM spot_availability"))
+
+
+async def save_snapshot(category: str, version: int, body: str):
+    await _store.write(_save, category, version, body)
+
+async def get_snapshot(category: str) -> Optional[AvailabilitySnapshot]:
+    return await _store.read(_get, category)
+
+async def load_versions() -> Dict[str, int]:
+    """
+    Última versão gravada de cada categoria (as novas continuam a partir dela)
+    """
+    return await _store.read(_versions)
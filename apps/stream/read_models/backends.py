@@ -0,0 +1,855 @@
+# apps/stream/read_models/backends.py
+"""
+Backends de armazenamento do read model flow_status.
+
+- memory: dict no processo do worker (testes e nó único; não durável)
+- sqlite: um arquivo (FLOW_STATUS_DB), escritas serializadas por um escritor
+- sharded: FLOW_STATUS_SHARDS arquivos SQLite, checkInIds distribuídos por hash;
+  cada arquivo tem seu escritor, então as escritas seguem em paralelo
+
+Em todos, a mudança de estado, a escrita adicional (`in_transaction`, ex.: a
+saga) e as mensagens do outbox são gravadas juntas, no store do checkInId.
+
+Nos backends SQLite, data_json é gravado com FLOW_DATA_CODEC: em JSON (texto)
+o patch é aplicado dentro do banco com json_set; em msgpack (BLOB) a linha é
+lida, alterada e regravada na mesma transação do escritor. Linhas nos dois
+formatos convivem e são lidas sempre.
+
+Os campos consultados pela operação (categoria, placa, vaga reservada e o
+instante da última transição em epoch ms) ficam também em colunas tipadas e
+indexadas, mantidas pelo mesmo statement que grava data_json. Os contadores do
+painel da operação (ver counters.py) derivam dessas colunas.
+"""
+import asyncio, heapq, json, sqlite3, time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from core.config import settings
+from core.db import SQLiteStore, StoreGroup, flow_stores
+from apps.stream.read_models.counters import (
+    FlowCounters, RateWindow, count_rows, counter_drift, counter_keys, create_counter_schema, merge_counters,
+    merge_drift, read_counters, reconcile, recount, reset_counters, to_counters,
+)
+from apps.stream.messaging.codec import FLOW_DATA_SCHEMA_VERSION, codec_named, decode_stored, json_codec
+from apps.stream.messaging.outbox import OutgoingMessage, enqueue_sync
+from apps.stream.read_models.archive import ArchivedFlow
+
+# Resultado de uma escrita: (nova versão, status gravado, menor available_at enfileirado)
+PatchResult = Tuple[int, str, Optional[float]]
+InTransaction = Optional[Callable[[sqlite3.Connection], Any]]
+ManyResult = Tuple[List[Union[Tuple[int, str], "VersionConflict"]], Optional[float]]
+
+
+# codec das novas gravações de data_json
+flow_data_codec = codec_named(settings.FLOW_DATA_CODEC)
+
+
+def encode_flow_data(data: Dict[str, Any]) -> Union[str, bytes]:
+    # JSON fica como texto: json_set/json_extract só operam sobre texto
+    if flow_data_codec is json_codec:
+        return json.dumps(data, ensure_ascii=False)
+    return flow_data_codec.encode(data, FLOW_DATA_SCHEMA_VERSION)
+
+def decode_flow_data(value: Union[str, bytes, None]) -> Dict[str, Any]:
+    return decode_stored(value) if value else {}
+
+
+class VersionConflict(Exception):
+    """
+    A versão atual do fluxo difere da esperada: outra transição chegou antes
+    """
+
+    def __init__(self, check_in_id: str, expected_version: int):
+        super().__init__(f"Conflito de versão para checkInId={check_in_id} (esperada={expected_version})")
+        self.check_in_id = check_in_id
+        self.expected_version = expected_version
+
+
+class FlowSummary(NamedTuple):
+    """
+    Linha da listagem de fluxos: só colunas tipadas, sem decodificar data_json
+    """
+
+    check_in_id: str
+    status: Optional[str]
+    vehicle_category: Optional[str]
+    license_plate: Optional[str]
+    spot_id: Optional[str]
+    updated_at: Optional[str]
+    updated_ms: Optional[int]
+    version: int
+
+
+class FlowPatch(NamedTuple):
+    """
+    Uma transição de um lote gravado por `patch_status_many` (mesma semântica de `patch_status`)
+    """
+
+    check_in_id: str
+    status: Optional[str]
+    patch: Dict[str, Any]
+    expected_version: Optional[int] = None
+    outbox: Sequence[OutgoingMessage] = ()
+
+
+# Colunas tipadas derivadas de data_json, na ordem da tabela (depois de `version`,
+# onde o ALTER TABLE das bases antigas também as coloca)
+TYPED_COLUMNS = (
+    ("updated_ms", "INTEGER"), ("vehicle_category", "TEXT"), ("license_plate", "TEXT"), ("spot_id", "TEXT"),
+    ("spot_level", "INTEGER"), ("reserved_until_ms", "INTEGER"),
+)
+# colunas que vêm de chaves do patch (updated_ms vem do relógio)
+HOT_COLUMNS = ("vehicle_category", "license_plate", "spot_id", "spot_level", "reserved_until_ms")
+
+BACKFILL_BATCH = 5000
+
+
+def normalize_plate(plate: Any) -> Optional[str]:
+    """
+    Placa só com letras e dígitos, em maiúsculas (`abc-1234` -> `ABC1234`)
+    """
+    if not isinstance(plate, str):
+        return None
+    return "".join(ch for ch in plate if ch.isalnum()).upper() or None
+
+def hot_columns(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Valores das colunas tipadas para as chaves presentes em `data` (um patch ou o fluxo inteiro)
+    """
+    columns = {}
+    if "vehicleCategory" in data:
+        category = data["vehicleCategory"]
+        columns["vehicle_category"] = (category.strip().lower() or None) if isinstance(category, str) else None
+    if "licensePlate" in data:
+        columns["license_plate"] = normalize_plate(data["licensePlate"])
+    if "spot" in data:
+        spot = data["spot"] if isinstance(data["spot"], dict) else {}
+        level = spot.get("level")
+        columns["spot_id"] = spot.get("spotId")
+        columns["spot_level"] = int(level) if isinstance(level, (int, str)) and str(level).isdigit() else None
+        columns["reserved_until_ms"] = iso_to_ms(spot.get("reservedUntil"))
+    return columns
+
+def iso_to_ms(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.rstrip("Z"))
+    return int((parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)).timestamp() * 1000)
+
+def _now() -> Tuple[str, int]:
+    # updated_at (texto, exposto como updatedAt) e updated_ms saem do mesmo instante
+    ts = time.time()
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat() + "Z", int(ts * 1000)
+
+def create_flow_status_table(conn: sqlite3.Connection, table: str = "flow_status"):
+    """
+    DDL da tabela do read model; também usada pela reconstrução para montar a tabela nova
+    """
+    typed = "".join(f",\n            {name} {kind}" for name, kind in TYPED_COLUMNS)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            check_in_id TEXT PRIMARY KEY,
+            status TEXT,
+            data_json TEXT,
+            updated_at TEXT,
+            version INTEGER NOT NULL DEFAULT 1{typed}
+        )
+    """)
+
+def create_flow_status_indexes(conn: sqlite3.Connection):
+    """
+    Índices da listagem da operação. A placa e a vaga só entram no UPDATE quando
+    o patch as traz, então esses índices não pesam nas transições seguintes;
+    o de status muda a cada transição (updated_ms faz parte da chave).
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS flow_status_by_status ON flow_status (status, updated_ms, check_in_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS flow_status_by_plate ON flow_status (license_plate)")
+    # poucos fluxos seguram vaga ao mesmo tempo: índice parcial, lido na subida do worker
+    conn.execute("CREATE INDEX IF NOT EXISTS flow_status_holding_spot ON flow_status (spot_id) WHERE spot_id IS NOT NULL")
+
+def _backfill_typed_columns(conn: sqlite3.Connection):
+    """
+    Preenche as colunas tipadas das linhas gravadas antes de elas existirem (uma vez, na migração)
+    """
+    last = 0
+    while True:
+        rows = conn.execute(
+            "SELECT rowid, data_json, updated_at FROM flow_status WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (last, BACKFILL_BATCH),
+        ).fetchall()
+        if not rows:
+            return
+        updates = []
+        for rowid, data_json, updated_at in rows:
+            columns = hot_columns(decode_flow_data(data_json))
+            updates.append((iso_to_ms(updated_at), *(columns.get(name) for name in HOT_COLUMNS), rowid))
+        conn.executemany(
+            f"UPDATE flow_status SET updated_ms = ?, {', '.join(f'{name} = ?' for name in HOT_COLUMNS)} WHERE rowid = ?",
+            updates,
+        )
+        last = rows[-1][0]
+
+def _create_schema(conn: sqlite3.Connection):
+    create_flow_status_table(conn)
+    # API e worker abrem o mesmo arquivo: a migração roda sob o lock de escrita
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(flow_status)")}
+        if "version" not in columns:
+            conn.execute("ALTER TABLE flow_status ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        missing = [(name, kind) for name, kind in TYPED_COLUMNS if name not in columns]
+        for name, kind in missing:
+            conn.execute(f"ALTER TABLE flow_status ADD COLUMN {name} {kind}")
+        if missing:
+            _backfill_typed_columns(conn)
+        create_flow_status_indexes(conn)
+        if create_counter_schema(conn):
+            # base anterior aos contadores: os fluxos existentes entram por recontagem
+            reset_counters(conn, recount(conn))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+def _patch_params(patch: Dict[str, Any], encoded: Optional[Dict[int, str]] = None) -> List[str]:
+    """
+    Parâmetros (caminho, valor em JSON) de cada chave do patch. `encoded` reaproveita a
+    serialização de valores repetidos num lote (ex.: a mesma lista de vagas), indexada por id()
+    """
+    params = []
+    for key, value in patch.items():
+        text = encoded.get(id(value)) if encoded is not None else None
+        if text is None:
+            text = json.dumps(value, ensure_ascii=False)
+            if encoded is not None:
+                encoded[id(value)] = text
+        params += ["$." + json.dumps(key), text]
+    return params
+
+def _json_set(target: str, params: Sequence[str]) -> str:
+    """
+    Monta `json_set(target, '$."k"', json(?), ...)` para aplicar as chaves de primeiro nível
+    do patch dentro do banco (json_set preserva nulls aninhados, ao contrário de json_patch)
+    """
+    return f"json_set({', '.join([target] + ['?, json(?)'] * (len(params) // 2))})"
+
+def _patch_decoded(
+    conn: sqlite3.Connection,
+    check_in_id: str,
+    status: Optional[str],
+    patch: Dict[str, Any],
+    expected_version: Optional[int],
+    now: Tuple[str, int],
+) -> Tuple[int, str]:
+    """
+    Patch lido e aplicado em Python (linhas em formato binário). É seguro porque
+    roda na transação do escritor único: ninguém grava a linha entre a leitura e a escrita
+    """
+    hot = hot_columns(patch)
+    row = conn.execute("SELECT data_json, version FROM flow_status WHERE check_in_id = ?", (check_in_id,)).fetchone()
+    if row is None:
+        if expected_version:
+            raise VersionConflict(check_in_id, expected_version)
+        return conn.execute(f"""
+            INSERT INTO flow_status (check_in_id, status, data_json, updated_at, updated_ms, {', '.join(HOT_COLUMNS)}, version)
+            VALUES (?, ?, ?, ?, ?, {', '.join('?' * len(HOT_COLUMNS))}, 1)
+            RETURNING version, status
+        """, (check_in_id, status, encode_flow_data(dict(patch)), *now, *(hot.get(name) for name in HOT_COLUMNS))).fetchone()
+
+    if expected_version is not None and expected_version != row[1]:
+        raise VersionConflict(check_in_id, expected_version)
+    data = decode_flow_data(row[0])
+    data.update(patch)
+    return conn.execute(f"""
+        UPDATE flow_status SET
+            status = coalesce(?, status),
+            data_json = ?,
+            updated_at = ?,
+            updated_ms = ?{"".join(f", {name} = ?" for name in hot)},
+            version = version + 1
+        WHERE check_in_id = ?
+        RETURNING version, status
+    """, (status, encode_flow_data(data), *now, *hot.values(), check_in_id)).fetchone()
+
+def _patch_row(
+    conn: sqlite3.Connection,
+    check_in_id: str,
+    status: Optional[str],
+    patch: Dict[str, Any],
+    expected_version: Optional[int],
+    encoded: Optional[Dict[int, str]] = None,
+) -> Tuple[int, str]:
+    now = _now()
+    if flow_data_codec is not json_codec:
+        return _patch_decoded(conn, check_in_id, status, patch, expected_version, now)
+    params = _patch_params(patch, encoded)
+    # só as colunas tipadas cujas chaves vieram no patch são regravadas
+    hot = hot_columns(patch)
+    if expected_version:
+        row = conn.execute(f"""
+            UPDATE flow_status SET
+                status = coalesce(?, status),
+                data_json = {_json_set("coalesce(data_json, '{}')", params)},
+                updated_at = ?,
+                updated_ms = ?{"".join(f", {name} = ?" for name in hot)},
+                version = version + 1
+            WHERE check_in_id = ? AND version = ? AND typeof(data_json) != 'blob'
+            RETURNING version, status
+        """, (status, *params, *now, *hot.values(), check_in_id, expected_version)).fetchone()
+    else:
+        # expected_version == 0: o fluxo não pode existir ainda
+        on_conflict = "NOTHING" if expected_version == 0 else f"""UPDATE SET
+                status = coalesce(excluded.status, flow_status.status),
+                data_json = {_json_set("coalesce(flow_status.data_json, '{}')", params)},
+                updated_at = excluded.updated_at,
+                updated_ms = excluded.updated_ms{"".join(f", {name} = excluded.{name}" for name in hot)},
+                version = flow_status.version + 1
+            WHERE typeof(flow_status.data_json) != 'blob'"""
+        row = conn.execute(f"""
+            INSERT INTO flow_status (check_in_id, status, data_json, updated_at, updated_ms, {', '.join(HOT_COLUMNS)}, version)
+            VALUES (?, ?, {_json_set("'{}'", params)}, ?, ?, {', '.join('?' * len(HOT_COLUMNS))}, 1)
+            ON CONFLICT(check_in_id) DO {on_conflict}
+            RETURNING version, status
+        """, (
+            check_in_id, status, *params, *now, *(hot.get(name) for name in HOT_COLUMNS),
+            *(params if expected_version is None else []),
+        )).fetchone()
+
+    if row is None:
+        # linha gravada em binário (ex.: FLOW_DATA_CODEC voltou para json): json_set não a
+        # lê, então o patch é aplicado em Python e a linha volta a ser texto
+        if conn.execute(
+            "SELECT 1 FROM flow_status WHERE check_in_id = ? AND typeof(data_json) = 'blob'", (check_in_id,)
+        ).fetchone():
+            return _patch_decoded(conn, check_in_id, status, patch, expected_version, now)
+        raise VersionConflict(check_in_id, expected_version)
+    return row[0], row[1]
+
+def _patch_and_enqueue(
+    conn: sqlite3.Connection,
+    check_in_id: str,
+    status: Optional[str],
+    patch: Dict[str, Any],
+    expected_version: Optional[int],
+    outbox: Sequence[OutgoingMessage],
+    in_transaction: Optional[Callable[[sqlite3.Connection], Any]] = None,
+) -> Tuple[int, str, Optional[float]]:
+    # mesma transação: se o patch falhar (ex.: VersionConflict), nenhuma mensagem é gravada
+    version, status = _patch_row(conn, check_in_id, status, patch, expected_version)
+    if in_transaction is not None:
+        in_transaction(conn)
+    return version, status, enqueue_sync(conn, outbox) if outbox else None
+
+def _patch_many(
+    conn: sqlite3.Connection,
+    patches: Sequence[FlowPatch],
+    outbox: Sequence[OutgoingMessage],
+) -> Tuple[List[Union[Tuple[int, str], VersionConflict]], Optional[float]]:
+    # um conflito de versão não altera nada no banco: só aquele item fica de fora do lote
+    results: List[Union[Tuple[int, str], VersionConflict]] = []
+    messages = list(outbox)
+    encoded: Dict[int, str] = {}
+    for p in patches:
+        try:
+            results.append(_patch_row(conn, p.check_in_id, p.status, p.patch, p.expected_version, encoded))
+        except VersionConflict as exc:
+            results.append(exc)
+            continue
+        messages.extend(p.outbox)
+    return results, enqueue_sync(conn, messages) if messages else None
+
+def _get_row(conn: sqlite3.Connection, check_in_id: str) -> Optional[Dict[str, Any]]:
+    cur = conn.execute("SELECT status, data_json, updated_at, version FROM flow_status WHERE check_in_id = ?", (check_in_id,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    status, data_json, updated_at, version = row
+    data = decode_flow_data(data_json)
+    data.update({"status": status, "updatedAt": updated_at, "version": version})
+    return data
+
+def _get_rows(conn: sqlite3.Connection, check_in_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    rows = {}
+    # limite de variáveis por statement do SQLite
+    for start in range(0, len(check_in_ids), 500):
+        chunk = check_in_ids[start:start + 500]
+        cur = conn.execute(f"""
+            SELECT check_in_id, status, data_json, updated_at, version FROM flow_status
+            WHERE check_in_id IN ({', '.join('?' * len(chunk))})
+        """, chunk)
+        for check_in_id, status, data_json, updated_at, version in cur:
+            data = decode_flow_data(data_json)
+            data.update({"status": status, "updatedAt": updated_at, "version": version})
+            rows[check_in_id] = data
+    return rows
+
+def _list_held_spots(conn: sqlite3.Connection):
+    # índice parcial em spot_id: só as linhas que seguram vaga são lidas e decodificadas
+    rows = conn.execute("SELECT check_in_id, status, data_json FROM flow_status WHERE spot_id IS NOT NULL")
+    return [(cid, status, decode_flow_data(data_json)["spot"]) for cid, status, data_json in rows]
+
+def _list_flows(
+    conn: sqlite3.Connection,
+    status: Optional[str],
+    plate: Optional[str],
+    updated_before_ms: Optional[int],
+    after: Optional[Tuple[int, str]],
+    descending: bool,
+    limit: int,
+) -> List[FlowSummary]:
+    """
+    Página da listagem por status e/ou placa, ordenada por (updated_ms, check_in_id).
+    `after` é a chave da última linha da página anterior (paginação por chave:
+    o custo de cada página não depende de quantas vieram antes)
+    """
+    where, params = [], []
+    if status is not None:
+        where.append("status = ?")
+        params.append(status)
+    if plate is not None:
+        where.append("license_plate = ?")
+        params.append(plate)
+    if updated_before_ms is not None:
+        where.append("updated_ms <= ?")
+        params.append(updated_before_ms)
+    if after is not None:
+        where.append(f"(updated_ms, check_in_id) {'<' if descending else '>'} (?, ?)")
+        params.extend(after)
+    order = "DESC" if descending else "ASC"
+    rows = conn.execute(f"""
+        SELECT check_in_id, status, vehicle_category, license_plate, spot_id, updated_at, updated_ms, version
+        FROM flow_status
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY updated_ms {order}, check_in_id {order}
+        LIMIT ?
+    """, (*params, limit))
+    return [FlowSummary(*row) for row in rows]
+
+def _list_finished(
+    conn: sqlite3.Connection,
+    status: str,
+    before_ms: int,
+    after: Optional[Tuple[int, str]],
+    limit: int,
+) -> List[ArchivedFlow]:
+    """
+    Fluxos no status com a última transição antes de `before_ms` e sem vaga presa,
+    em ordem de (updated_ms, check_in_id) a partir de `after` (índice por status)
+    """
+    rows = conn.execute("""
+        SELECT check_in_id, status, data_json, updated_at, version, updated_ms FROM flow_status
+        WHERE status = ? AND updated_ms < ? AND (updated_ms, check_in_id) > (?, ?) AND spot_id IS NULL
+        ORDER BY updated_ms, check_in_id
+        LIMIT ?
+    """, (status, before_ms, *(after or (-1, "")), limit))
+    finished = []
+    for check_in_id, status, data_json, updated_at, version, updated_ms in rows:
+        flow = decode_flow_data(data_json)
+        flow.update({"status": status, "updatedAt": updated_at, "version": version})
+        finished.append(ArchivedFlow(check_in_id, updated_ms, flow))
+    return finished
+
+def _delete_flows(conn: sqlite3.Connection, keys: Sequence[Tuple[str, int]]) -> int:
+    # só remove quem continua na versão arquivada: uma transição tardia mantém o fluxo
+    return conn.executemany("DELETE FROM flow_status WHERE check_in_id = ? AND version = ?", keys).rowcount
+
+def _incremental_vacuum(conn: sqlite3.Connection, pages: int) -> Optional[int]:
+    """
+    Devolve ao SO até `pages` páginas livres; retorna as que sobraram
+    (None se o arquivo não está em auto_vacuum incremental)
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return None
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    # o módulo sqlite3 executa um só passo do PRAGMA, que libera uma página por passo
+    for _ in range(min(pages, free)):
+        conn.execute("PRAGMA incremental_vacuum(1)")
+    return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+# ---------- Backends ----------
+
+class FlowStatusBackend:
+    """
+    Interface de armazenamento dos fluxos usada por flow_status_repo
+    """
+
+    name = ""
+
+    async def patch(
+        self,
+        check_in_id: str,
+        status: Optional[str],
+        patch: Dict[str, Any],
+        expected_version: Optional[int],
+        outbox: Sequence[OutgoingMessage],
+        in_transaction: InTransaction,
+    ) -> PatchResult:
+        raise NotImplementedError
+
+    async def patch_many(self, patches: Sequence[FlowPatch], outbox: Sequence[OutgoingMessage]) -> ManyResult:
+        raise NotImplementedError
+
+    async def get(self, check_in_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def get_many(self, check_in_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def list_held_spots(self) -> List[Tuple[str, str, Dict[str, Any]]]:
+        raise NotImplementedError
+
+    async def list_flows(
+        self,
+        status: Optional[str],
+        plate: Optional[str],
+        updated_before_ms: Optional[int],
+        after: Optional[Tuple[int, str]],
+        descending: bool,
+        limit: int,
+    ) -> List[FlowSummary]:
+        raise NotImplementedError
+
+    async def counters(self) -> FlowCounters:
+        raise NotImplementedError
+
+    async def reconcile_counters(self, fix: bool) -> Dict[str, Dict[str, int]]:
+        """
+        Diferenças entre os contadores e uma recontagem dos fluxos ("tipo:chave" -> {stored, actual})
+        """
+        raise NotImplementedError
+
+    async def list_finished(self, status: str, before_ms: int, after: Optional[Tuple[int, str]], limit: int) -> List[ArchivedFlow]:
+        raise NotImplementedError
+
+    async def delete_flows(self, keys: Sequence[Tuple[str, int]]) -> int:
+        """
+        Remove os fluxos (checkInId, versão) que ainda estão na versão indicada; devolve quantos saíram
+        """
+        raise NotImplementedError
+
+    async def incremental_vacuum(self, pages: int) -> Optional[int]:
+        raise NotImplementedError
+
+
+class SQLiteBackend(FlowStatusBackend):
+    """
+    Tabela flow_status num único arquivo; cada transição é um statement
+    """
+
+    name = "sqlite"
+
+    def __init__(self, store: SQLiteStore):
+        self.store = store
+        self.store.add_schema(_create_schema)
+
+    async def patch(self, check_in_id, status, patch, expected_version, outbox, in_transaction) -> PatchResult:
+        return await self.store.write(_patch_and_enqueue, check_in_id, status, patch, expected_version, outbox, in_transaction)
+
+    async def patch_many(self, patches, outbox) -> ManyResult:
+        return await self.store.write(_patch_many, list(patches), list(outbox))
+
+    async def get(self, check_in_id):
+        return await self.store.read(_get_row, check_in_id)
+
+    async def get_many(self, check_in_ids):
+        return await self.store.read(_get_rows, list(check_in_ids))
+
+    async def list_held_spots(self):
+        return await self.store.read(_list_held_spots)
+
+    async def list_flows(self, status, plate, updated_before_ms, after, descending, limit):
+        return await self.store.read(_list_flows, status, plate, updated_before_ms, after, descending, limit)
+
+    async def counters(self):
+        return await self.store.read(read_counters, int(time.time() * 1000))
+
+    async def reconcile_counters(self, fix):
+        return await self.store.write(reconcile, fix)
+
+    async def list_finished(self, status, before_ms, after, limit):
+        return await self.store.read(_list_finished, status, before_ms, after, limit)
+
+    async def delete_flows(self, keys):
+        return await self.store.write(_delete_flows, list(keys))
+
+    async def incremental_vacuum(self, pages):
+        return await self.store.write(_incremental_vacuum, pages)
+
+
+class ShardedSQLiteBackend(FlowStatusBackend):
+    """
+    Um SQLiteBackend por arquivo do StoreGroup. Operações de vários check-ins são
+    divididas por arquivo e executadas em paralelo; cada parte é uma transação
+    """
+
+    name = "sharded"
+
+    def __init__(self, stores: StoreGroup):
+        self._stores = stores
+        self._shards = {id(store): SQLiteBackend(store) for store in stores}
+
+    def _shard(self, check_in_id: str) -> SQLiteBackend:
+        return self._shards[id(self._stores.for_key(check_in_id))]
+
+    async def patch(self, check_in_id, status, patch, expected_version, outbox, in_transaction) -> PatchResult:
+        return await self._shard(check_in_id).patch(check_in_id, status, patch, expected_version, outbox, in_transaction)
+
+    async def patch_many(self, patches, outbox) -> ManyResult:
+        # SQLiteBackend -> (posições no lote, patches, mensagens avulsas)
+        groups: Dict[SQLiteBackend, Tuple[List[int], List[FlowPatch], List[OutgoingMessage]]] = {}
+        for i, p in enumerate(patches):
+            indexes, items, _ = groups.setdefault(self._shard(p.check_in_id), ([], [], []))
+            indexes.append(i)
+            items.append(p)
+        # mensagens sem transição vão para o outbox do arquivo do seu checkInId
+        for m in outbox:
+            groups.setdefault(self._shard(str(m.payload.get("checkInId") or "")), ([], [], []))[2].append(m)
+
+        shards = list(groups)
+        parts = await asyncio.gather(*(shard.patch_many(groups[shard][1], groups[shard][2]) for shard in shards))
+        results: List[Any] = [None] * len(patches)
+        available = []
+        for shard, (part, available_at) in zip(shards, parts):
+            for i, result in zip(groups[shard][0], part):
+                results[i] = result
+            if available_at is not None:
+                available.append(available_at)
+        return results, min(available, default=None)
+
+    async def get(self, check_in_id):
+        return await self._shard(check_in_id).get(check_in_id)
+
+    async def get_many(self, check_in_ids):
+        groups: Dict[SQLiteBackend, List[str]] = {}
+        for cid in check_in_ids:
+            groups.setdefault(self._shard(cid), []).append(cid)
+        rows: Dict[str, Dict[str, Any]] = {}
+        for part in await asyncio.gather(*(shard.get_many(ids) for shard, ids in groups.items())):
+            rows.update(part)
+        return rows
+
+    async def list_held_spots(self):
+        held = []
+        for part in await asyncio.gather(*(shard.list_held_spots() for shard in self._shards.values())):
+            held.extend(part)
+        return held
+
+    async def list_flows(self, status, plate, updated_before_ms, after, descending, limit):
+        # cada arquivo devolve sua primeira página depois de `after`; a página global são
+        # as `limit` primeiras da intercalação
+        parts = await asyncio.gather(*(
+            shard.list_flows(status, plate, updated_before_ms, after, descending, limit)
+            for shard in self._shards.values()
+        ))
+        merged = heapq.merge(*parts, key=_summary_key, reverse=descending)
+        return [summary for _, summary in zip(range(limit), merged)]
+
+    async def counters(self):
+        return merge_counters(await asyncio.gather(*(shard.counters() for shard in self._shards.values())))
+
+    async def reconcile_counters(self, fix):
+        return merge_drift(await asyncio.gather(*(shard.reconcile_counters(fix) for shard in self._shards.values())))
+
+    async def list_finished(self, status, before_ms, after, limit):
+        parts = await asyncio.gather(*(shard.list_finished(status, before_ms, after, limit) for shard in self._shards.values()))
+        merged = heapq.merge(*parts, key=lambda item: (item.updated_ms, item.check_in_id))
+        return [item for _, item in zip(range(limit), merged)]
+
+    async def delete_flows(self, keys):
+        groups: Dict[SQLiteBackend, List[Tuple[str, int]]] = {}
+        for key in keys:
+            groups.setdefault(self._shard(key[0]), []).append(key)
+        return sum(await asyncio.gather(*(shard.delete_flows(part) for shard, part in groups.items())))
+
+    async def incremental_vacuum(self, pages):
+        left = await asyncio.gather(*(shard.incremental_vacuum(pages) for shard in self._shards.values()))
+        return None if all(n is None for n in left) else sum(n or 0 for n in left)
+
+
+def _summary_key(summary: FlowSummary) -> Tuple[int, str]:
+    return summary.updated_ms or 0, summary.check_in_id
+
+
+class MemoryBackend(FlowStatusBackend):
+    """
+    Fluxos num dict do processo. A troca da linha roda na thread escritora do
+    store, depois da escrita adicional e do outbox da mesma operação (que
+    continuam no SQLite); uma falha antes disso não altera o dict.
+    Os valores não são copiados: quem lê não deve alterá-los.
+    """
+
+    name = "memory"
+
+    def __init__(self, stores: StoreGroup):
+        self._stores = stores
+        # checkInId -> (status, dados, updated_at, versão, updated_ms); a tupla é trocada inteira
+        self._rows: Dict[str, Tuple[Optional[str], Dict[str, Any], str, int, int]] = {}
+        # contadores do painel, ajustados a cada troca de linha (como os triggers do SQLite)
+        self._counts: Dict[Tuple[str, Any], int] = {}
+        self._rate = RateWindow()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _next_row(self, check_in_id: str, status: Optional[str], patch: Dict[str, Any], expected_version: Optional[int]):
+        current = self._rows.get(check_in_id)
+        version = current[3] if current else 0
+        if expected_version is not None and expected_version != version:
+            raise VersionConflict(check_in_id, expected_version)
+        data = {**current[1], **patch} if current else dict(patch)
+        if status is None and current:
+            status = current[0]
+        updated_at, updated_ms = _now()
+        return status, data, updated_at, version + 1, updated_ms
+
+    def _count(self, old, new, created: int = 0):
+        """
+        Ajusta os contadores da troca old -> new; `created` = +1 na criação do fluxo, -1 ao desfazê-la
+        """
+        for row, delta in ((old, -1), (new, 1)):
+            if row is not None:
+                for key in counter_keys(row[0], hot_columns(row[1])):
+                    self._counts[key] = self._counts.get(key, 0) + delta
+        if created:
+            self._rate.add((new or old)[4], created)
+
+    def _apply(self, conn, check_in_id, status, patch, expected_version, outbox, in_transaction) -> PatchResult:
+        row = self._next_row(check_in_id, status, patch, expected_version)
+        if in_transaction is not None:
+            in_transaction(conn)
+        available_at = enqueue_sync(conn, outbox) if outbox else None
+        current = self._rows.get(check_in_id)
+        self._count(current, row, created=int(current is None))
+        self._rows[check_in_id] = row
+        return row[3], row[0], available_at
+
+    def _apply_many(self, conn, patches: Sequence[FlowPatch], outbox: Sequence[OutgoingMessage]) -> ManyResult:
+        previous, results = [], []
+        messages = list(outbox)
+        for p in patches:
+            try:
+                row = self._next_row(p.check_in_id, p.status, p.patch, p.expected_version)
+            except VersionConflict as exc:
+                results.append(exc)
+                continue
+            # patches do mesmo checkInId no lote se encadeiam
+            previous.append((p.check_in_id, self._rows.get(p.check_in_id)))
+            self._count(previous[-1][1], row, created=int(previous[-1][1] is None))
+            self._rows[p.check_in_id] = row
+            results.append((row[3], row[0]))
+            messages.extend(p.outbox)
+        try:
+            return results, enqueue_sync(conn, messages) if messages else None
+        except BaseException:
+            # desfaz na ordem inversa: o dict volta ao estado anterior ao lote
+            for check_in_id, row in reversed(previous):
+                self._count(self._rows.get(check_in_id), row, created=-1 if row is None else 0)
+                if row is None:
+                    self._rows.pop(check_in_id, None)
+                else:
+                    self._rows[check_in_id] = row
+            raise
+
+    async def patch(self, check_in_id, status, patch, expected_version, outbox, in_transaction) -> PatchResult:
+        store = self._stores.for_key(check_in_id)
+        return await store.write(self._apply, check_in_id, status, patch, expected_version, outbox, in_transaction)
+
+    async def patch_many(self, patches, outbox) -> ManyResult:
+        return await self._stores.for_key("").write(self._apply_many, list(patches), list(outbox))
+
+    def _to_dict(self, row) -> Dict[str, Any]:
+        status, data, updated_at, version, _ = row
+        return {**data, "status": status, "updatedAt": updated_at, "version": version}
+
+    async def get(self, check_in_id):
+        row = self._rows.get(check_in_id)
+        return None if row is None else self._to_dict(row)
+
+    async def get_many(self, check_in_ids):
+        rows = {}
+        for cid in check_in_ids:
+            row = self._rows.get(cid)
+            if row is not None:
+                rows[cid] = self._to_dict(row)
+        return rows
+
+    async def list_held_spots(self):
+        return [
+            (cid, status, data["spot"])
+            for cid, (status, data, _, _, _) in list(self._rows.items())
+            if isinstance(data.get("spot"), dict) and data["spot"].get("spotId")
+        ]
+
+    async def list_flows(self, status, plate, updated_before_ms, after, descending, limit):
+        # sem índices: varre o dict (backend de testes e nó único)
+        summaries = []
+        for cid, (row_status, data, updated_at, version, updated_ms) in list(self._rows.items()):
+            columns = hot_columns(data)
+            if status is not None and row_status != status:
+                continue
+            if plate is not None and columns.get("license_plate") != plate:
+                continue
+            if updated_before_ms is not None and updated_ms > updated_before_ms:
+                continue
+            if after is not None and ((updated_ms, cid) <= after if not descending else (updated_ms, cid) >= after):
+                continue
+            summaries.append(FlowSummary(
+                cid, row_status, columns.get("vehicle_category"), columns.get("license_plate"),
+                columns.get("spot_id"), updated_at, updated_ms, version,
+            ))
+        summaries.sort(key=_summary_key, reverse=descending)
+        return summaries[:limit]
+
+    async def counters(self):
+        return to_counters(dict(self._counts), self._rate.snapshot(int(time.time() * 1000)))
+
+    def _reconcile(self, conn, fix: bool):
+        actual = count_rows((status, hot_columns(data)) for status, data, _, _, _ in list(self._rows.values()))
+        drift = counter_drift({key: value for key, value in self._counts.items() if value}, actual)
+        if fix:
+            self._counts = actual
+        return drift
+
+    async def reconcile_counters(self, fix):
+        # na thread escritora: nenhuma troca de linha do mesmo store entre a recontagem e a correção
+        return await self._stores.for_key("").write(self._reconcile, fix)
+
+    async def list_finished(self, status, before_ms, after, limit):
+        finished = [
+            ArchivedFlow(cid, row[4], self._to_dict(row))
+            for cid, row in list(self._rows.items())
+            if row[0] == status and (row[4], cid) > (after or (-1, "")) and row[4] < before_ms
+            and not hot_columns(row[1]).get("spot_id")
+        ]
+        finished.sort(key=lambda item: (item.updated_ms, item.check_in_id))
+        return finished[:limit]
+
+    def _delete(self, conn, keys: Sequence[Tuple[str, int]]) -> int:
+        deleted = 0
+        for cid, version in keys:
+            row = self._rows.get(cid)
+            if row is not None and row[3] == version:
+                self._count(self._rows.pop(cid), None)
+                deleted += 1
+        return deleted
+
+    async def delete_flows(self, keys):
+        return await self._stores.for_key("").write(self._delete, list(keys))
+
+    async def incremental_vacuum(self, pages):
+        return None
+
+
+def create_backend() -> FlowStatusBackend:
+    """
+    Backend configurado em FLOW_STATUS_BACKEND, sobre os stores de `flow_stores()`
+    """
+    name = settings.FLOW_STATUS_BACKEND.lower()
+    if name == "memory":
+        return MemoryBackend(flow_stores())
+    if name == "sqlite":
+        return SQLiteBackend(flow_stores().stores[0])
+    if name == "sharded":
+        return ShardedSQLiteBackend(flow_stores())
+    raise ValueError(f"Backend do read model inválido: {settings.FLOW_STATUS_BACKEND}")
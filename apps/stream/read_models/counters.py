@@ -0,0 +1,214 @@
+# apps/stream/read_models/counters.py
+"""
+Contadores agregados do read model, servidos ao painel da operação.
+
+- status: fluxos por status
+- occupied: vagas presas a fluxos, por "nível:categoria"
+- expiring: reservas em `spot_reserved` por minuto (epoch) de vencimento
+- taxa de check-ins: anel de RATE_SLOTS buckets de 1 s com os fluxos criados
+
+Nos backends SQLite os contadores são mantidos por triggers da flow_status: o
+statement que grava a transição também ajusta os contadores, na mesma transação
+e sem ler a linha de novo. Cada contador é uma expressão sobre as colunas
+tipadas; a mesma expressão serve aos triggers (sobre old/new) e à recontagem
+que reconcilia a tabela com os fluxos gravados.
+"""
+import sqlite3
+from collections import Counter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Segundos de histórico da taxa de check-ins (um bucket por segundo)
+RATE_SLOTS = 300
+
+# tipo do contador -> chave em SQL sobre a linha `{r}`; NULL = a linha não entra na contagem
+COUNTER_KEYS = {
+    "status": "coalesce({r}.status, '')",
+    "occupied": "CASE WHEN {r}.spot_id IS NOT NULL THEN coalesce({r}.spot_level, '') || ':' || coalesce({r}.vehicle_category, '') END",
+    "expiring": "CASE WHEN {r}.status = 'spot_reserved' THEN {r}.reserved_until_ms / 60000 END",
+}
+
+CounterKey = Tuple[str, Any]
+
+
+class FlowCounters(NamedTuple):
+    """
+    Contadores de um arquivo do read model (ou a soma de todos, no backend sharded)
+    """
+
+    by_status: Dict[str, int]
+    occupied: Dict[str, int]  # "nível:categoria" -> vagas
+    expiring: Dict[int, int]  # minuto de vencimento (epoch) -> reservas
+    checkins: Dict[int, int]  # segundo (epoch) -> fluxos criados, últimos RATE_SLOTS s
+
+
+def counter_keys(status: Optional[str], columns: Dict[str, Any]) -> List[CounterKey]:
+    """
+    Chaves em que um fluxo é contado; espelha COUNTER_KEYS para o backend memory
+    """
+    keys: List[CounterKey] = [("status", status or "")]
+    if columns.get("spot_id") is not None:
+        level = columns.get("spot_level")
+        keys.append(("occupied", f"{'' if level is None else level}:{columns.get('vehicle_category') or ''}"))
+    if status == "spot_reserved" and columns.get("reserved_until_ms") is not None:
+        keys.append(("expiring", columns["reserved_until_ms"] // 60000))
+    return keys
+
+
+def merge_counters(parts: Iterable[FlowCounters]) -> FlowCounters:
+    merged = FlowCounters({}, {}, {}, {})
+    for part in parts:
+        for total, values in zip(merged, part):
+            for key, value in values.items():
+                total[key] = total.get(key, 0) + value
+    return merged
+
+
+def to_counters(values: Dict[CounterKey, int], checkins: Dict[int, int]) -> FlowCounters:
+    counters = FlowCounters({}, {}, {}, checkins)
+    by_kind = {"status": counters.by_status, "occupied": counters.occupied, "expiring": counters.expiring}
+    for (kind, key), value in values.items():
+        if value:
+            by_kind[kind][key] = value
+    return counters
+
+
+class RateWindow:
+    """
+    Anel de contagens por segundo (mesma semântica da tabela flow_rate), para o backend memory
+    """
+
+    def __init__(self, slots: int = RATE_SLOTS):
+        self._slots = slots
+        self._buckets: Dict[int, Tuple[int, int]] = {}  # slot -> (segundo, contagem)
+
+    def add(self, ts_ms: int, amount: int = 1):
+        second = ts_ms // 1000
+        slot = second % self._slots
+        bucket, count = self._buckets.get(slot, (second, 0))
+        if bucket < second:
+            bucket, count = second, 0
+        elif bucket > second:
+            return
+        self._buckets[slot] = (bucket, count + amount)
+
+    def snapshot(self, now_ms: int) -> Dict[int, int]:
+        oldest = now_ms // 1000 - self._slots
+        return {bucket: count for bucket, count in list(self._buckets.values()) if bucket > oldest and count}
+
+
+# ---------- SQLite ----------
+
+def _bump(kind: str, row: str, delta: int) -> str:
+    key = COUNTER_KEYS[kind].format(r=row)
+    return f"""
+        INSERT INTO flow_counters (kind, key, value)
+        SELECT '{kind}', k, {delta} FROM (SELECT {key} AS k) WHERE k IS NOT NULL
+        ON CONFLICT (kind, key) DO UPDATE SET value = value + excluded.value;"""
+
+def create_counter_schema(conn: sqlite3.Connection) -> bool:
+    """
+    Tabelas e triggers dos contadores sobre a flow_status. Devolve True se a tabela
+    de contadores acabou de ser criada (os fluxos já gravados precisam ser contados)
+    """
+    created = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'flow_counters'").fetchone() is None
+    # chave sem tipo: status e nível:categoria ficam texto, minutos ficam inteiros
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS flow_counters (
+            kind TEXT NOT NULL,
+            key NOT NULL,
+            value INTEGER NOT NULL,
+            PRIMARY KEY (kind, key)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS flow_rate (
+            slot INTEGER PRIMARY KEY,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL
+        )
+    """)
+    for kind, key in COUNTER_KEYS.items():
+        old, new = key.format(r="old"), key.format(r="new")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS flow_counters_{kind}_insert AFTER INSERT ON flow_status BEGIN {_bump(kind, 'new', 1)} END")
+        # só transições que mudam a chave tocam a tabela de contadores
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS flow_counters_{kind}_update AFTER UPDATE ON flow_status
+            WHEN ({old}) IS NOT ({new})
+            BEGIN {_bump(kind, 'old', -1)} {_bump(kind, 'new', 1)} END
+        """)
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS flow_counters_{kind}_delete AFTER DELETE ON flow_status BEGIN {_bump(kind, 'old', -1)} END")
+    # fluxo criado = check-in recebido pelo worker; um bucket mais antigo que o do slot é descartado
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS flow_rate_insert AFTER INSERT ON flow_status WHEN new.updated_ms IS NOT NULL BEGIN
+            INSERT INTO flow_rate (slot, bucket, count) VALUES ((new.updated_ms / 1000) % {RATE_SLOTS}, new.updated_ms / 1000, 1)
+            ON CONFLICT (slot) DO UPDATE SET
+                count = CASE WHEN bucket = excluded.bucket THEN count + 1 ELSE 1 END,
+                bucket = excluded.bucket
+            WHERE excluded.bucket >= flow_rate.bucket;
+        END
+    """)
+    return created
+
+def recount(conn: sqlite3.Connection) -> Dict[CounterKey, int]:
+    """
+    Contadores recalculados a partir de uma varredura da flow_status
+    """
+    actual: Dict[CounterKey, int] = {}
+    for kind, key in COUNTER_KEYS.items():
+        rows = conn.execute(f"""
+            SELECT k, count(*) FROM (SELECT {key.format(r='flow_status')} AS k FROM flow_status)
+            WHERE k IS NOT NULL GROUP BY k
+        """)
+        actual.update(((kind, k), n) for k, n in rows)
+    return actual
+
+def reset_counters(conn: sqlite3.Connection, values: Dict[CounterKey, int]):
+    conn.execute("DELETE FROM flow_counters")
+    conn.executemany(
+        "INSERT INTO flow_counters (kind, key, value) VALUES (?, ?, ?)",
+        ((kind, key, value) for (kind, key), value in values.items() if value),
+    )
+
+def read_counters(conn: sqlite3.Connection, now_ms: int) -> FlowCounters:
+    values = {(kind, key): value for kind, key, value in conn.execute("SELECT kind, key, value FROM flow_counters WHERE value != 0")}
+    checkins = dict(conn.execute("SELECT bucket, count FROM flow_rate WHERE bucket > ?", (now_ms // 1000 - RATE_SLOTS,)))
+    return to_counters(values, checkins)
+
+def counter_drift(stored: Dict[CounterKey, int], actual: Dict[CounterKey, int]) -> Dict[str, Dict[str, int]]:
+    """
+    Chaves cujo valor gravado difere da recontagem: "tipo:chave" -> {stored, actual}
+    """
+    return {
+        f"{kind}:{key}": {"stored": stored.get((kind, key), 0), "actual": actual.get((kind, key), 0)}
+        for kind, key in sorted(set(stored) | set(actual), key=repr)
+        if stored.get((kind, key), 0) != actual.get((kind, key), 0)
+    }
+
+def reconcile(conn: sqlite3.Connection, fix: bool) -> Dict[str, Dict[str, int]]:
+    """
+    Compara os contadores com a recontagem; com `fix`, regrava a tabela (o que
+    também descarta as chaves zeradas, como minutos de vencimento já passados).
+    Roda na transação do escritor: nenhuma transição entra entre a leitura e a correção.
+    """
+    stored = {(kind, key): value for kind, key, value in conn.execute("SELECT kind, key, value FROM flow_counters")}
+    actual = recount(conn)
+    drift = counter_drift(stored, actual)
+    if fix:
+        reset_counters(conn, actual)
+    return drift
+
+def merge_drift(parts: Iterable[Dict[str, Dict[str, int]]]) -> Dict[str, Dict[str, int]]:
+    merged: Dict[str, Dict[str, int]] = {}
+    for part in parts:
+        for key, values in part.items():
+            total = merged.setdefault(key, {"stored": 0, "actual": 0})
+            total["stored"] += values["stored"]
+            total["actual"] += values["actual"]
+    return merged
+
+
+def count_rows(rows: Iterable[Tuple[Optional[str], Dict[str, Any]]]) -> Dict[CounterKey, int]:
+    """
+    Recontagem em Python a partir de (status, colunas tipadas) de cada fluxo
+    """
+    return dict(Counter(key for status, columns in rows for key in counter_keys(status, columns)))
@@ -1,73 +1,211 @@
 # apps/stream/read_models/flow_status_repo.py
-import os, json, sqlite3, asyncio
-from datetime import datetime
-from typing import Optional, Dict, Any
-
-DB_PATH = os.environ.get("FLOW_STATUS_DB", "infra/db/flow_status.db")
-os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-
-def _connect():
-    conn = sqlite3.connect(DB_PATH, timeout=30)
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS flow_status (
-            check_in_id TEXT PRIMARY KEY,
-            status TEXT,
-            data_json TEXT,
-            updated_at TEXT
-        )
-    """)
-    return conn
-
-async def _run(fn, *args, **kwargs):
-    return await asyncio.to_thread(fn, *args, **kwargs)
-
-def _upsert_row(check_in_id: str, status: str, data: Dict[str, Any]):
-    conn = _connect()
-    try:
-        payload = json.dumps(data, ensure_ascii=False)
-        now = datetime.utcnow().isoformat() + "Z"
-        conn.execute("""
-            INSERT INTO flow_status (check_in_id, status, data_json, updated_at)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(check_in_id) DO UPDATE SET
-                status=excluded.status,
-                data_json=excluded.data_json,
-                updated_at=excluded.updated_at
-        """, (check_in_id, status, payload, now))
-        conn.commit()
-    finally:
-        conn.close()
-
-def _get_row(check_in_id: str) -> Optional[Dict[str, Any]]:
-    conn = _connect()
+import asyncio, logging, sqlite3
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from core.config import settings
+from core.db import get_store
+from core.metrics import flow_status_transitions, read_model_latency
+from apps.stream.messaging.outbox import OutgoingMessage, relay
+from apps.stream.read_models.archive import ArchivedFlow, flow_archive
+# FlowPatch, VersionConflict, a DDL e o codec de data_json continuam importáveis daqui
+from apps.stream.read_models.backends import (
+    HOT_COLUMNS,
+    FlowCounters,
+    FlowPatch,
+    FlowStatusBackend,
+    FlowSummary,
+    VersionConflict,
+    create_backend,
+    create_counter_schema,
+    create_flow_status_indexes,
+    create_flow_status_table,
+    decode_flow_data,
+    encode_flow_data,
+    hot_columns,
+    normalize_plate,
+    recount,
+    reset_counters,
+)
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = settings.FLOW_STATUS_DB
+
+# store do FLOW_STATUS_DB (o próprio read model no backend sqlite)
+_store = get_store(DB_PATH)
+
+# Armazenamento dos fluxos escolhido em FLOW_STATUS_BACKEND
+backend: FlowStatusBackend = create_backend()
+
+# Ouvintes notificados após cada transição gravada: (checkInId, status, version, patch)
+ChangeListener = Callable[[str, str, int, Dict[str, Any]], Awaitable[None]]
+_listeners: List[ChangeListener] = []
+
+
+async def _notify(listener: ChangeListener, check_in_id: str, status: str, version: int, patch: Dict[str, Any]):
+    # a transição já está confirmada: a falha de um ouvinte não pode fazer o consumer reprocessar a mensagem
     try:
-        cur = conn.execute("SELECT status, data_json, updated_at FROM flow_status WHERE check_in_id = ?", (check_in_id,))
-        row = cur.fetchone()
-        if not row:
-            return None
-        status, data_json, updated_at = row
-        data = json.loads(data_json) if data_json else {}
-        data.update({"status": status, "updatedAt": updated_at})
-        return data
-    finally:
-        conn.close()
+        await listener(check_in_id, status, version, patch)
+    except Exception:
+        logger.exception("[FlowStatus] Falha ao notificar a transição de %s para %s (versão %d)", check_in_id, status, version)
+
 
 # ---------- API pública assíncrona ----------
 
-async def set_status(check_in_id: str, status: str, extra: Optional[Dict[str, Any]] = None):
-    data = await _run(_get_row, check_in_id) or {}
-    data.update(extra or {})
-    await _run(_upsert_row, check_in_id, status, data)
+async def patch_status(
+    check_in_id: str,
+    status: Optional[str],
+    patch: Optional[Dict[str, Any]] = None,
+    expected_version: Optional[int] = None,
+    outbox: Sequence[OutgoingMessage] = (),
+    in_transaction: Optional[Callable[[sqlite3.Connection], Any]] = None,
+) -> int:
+    """
+    Aplica um patch parcial (chaves de primeiro nível) ao fluxo num único statement.
+
+    - status=None mantém o status atual
+    - expected_version: None grava incondicionalmente; 0 exige que o fluxo ainda não exista;
+      N > 0 só grava se a versão atual for N, senão levanta VersionConflict
+    - outbox: mensagens a publicar, gravadas na mesma transação da mudança de estado
+    - in_transaction: escrita adicional na mesma transação (ex.: o estado da saga)
+
+    Retorna a nova versão do fluxo.
+    """
+    patch = patch or {}
+    with read_model_latency.time("patch"):
+        version, current, available_at = await backend.patch(check_in_id, status, patch, expected_version, outbox, in_transaction)
+    relay.notify(available_at)
+    if status is not None:
+        flow_status_transitions.inc(current)
+    for listener in _listeners:
+        await _notify(listener, check_in_id, current, version, patch)
+    return version
+
+async def patch_status_many(
+    patches: Sequence[FlowPatch],
+    outbox: Sequence[OutgoingMessage] = (),
+) -> List[Union[int, VersionConflict]]:
+    """
+    Grava um lote de transições numa única transação (uma por arquivo no backend
+    sharded), junto com as mensagens de cada uma e as de `outbox` (sem mudança
+    de estado associada).
 
-async def save_spot_list(check_in_id: str, spots: list):
-    current = await _run(_get_row, check_in_id) or {}
-    current["spots"] = spots
-    await _run(_upsert_row, check_in_id, "spots_consulted", current)
+    Devolve, na ordem dos patches, a nova versão ou o VersionConflict do item;
+    os itens em conflito não gravam nada nem enfileiram suas mensagens.
+    """
+    if not patches and not outbox:
+        return []
+    with read_model_latency.time("patch_many"):
+        results, available_at = await backend.patch_many(patches, outbox)
+    relay.notify(available_at)
+    applied = [(p, r) for p, r in zip(patches, results) if not isinstance(r, VersionConflict)]
+    for p, (_, status) in applied:
+        if p.status is not None:
+            flow_status_transitions.inc(status)
+    for listener in _listeners:
+        # check-ins distintos: a notificação do lote sai de uma vez
+        await asyncio.gather(*(_notify(listener, p.check_in_id, status, version, p.patch) for p, (version, status) in applied))
+    return [r if isinstance(r, VersionConflict) else r[0] for r in results]
 
-async def set_reserved_spot(check_in_id: str, spot: Dict[str, Any]):
-    current = await _run(_get_row, check_in_id) or {}
-    current["spot"] = spot
-    await _run(_upsert_row, check_in_id, "spot_reserved", current)
+def add_change_listener(listener: ChangeListener) -> ChangeListener:
+    """
+    Registra um ouvinte chamado depois de cada transição confirmada no banco.
+    Exceções do ouvinte são registradas no log e não chegam a quem gravou.
+    """
+    _listeners.append(listener)
+    return listener
+
+async def set_status(
+    check_in_id: str,
+    status: str,
+    extra: Optional[Dict[str, Any]] = None,
+    outbox: Sequence[OutgoingMessage] = (),
+    in_transaction: Optional[Callable[[sqlite3.Connection], Any]] = None,
+) -> int:
+    return await patch_status(check_in_id, status, extra, outbox=outbox, in_transaction=in_transaction)
+
+async def save_spots_version(check_in_id: str, version: int, outbox: Sequence[OutgoingMessage] = ()) -> int:
+    return await patch_status(check_in_id, "spots_consulted", {"spotsVersion": version}, outbox=outbox)
+
+async def set_reserved_spot(
+    check_in_id: str,
+    spot: Dict[str, Any],
+    expected_version: Optional[int] = None,
+    outbox: Sequence[OutgoingMessage] = (),
+) -> int:
+    return await patch_status(check_in_id, "spot_reserved", {"spot": spot}, expected_version, outbox)
 
 async def get_status(check_in_id: str) -> Optional[Dict[str, Any]]:
-    return await _run(_get_row, check_in_id)
+    with read_model_latency.time("get"):
+        return await backend.get(check_in_id)
+
+async def find_status(check_in_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Como get_status, mas procura no arquivo os fluxos que a retenção já tirou
+    da flow_status. Para leituras da API; os consumers decidem só pelo estado quente.
+    """
+    flow = await get_status(check_in_id)
+    if flow is None:
+        with read_model_latency.time("archive_get"):
+            flow = await flow_archive.get(check_in_id)
+    return flow
+
+async def get_statuses(check_in_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Fluxos de vários check-ins numa só leitura (ausentes ficam fora do dict)
+    """
+    if not check_in_ids:
+        return {}
+    with read_model_latency.time("get_many"):
+        return await backend.get_many(check_in_ids)
+
+async def list_held_spots():
+    """
+    (checkInId, status, spot) de todos os fluxos que ainda seguram uma vaga.
+    Uso restrito à reconstrução do estado na subida do worker.
+    """
+    with read_model_latency.time("list_held_spots"):
+        return await backend.list_held_spots()
+
+async def list_flows(
+    status: Optional[str] = None,
+    plate: Optional[str] = None,
+    updated_before_ms: Optional[int] = None,
+    after: Optional[Tuple[int, str]] = None,
+    descending: bool = False,
+    limit: int = 100,
+) -> List[FlowSummary]:
+    """
+    Fluxos por status e/ou placa (normalizada), ordenados pela última transição.
+    `after` = (updated_ms, checkInId) da última linha da página anterior.
+    """
+    with read_model_latency.time("list"):
+        return await backend.list_flows(status, plate, updated_before_ms, after, descending, limit)
+
+async def counters() -> FlowCounters:
+    """
+    Contadores agregados do painel da operação (mantidos a cada transição, sem varrer os fluxos)
+    """
+    with read_model_latency.time("counters"):
+        return await backend.counters()
+
+async def reconcile_counters(fix: bool = False) -> Dict[str, Dict[str, int]]:
+    """
+    Confere os contadores contra uma recontagem completa; com `fix`, corrige-os
+    """
+    with read_model_latency.time("reconcile_counters"):
+        return await backend.reconcile_counters(fix)
+
+async def list_finished(status: str, before_ms: int, after: Optional[Tuple[int, str]], limit: int) -> List[ArchivedFlow]:
+    """
+    Fluxos em `status` parados desde antes de `before_ms` e sem vaga presa (candidatos à retenção)
+    """
+    with read_model_latency.time("list_finished"):
+        return await backend.list_finished(status, before_ms, after, limit)
+
+async def delete_flows(keys: Sequence[Tuple[str, int]]) -> int:
+    with read_model_latency.time("delete"):
+        return await backend.delete_flows(keys)
+
+async def incremental_vacuum(pages: int) -> Optional[int]:
+    return await backend.incremental_vacuum(pages)
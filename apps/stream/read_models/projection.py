@@ -0,0 +1,90 @@
+# apps/stream/read_models/projection.py
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from apps.stream.messaging import topic
+
+# Incrementar sempre que a projeção mudar: snapshots de outra versão são ignorados
+PROJECTION_VERSION = 6
+
+Transition = Tuple[Optional[str], Dict[str, Any]]
+
+# Status dos quais o fluxo não sai: a saga descarta respostas que chegam depois
+# (ver SagaEngine), então o log pode ter eventos tardios que não mudaram o status
+FINAL_STATUSES = frozenset({"robot_assigned", "checkin_failed", "reservation_expired"})
+
+
+# Cada função reproduz o patch que os consumers gravam ao tratar o evento
+
+def _checkin_submitted(event: Dict[str, Any]) -> Optional[Transition]:
+    return "checkin_submitted", event
+
+def _spot_consult_completed(event: Dict[str, Any]) -> Optional[Transition]:
+    if "spotsVersion" in event:
+        return "spots_consulted", {"spotsVersion": event["spotsVersion"]}
+    # eventos gravados antes dos snapshots de disponibilidade trazem a lista inteira
+    return "spots_consulted", {"spots": event.get("spots", [])}
+
+def _spot_reserved(event: Dict[str, Any]) -> Optional[Transition]:
+    if not event.get("spot"):
+        return None
+    return "spot_reserved", {"spot": event["spot"]}
+
+def _spot_released(event: Dict[str, Any]) -> Optional[Transition]:
+    if event.get("reason") == "expired":
+        return "reservation_expired", {"spot": None}
+    if event.get("reason") == "compensation":
+        # a saga já gravou o status final; a liberação só remove a vaga
+        return None, {"spot": None}
+    return None
+
+def _robot_assigned(event: Dict[str, Any]) -> Optional[Transition]:
+    if not event.get("robot"):
+        return None
+    return "robot_assigned", {"robot": event["robot"]}
+
+def _checkin_failed(event: Dict[str, Any]) -> Optional[Transition]:
+    return "checkin_failed", {"failedStep": event.get("failedStep")}
+
+
+TRANSITIONS: Dict[str, Callable[[Dict[str, Any]], Optional[Transition]]] = {
+    topic.CHECKIN_SUBMITTED: _checkin_submitted,
+    topic.SPOT_CONSULT_COMPLETED: _spot_consult_completed,
+    topic.SPOT_RESERVED: _spot_reserved,
+    topic.SPOT_RELEASED: _spot_released,
+    topic.ROBOT_ASSIGNED: _robot_assigned,
+    topic.CHECKIN_FAILED: _checkin_failed,
+}
+
+
+class FlowState:
+    """
+    Estado de um fluxo durante a reconstrução (mesmas colunas de flow_status)
+    """
+
+    __slots__ = ("status", "data", "updated_at", "version", "updated_ms")
+
+    def __init__(
+        self,
+        status: Optional[str] = None,
+        data: Optional[Dict[str, Any]] = None,
+        updated_at: Optional[str] = None,
+        version: int = 0,
+        updated_ms: Optional[int] = None,
+    ):
+        self.status = status
+        self.data = data or {}
+        self.updated_at = updated_at
+        self.version = version
+        self.updated_ms = updated_ms
+
+    def apply(self, transition: Transition, timestamp: float):
+        status, patch = transition
+        if status is not None and self.status in FINAL_STATUSES:
+            return
+        if status is not None:
+            self.status = status
+        self.data.update(patch)
+        self.updated_at = datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+        self.updated_ms = int(timestamp * 1000)
+        self.version += 1
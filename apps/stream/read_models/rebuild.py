@@ -0,0 +1,384 @@
+# apps/stream/read_models/rebuild.py
+"""
+Reconstrução do read model flow_status a partir do log de eventos.
+
+O último snapshot compatível (mesma PROJECTION_VERSION) é o ponto de partida e só
+a cauda do log depois dele é reprocessada. Os eventos são divididos por
+crc32(checkInId) entre processos; cada processo grava sua parte num arquivo
+SQLite, as partes viram um novo snapshot e o snapshot é carregado numa tabela
+nova, trocada pela flow_status numa única transação. A troca funde o snapshot
+com a tabela viva (vale a última transição de cada fluxo), então pode rodar com
+o worker ativo sem perder fluxos gravados depois do corte do log.
+
+Uso:
+    python -m apps.stream.read_models.rebuild --workers 8
+    python -m apps.stream.read_models.rebuild --from-scratch   # ignora snapshots (projeção mudou)
+    python -m apps.stream.read_models.rebuild --snapshot-only  # só gera o snapshot
+"""
+import argparse, asyncio, glob, heapq, json, logging, os, re, shutil, sqlite3, sys, tempfile, time, zlib
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from operator import attrgetter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core.config import settings
+from core.db import flow_store_paths, shard_of
+from apps.stream.messaging.event_log import LogRecord, SegmentedEventLog
+from apps.stream.read_models.flow_status_repo import (
+    HOT_COLUMNS, create_counter_schema, create_flow_status_indexes, create_flow_status_table, decode_flow_data,
+    encode_flow_data, hot_columns, recount, reset_counters,
+)
+from apps.stream.read_models.projection import PROJECTION_VERSION, TRANSITIONS, FlowState
+
+logger = logging.getLogger(__name__)
+
+INSERT_BATCH = 5000
+_CHECKIN_ID = re.compile(rb'"checkInId"\s*:\s*"([^"\\]*)"')
+FLOW_COLUMNS = f"check_in_id, status, data_json, updated_at, version, updated_ms, {', '.join(HOT_COLUMNS)}"
+
+
+def log_dirs(root: Optional[str] = None) -> Dict[str, str]:
+    """
+    Diretórios de log existentes: a raiz (worker único) e `p<N>` (modo particionado)
+    """
+    root = root or settings.EVENT_LOG_DIR
+    if not os.path.isdir(root):
+        return {}
+    dirs = {".": root} if glob.glob(os.path.join(root, "*.log")) else {}
+    for path in sorted(glob.glob(os.path.join(root, "p*"))):
+        if os.path.isdir(path):
+            dirs[os.path.basename(path)] = path
+    return dirs
+
+
+# ---------- Snapshots ----------
+
+def latest_snapshot(directory: Optional[str] = None) -> Optional[Tuple[str, Dict[str, int]]]:
+    """
+    (caminho, offsets por diretório de log) do snapshot mais recente desta versão da projeção
+    """
+    for path in sorted(glob.glob(os.path.join(directory or settings.FLOW_SNAPSHOT_DIR, "flow_status-*.db")), reverse=True):
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            version = conn.execute("SELECT value FROM snapshot_info WHERE key = 'projection_version'").fetchone()
+            if version and int(version[0]) == PROJECTION_VERSION:
+                return path, dict(conn.execute("SELECT log_dir, next_offset FROM snapshot_offsets"))
+        except sqlite3.DatabaseError:
+            logger.warning("[Rebuild] Snapshot ilegível ignorado: %s", path)
+        finally:
+            conn.close()
+    return None
+
+def _write_snapshot(shard_paths: List[str], offsets: Dict[str, int], directory: str, base: Optional[str]) -> str:
+    """
+    Novo snapshot = cópia do snapshot de partida + fluxos alterados pelos shards
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"flow_status-{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}.db")
+    tmp_path = path + ".tmp"
+    if base:
+        shutil.copyfile(base, tmp_path)
+    conn = sqlite3.connect(tmp_path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        create_flow_status_table(conn)
+        conn.execute("CREATE TABLE IF NOT EXISTS snapshot_offsets (log_dir TEXT PRIMARY KEY, next_offset INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS snapshot_info (key TEXT PRIMARY KEY, value TEXT)")
+        # um shard por vez: DETACH não é permitido dentro de transação
+        for shard_path in shard_paths:
+            conn.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+            conn.execute("INSERT OR REPLACE INTO flow_status SELECT * FROM shard.flow_status")
+            conn.execute("DETACH DATABASE shard")
+        conn.execute("BEGIN")
+        conn.executemany("INSERT OR REPLACE INTO snapshot_offsets VALUES (?, ?)", offsets.items())
+        conn.executemany("INSERT OR REPLACE INTO snapshot_info VALUES (?, ?)", [
+            ("projection_version", str(PROJECTION_VERSION)),
+            ("created_at", datetime.now(timezone.utc).isoformat()),
+        ])
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    conn.close()
+    os.replace(tmp_path, path)
+    return path
+
+def _prune_snapshots(directory: str, keep: int):
+    for path in sorted(glob.glob(os.path.join(directory, "flow_status-*.db")), reverse=True)[keep:]:
+        os.remove(path)
+
+
+# ---------- Reprocessamento por shard (processo filho) ----------
+
+def _hot_values(data: Dict[str, object]) -> Tuple[object, ...]:
+    columns = hot_columns(data)
+    return tuple(columns.get(name) for name in HOT_COLUMNS)
+
+def _shard_of(check_in_id: bytes, shards: int) -> int:
+    return zlib.crc32(check_in_id) % shards
+
+def _records(path: str, start: int, end: int) -> Iterator[LogRecord]:
+    for record in SegmentedEventLog(path, 0, 0, readonly=True).read(start):
+        if record.offset >= end:
+            return
+        yield record
+
+def _fold_shard(
+    shard: int,
+    shards: int,
+    snapshot: Optional[str],
+    dirs: Dict[str, str],
+    starts: Dict[str, int],
+    ends: Dict[str, int],
+    out_path: str,
+) -> Tuple[int, int, int]:
+    """
+    Aplica a cauda do log aos fluxos deste shard, partindo do estado no snapshot,
+    e grava em out_path só os fluxos alterados.
+    Retorna (eventos lidos, transições aplicadas, fluxos alterados).
+    """
+    states: Dict[str, FlowState] = {}
+    # só os fluxos tocados pela cauda são lidos do snapshot (busca pela PK)
+    base = sqlite3.connect(f"file:{snapshot}?mode=ro", uri=True) if snapshot else None
+
+    scanned = applied = 0
+    # os logs das partições são intercalados por timestamp: eventos de um mesmo
+    # fluxo podem estar em partições diferentes (ex.: spot.released no dono da categoria)
+    streams = [_records(path, starts.get(name, 0), ends[name]) for name, path in dirs.items()]
+    for record in heapq.merge(*streams, key=attrgetter("timestamp")):
+        scanned += 1
+        project = TRANSITIONS.get(record.topic)
+        if project is None:
+            continue
+        # filtra pelo shard sem decodificar o JSON; ids com escapes caem no parse completo
+        match = _CHECKIN_ID.search(record.payload)
+        if match is not None and _shard_of(match.group(1), shards) != shard:
+            continue
+        event = record.event()
+        cid = event.get("checkInId")
+        if not cid or (match is None and _shard_of(cid.encode("utf-8"), shards) != shard):
+            continue
+        transition = project(event)
+        if transition is None:
+            continue
+        state = states.get(cid)
+        if state is None:
+            row = base.execute(
+                "SELECT status, data_json, updated_at, version, updated_ms FROM flow_status WHERE check_in_id = ?", (cid,)
+            ).fetchone() if base else None
+            if row:
+                state = FlowState(row[0], decode_flow_data(row[1]), row[2], row[3], row[4])
+            else:
+                state = FlowState()
+            states[cid] = state
+        state.apply(transition, record.timestamp)
+        applied += 1
+    if base:
+        base.close()
+
+    conn = sqlite3.connect(out_path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    create_flow_status_table(conn)
+    rows = (
+        (cid, s.status, encode_flow_data(s.data), s.updated_at, s.version, s.updated_ms, *_hot_values(s.data))
+        for cid, s in states.items()
+    )
+    conn.execute("BEGIN")
+    while True:
+        batch = [row for _, row in zip(range(INSERT_BATCH), rows)]
+        if not batch:
+            break
+        conn.executemany(f"INSERT INTO flow_status ({FLOW_COLUMNS}) VALUES ({', '.join('?' * len(batch[0]))})", batch)
+    conn.execute("COMMIT")
+    conn.close()
+    return scanned, applied, len(states)
+
+
+# ---------- Carga na tabela viva ----------
+
+# a fusão escolhe uma das linhas e calcula a versão à parte (fica por último)
+_MERGE_COLUMNS = [name for name in FLOW_COLUMNS.split(", ") if name != "version"]
+
+def _merged(alias: str) -> str:
+    return ", ".join(f"{alias}.{name}" for name in _MERGE_COLUMNS)
+
+def _swap_into(db_path: str, snapshot_path: str, shard: Optional[Tuple[int, int]] = None):
+    """
+    Carrega o snapshot numa tabela nova e a troca pela flow_status atomicamente.
+    A versão de cada fluxo nunca regride (clientes de long-poll e escritas
+    condicionais comparam versões). Com `shard=(n, K)` (backend sharded), só os
+    fluxos que pertencem ao arquivo n entram.
+
+    A troca pode rodar com o worker ativo: a tabela nova é a fusão do snapshot
+    com a tabela viva, e de cada fluxo vale a linha com a última transição
+    (updated_ms). Como o evento só entra no log depois que a transição foi
+    gravada, uma linha viva mais nova que a do snapshot tem transições que o
+    snapshot ainda não viu (cauda do log depois de `ends`); fluxos ausentes do
+    snapshot (ex.: fora do log) são mantidos. Com o worker parado, o snapshot
+    vale para todos os fluxos que ele conhece.
+    """
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    n, shards = shard or (0, 1)
+    conn.create_function("flow_shard", 1, lambda cid: shard_of(cid, shards), deterministic=True)
+    in_shard = "flow_shard(s.check_in_id) = ?" if shard else "1"
+    params = (n,) if shard else ()
+    select_cols = f"{', '.join(_MERGE_COLUMNS)}, version"
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("ATTACH DATABASE ? AS snapshot", (snapshot_path,))
+        conn.execute("DROP TABLE IF EXISTS flow_status_rebuild")
+        create_flow_status_table(conn, "flow_status_rebuild")
+        # cópia em massa fora do lock de escrita: lê uma foto consistente da tabela viva
+        conn.execute("BEGIN")
+        has_live = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'flow_status'").fetchone()
+        seen_ms = None
+        if has_live:
+            seen_ms = conn.execute("SELECT coalesce(max(updated_ms), 0) FROM main.flow_status").fetchone()[0]
+            conn.execute(f"""
+                INSERT INTO flow_status_rebuild ({select_cols})
+                SELECT {_merged("s")}, max(s.version, coalesce(f.version, 0))
+                FROM snapshot.flow_status AS s
+                LEFT JOIN main.flow_status AS f ON f.check_in_id = s.check_in_id
+                WHERE {in_shard} AND (f.check_in_id IS NULL OR coalesce(f.updated_ms, 0) <= coalesce(s.updated_ms, 0))
+            """, params)
+            conn.execute(f"""
+                INSERT INTO flow_status_rebuild ({select_cols})
+                SELECT {_merged("f")}, max(f.version, coalesce(s.version, 0))
+                FROM main.flow_status AS f
+                LEFT JOIN snapshot.flow_status AS s ON s.check_in_id = f.check_in_id
+                WHERE s.check_in_id IS NULL OR coalesce(f.updated_ms, 0) > coalesce(s.updated_ms, 0)
+            """)
+        else:
+            conn.execute(f"INSERT INTO flow_status_rebuild SELECT * FROM snapshot.flow_status AS s WHERE {in_shard}", params)
+        conn.execute("COMMIT")
+        conn.execute("DETACH DATABASE snapshot")
+
+        # leitores continuam vendo a tabela antiga até o COMMIT. Índices e triggers são
+        # criados depois da troca: o DROP libera os nomes (o RENAME não renomeia índices),
+        # e os contadores são recontados sobre a tabela nova
+        conn.execute("BEGIN IMMEDIATE")
+        if seen_ms is not None:
+            # transições gravadas durante a cópia; com o lock de escrita, nenhuma outra entra até a troca
+            conn.execute(f"""
+                INSERT OR REPLACE INTO flow_status_rebuild ({select_cols})
+                SELECT {_merged("f")}, max(f.version, coalesce(r.version, 0))
+                FROM main.flow_status AS f
+                LEFT JOIN flow_status_rebuild AS r ON r.check_in_id = f.check_in_id
+                WHERE f.updated_ms >= ?
+                    AND (r.check_in_id IS NULL OR f.updated_ms > coalesce(r.updated_ms, 0) OR f.version > r.version)
+            """, (seen_ms,))
+        conn.execute("DROP TABLE IF EXISTS flow_status")
+        conn.execute("ALTER TABLE flow_status_rebuild RENAME TO flow_status")
+        create_flow_status_indexes(conn)
+        create_counter_schema(conn)
+        reset_counters(conn, recount(conn))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def rebuild(workers: int, from_scratch: bool = False, swap: bool = True) -> Dict[str, object]:
+    if swap and settings.FLOW_STATUS_BACKEND == "memory":
+        # os fluxos vivem no processo do worker: não há arquivo onde carregar o snapshot
+        raise ValueError("Backend memory não suporta a troca da tabela; use --snapshot-only")
+    started = time.perf_counter()
+    dirs = log_dirs()
+    snapshot = None if from_scratch else latest_snapshot()
+    snapshot_path, starts = snapshot if snapshot else (None, {})
+    # limite fixo por diretório: eventos gravados durante a reconstrução ficam para a
+    # próxima; os fluxos que eles alteraram vêm da tabela viva na troca (_swap_into)
+    ends = {name: SegmentedEventLog(path, 0, 0, readonly=True).end_offset() for name, path in dirs.items()}
+
+    os.makedirs(settings.FLOW_SNAPSHOT_DIR, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix="rebuild-", dir=settings.FLOW_SNAPSHOT_DIR)
+    try:
+        shard_paths = [os.path.join(work_dir, f"shard-{n}.db") for n in range(workers)]
+        with ProcessPoolExecutor(workers, mp_context=mp.get_context("spawn")) as pool:
+            futures = [
+                pool.submit(_fold_shard, n, workers, snapshot_path, dirs, starts, ends, shard_paths[n])
+                for n in range(workers)
+            ]
+            results = [future.result() for future in futures]
+        folded_at = time.perf_counter()
+
+        new_snapshot = _write_snapshot(shard_paths, {**starts, **ends}, settings.FLOW_SNAPSHOT_DIR, snapshot_path)
+        if swap:
+            paths = flow_store_paths()
+            for n, path in enumerate(paths):
+                _swap_into(path, new_snapshot, (n, len(paths)) if len(paths) > 1 else None)
+        _prune_snapshots(settings.FLOW_SNAPSHOT_DIR, settings.FLOW_SNAPSHOT_KEEP)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    wall = time.perf_counter() - started
+    # todos os shards percorrem o mesmo trecho do log
+    events = results[0][0] if results else 0
+    return {
+        "workers": workers,
+        "from_snapshot": snapshot_path,
+        "snapshot": new_snapshot,
+        "swapped": swap,
+        "events": events,
+        "transitions": sum(r[1] for r in results),
+        "flows_changed": sum(r[2] for r in results),
+        "replay_s": round(folded_at - started, 3),
+        "wall_s": round(wall, 3),
+        "events_per_s": round(events / (folded_at - started)) if events else 0,
+    }
+
+
+class PeriodicSnapshot:
+    """
+    Gera snapshots do read model em segundo plano (processo separado), para que
+    uma reconstrução só precise reprocessar a cauda do log
+    """
+
+    def __init__(self, interval_s: float):
+        self._interval_s = interval_s
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._interval_s > 0:
+            self._task = asyncio.create_task(self._run(), name="flow-status-snapshot")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._interval_s)
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "apps.stream.read_models.rebuild", "--snapshot-only", "--workers", "1",
+                stdout=asyncio.subprocess.DEVNULL,
+            )
+            if await proc.wait():
+                logger.error("[Rebuild] Falha ao gerar snapshot periódico (código %d)", proc.returncode)
+
+
+snapshots = PeriodicSnapshot(settings.FLOW_SNAPSHOT_INTERVAL_S)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstrói flow_status a partir do log de eventos")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--from-scratch", action="store_true", help="ignora snapshots e relê o log inteiro")
+    parser.add_argument("--snapshot-only", action="store_true", help="gera o snapshot sem trocar a tabela")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    report = rebuild(max(1, args.workers), from_scratch=args.from_scratch, swap=not args.snapshot_only)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# apps/stream/read_models/reconcile.py
+"""
+Reconciliação dos contadores do painel da operação com uma recontagem dos fluxos.
+
+Os contadores são mantidos na mesma transação de cada transição, então só
+divergem por escrita fora do caminho normal (SQL manual, restauração de backup).
+A reconciliação recalcula tudo numa transação do escritor e, com --fix, regrava
+a tabela, descartando também as chaves zeradas.
+
+Uso:
+    python -m apps.stream.read_models.reconcile          # só relata as diferenças
+    python -m apps.stream.read_models.reconcile --fix
+"""
+import argparse, asyncio, json, logging
+from typing import Dict, Optional
+
+from core.config import settings
+from core.metrics import flow_counter_drift
+from apps.stream.read_models.flow_status_repo import reconcile_counters
+
+logger = logging.getLogger(__name__)
+
+
+async def reconcile(fix: bool) -> Dict[str, Dict[str, int]]:
+    drift = await reconcile_counters(fix)
+    for key, values in drift.items():
+        flow_counter_drift.inc(key.split(":", 1)[0])
+        logger.warning("[Contadores] %s: gravado=%d recontado=%d", key, values["stored"], values["actual"])
+    return drift
+
+
+class PeriodicReconcile:
+    """
+    Reconcilia (e corrige) os contadores em segundo plano no worker
+    """
+
+    def __init__(self, interval_s: float):
+        self._interval_s = interval_s
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._interval_s > 0:
+            self._task = asyncio.create_task(self._run(), name="flow-counters-reconcile")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._interval_s)
+            try:
+                await reconcile(fix=True)
+            except Exception:
+                logger.exception("[Contadores] Falha na reconciliação periódica")
+
+
+reconciler = PeriodicReconcile(settings.FLOW_COUNTERS_RECONCILE_INTERVAL_S)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confere os contadores do painel contra uma recontagem de flow_status")
+    parser.add_argument("--fix", action="store_true", help="regrava os contadores com a recontagem")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    drift = asyncio.run(reconcile(args.fix))
+    print(json.dumps({"fixed": args.fix, "drift": drift}, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
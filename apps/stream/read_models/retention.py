@@ -0,0 +1,164 @@
+# apps/stream/read_models/retention.py
+"""
+Retenção da flow_status: fluxos terminados há mais de FLOW_RETENTION_DAYS vão
+para o arquivo (archive.py) e saem da tabela quente.
+
+Cada lote é lido pelo índice de status, gravado no arquivo (durável antes de
+seguir) e removido numa transação curta do escritor, intercalada com as
+transições normais. Um fluxo que mudou entre a leitura e a remoção fica na
+tabela. Ao final, as páginas liberadas voltam ao SO em passos de
+incremental_vacuum.
+
+Uma reconstrução a partir do log traz os fluxos arquivados de volta; a próxima
+passada da retenção os arquiva de novo.
+
+Uso:
+    python -m apps.stream.read_models.retention
+    python -m apps.stream.read_models.retention --days 7
+    python -m apps.stream.read_models.retention --full-vacuum  # uma vez, em bases criadas sem auto_vacuum
+"""
+import argparse, asyncio, json, logging, sqlite3, time
+from typing import Dict, Optional, Sequence
+
+from core.config import settings
+from core.db import flow_store_paths
+from apps.stream.saga.checkin_saga import CHECKIN_SAGA
+from apps.stream.read_models import flow_status_repo
+from apps.stream.read_models.archive import FlowArchive, flow_archive
+from apps.stream.read_models.backends import FlowStatusBackend
+
+logger = logging.getLogger(__name__)
+
+# status dos quais um fluxo não sai mais
+FINISHED_STATUSES = (CHECKIN_SAGA.steps[-1].status, CHECKIN_SAGA.failed_status, "reservation_expired")
+
+
+class Retention:
+    """
+    Job de retenção sobre um backend do read model e um arquivo
+    """
+
+    def __init__(
+        self,
+        backend: FlowStatusBackend,
+        archive: FlowArchive,
+        days: float,
+        batch: int,
+        pause_ms: float,
+        vacuum_pages: int,
+        interval_s: float = 0.0,
+        statuses: Sequence[str] = FINISHED_STATUSES,
+    ):
+        self._backend = backend
+        self._archive = archive
+        self._days = days
+        self._batch = batch
+        self._pause_s = pause_ms / 1000
+        self._vacuum_pages = vacuum_pages
+        self._interval_s = interval_s
+        self._statuses = statuses
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self, now_ms: Optional[int] = None, days: Optional[float] = None) -> Dict[str, object]:
+        """
+        Uma passada completa; `now_ms` permite simular o relógio (benchmarks)
+        """
+        started = time.perf_counter()
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        cutoff_ms = now_ms - int((self._days if days is None else days) * 86400 * 1000)
+        archived = deleted = 0
+        for status in self._statuses:
+            after = None
+            while True:
+                flows = await self._backend.list_finished(status, cutoff_ms, after, self._batch)
+                if not flows:
+                    break
+                after = (flows[-1].updated_ms, flows[-1].check_in_id)
+                archived += await self._archive.append(flows)
+                deleted += await self._backend.delete_flows([(f.check_in_id, f.flow["version"]) for f in flows])
+                if len(flows) < self._batch:
+                    break
+                await asyncio.sleep(self._pause_s)
+
+        vacuumed_to = None
+        if deleted:
+            while True:
+                left = await self._backend.incremental_vacuum(self._vacuum_pages)
+                vacuumed_to = left
+                if not left:
+                    break
+                await asyncio.sleep(self._pause_s)
+        return {
+            "cutoff_ms": cutoff_ms,
+            "archived": archived,
+            "deleted": deleted,
+            # páginas livres que sobraram; None = arquivo sem auto_vacuum incremental
+            "free_pages": vacuumed_to,
+            "wall_s": round(time.perf_counter() - started, 3),
+        }
+
+    async def start(self):
+        if self._interval_s > 0:
+            self._task = asyncio.create_task(self._run(), name="flow-status-retention")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._interval_s)
+            try:
+                report = await self.run()
+                if report["deleted"]:
+                    logger.info("[Retenção] %d fluxos arquivados, %d removidos da flow_status", report["archived"], report["deleted"])
+            except Exception:
+                logger.exception("[Retenção] Falha na passada de retenção")
+
+
+retention = Retention(
+    flow_status_repo.backend,
+    flow_archive,
+    days=settings.FLOW_RETENTION_DAYS,
+    batch=settings.FLOW_RETENTION_BATCH,
+    pause_ms=settings.FLOW_RETENTION_PAUSE_MS,
+    vacuum_pages=settings.FLOW_RETENTION_VACUUM_PAGES,
+    interval_s=settings.FLOW_RETENTION_INTERVAL_S,
+)
+
+
+def full_vacuum():
+    """
+    VACUUM completo de cada arquivo do read model, passando-o para auto_vacuum
+    incremental. Bloqueia o arquivo enquanto roda: use com o worker parado.
+    """
+    for path in flow_store_paths():
+        conn = sqlite3.connect(path, isolation_level=None)
+        try:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arquiva e remove da flow_status os fluxos terminados há mais tempo")
+    parser.add_argument("--days", type=float, default=None, help=f"idade mínima em dias (padrão: {settings.FLOW_RETENTION_DAYS})")
+    parser.add_argument("--full-vacuum", action="store_true", help="VACUUM completo (converte bases antigas para auto_vacuum incremental)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.full_vacuum:
+        full_vacuum()
+        print(json.dumps({"vacuumed": flow_store_paths()}, indent=2))
+        return
+    print(json.dumps(asyncio.run(retention.run(days=args.days)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
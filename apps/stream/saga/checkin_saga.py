@@ -0,0 +1,62 @@
+# apps/stream/saga/checkin_saga.py
+from core.config import settings
+from core.db import flow_stores
+from apps.stream.messaging import topic
+from apps.stream.saga.definition import Compensation, RetryPolicy, SagaDefinition, SagaStep
+from apps.stream.saga.engine import SagaEngine
+
+RETRY = RetryPolicy(
+    max_attempts=settings.SAGA_MAX_ATTEMPTS,
+    backoff_s=settings.SAGA_BACKOFF_S,
+    max_backoff_s=settings.SAGA_BACKOFF_MAX_S,
+)
+
+# check-in -> consulta de vagas -> reserva -> designação de robô
+CHECKIN_SAGA = SagaDefinition(
+    name="checkin",
+    trigger=topic.CHECKIN_SUBMITTED,
+    start_status="checkin_submitted",
+    context_keys=("vehicleCategory",),
+    failed_status="checkin_failed",
+    failed_event=topic.CHECKIN_FAILED,
+    steps=(
+        SagaStep(
+            name="consult_spots",
+            command=topic.SPOT_CONSULT_REQUESTED,
+            reply=topic.SPOT_CONSULT_COMPLETED,
+            status="spots_consulted",
+            result_key="spotsVersion",
+            payload_keys=("vehicleCategory",),
+            delay_s=settings.ORCHESTRATOR_CONSULT_DELAY_S,
+            timeout_s=settings.SAGA_STEP_TIMEOUT_S,
+            retry=RETRY,
+        ),
+        SagaStep(
+            name="reserve_spot",
+            command=topic.SPOT_RESERVE_REQUESTED,
+            reply=topic.SPOT_RESERVED,
+            status="spot_reserved",
+            result_key="spot",
+            payload_keys=("vehicleCategory",),
+            remember=True,
+            delay_s=settings.ORCHESTRATOR_RESERVE_DELAY_S,
+            timeout_s=settings.SAGA_STEP_TIMEOUT_S,
+            retry=RETRY,
+            # robô indisponível: a vaga volta ao inventário
+            compensation=Compensation(topic.SPOT_RELEASE_REQUESTED, ("vehicleCategory", "spot")),
+        ),
+        SagaStep(
+            name="assign_robot",
+            command=topic.ROBOT_ASSIGN_REQUESTED,
+            reply=topic.ROBOT_ASSIGNED,
+            status="robot_assigned",
+            result_key="robot",
+            payload_keys=("vehicleCategory", "spot"),
+            delay_s=settings.ORCHESTRATOR_ROBOT_DELAY_S,
+            timeout_s=settings.SAGA_STEP_TIMEOUT_S,
+            retry=RETRY,
+        ),
+    ),
+)
+
+checkin_saga = SagaEngine(CHECKIN_SAGA, flow_stores())
@@ -0,0 +1,97 @@
+# apps/stream/saga/definition.py
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+
+class RetryPolicy(NamedTuple):
+    """
+    Tentativas de um passo e o backoff exponencial entre elas
+    """
+
+    max_attempts: int = 3
+    backoff_s: float = 2.0
+    factor: float = 2.0
+    max_backoff_s: float = 60.0
+
+    def delay(self, attempt: int) -> float:
+        """
+        Espera antes da tentativa `attempt` (a primeira é a 0, sem espera)
+        """
+        if attempt <= 0:
+            return 0.0
+        return min(self.backoff_s * self.factor ** (attempt - 1), self.max_backoff_s)
+
+
+class Compensation(NamedTuple):
+    """
+    Comando publicado para desfazer um passo concluído quando a saga falha
+    """
+
+    command: str
+    payload_keys: Tuple[str, ...] = ()
+    reason: str = "compensation"
+
+
+class SagaStep(NamedTuple):
+    """
+    Um passo da saga: publica `command` e aguarda `reply`.
+
+    - result_key: chave da resposta com o resultado; vazia/ausente significa falha
+      e o passo é repetido conforme `retry`. Um resultado válido é gravado no
+      fluxo junto com `status` e, se `remember`, guardado no contexto da saga.
+    - payload_keys: chaves do contexto copiadas para o comando.
+    - delay_s: atraso antes do primeiro comando; timeout_s: prazo da resposta,
+      contado a partir do envio agendado.
+    """
+
+    name: str
+    command: str
+    reply: str
+    status: str
+    result_key: str
+    payload_keys: Tuple[str, ...] = ()
+    remember: bool = False
+    delay_s: float = 0.0
+    timeout_s: float = 60.0
+    retry: RetryPolicy = RetryPolicy()
+    compensation: Optional[Compensation] = None
+
+
+class SagaDefinition(NamedTuple):
+    """
+    Sequência de passos iniciada por `trigger`.
+
+    `context_keys` são as chaves do evento inicial guardadas no contexto da saga;
+    `failed_status`/`failed_event` marcam o fluxo quando um passo esgota as tentativas.
+    """
+
+    name: str
+    trigger: str
+    start_status: str
+    steps: Tuple[SagaStep, ...]
+    failed_status: str
+    failed_event: str
+    context_keys: Tuple[str, ...] = ()
+
+    def reply_topics(self) -> Sequence[str]:
+        return sorted({step.reply for step in self.steps})
+
+    def command_payload(self, step: SagaStep, saga_id: str, context: Mapping[str, Any]) -> Dict[str, Any]:
+        return {"checkInId": saga_id, **{key: context.get(key) for key in step.payload_keys}}
+
+    def compensation(self, step: SagaStep, saga_id: str, context: Mapping[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Comando que desfaz `step` (None se o passo não tem compensação)
+        """
+        comp = step.compensation
+        if comp is None:
+            return None
+        return comp.command, {"checkInId": saga_id, "reason": comp.reason, **{key: context.get(key) for key in comp.payload_keys}}
+
+    def compensations(self, completed: int, saga_id: str, context: Mapping[str, Any]):
+        """
+        Comandos de compensação dos passos já concluídos, do último para o primeiro
+        """
+        for step in reversed(self.steps[:completed]):
+            command = self.compensation(step, saga_id, context)
+            if command is not None:
+                yield command
@@ -0,0 +1,434 @@
+# apps/stream/saga/engine.py
+import asyncio, heapq, json, logging, sqlite3, time
+from functools import partial
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from core.db import StoreGroup, flow_stores
+from apps.stream.messaging.partitioning import checkin_lock, owns
+from apps.stream.messaging.outbox import OutgoingMessage, enqueue_sync, relay
+from apps.stream.messaging.dedup import with_event_id
+from apps.stream.read_models.flow_status_repo import patch_status
+from apps.stream.saga.definition import SagaDefinition, SagaStep
+
+logger = logging.getLogger(__name__)
+
+# Estados persistidos (inteiros para manter a linha pequena)
+RUNNING, COMPLETED, FAILED = 0, 1, 2
+STATE_NAMES = ("running", "completed", "failed")
+
+# Timeouts tratados por rodada do timer (as escritas entram no mesmo group commit)
+TIMEOUT_BATCH = 256
+
+
+def _create_schema(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sagas (
+            saga_id TEXT PRIMARY KEY,
+            definition TEXT NOT NULL,
+            state INTEGER NOT NULL,
+            step INTEGER NOT NULL,
+            attempt INTEGER NOT NULL,
+            deadline REAL,
+            context_json TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_sagas_running ON sagas (definition) WHERE state = 0")
+
+# a linha da saga fica no mesmo arquivo do fluxo (gravadas na mesma transação);
+# registrado uma vez aqui: o worker grava, a API só consulta
+_stores = flow_stores()
+_stores.add_schema(_create_schema)
+
+
+class SagaConflict(Exception):
+    """
+    A saga não está mais no passo/tentativa esperados (avançou, falhou ou foi encerrada)
+    """
+
+    def __init__(self, saga_id: str, expected: Tuple[int, int], current: Optional[Tuple[int, int, int]]):
+        super().__init__(f"Saga {saga_id}: esperado passo/tentativa {expected}, atual (estado, passo, tentativa) {current}")
+        self.saga_id = saga_id
+        self.expected = expected
+        self.current = current
+
+
+class SagaRecord:
+    """
+    Estado de uma saga: passo corrente, tentativa e prazo da resposta
+    """
+
+    __slots__ = ("saga_id", "state", "step", "attempt", "deadline", "context")
+
+    def __init__(self, saga_id: str, state: int, step: int, attempt: int, deadline: Optional[float], context: Dict[str, Any]):
+        self.saga_id = saga_id
+        self.state = state
+        self.step = step
+        self.attempt = attempt
+        self.deadline = deadline
+        self.context = context
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sagaId": self.saga_id,
+            "state": STATE_NAMES[self.state],
+            "step": self.step,
+            "attempt": self.attempt,
+            "deadline": self.deadline,
+            "context": self.context,
+        }
+
+
+def _save(conn: sqlite3.Connection, definition: str, record: SagaRecord, expected: Optional[Tuple[int, int]] = None):
+    """
+    Grava o registro da saga. Com `expected` (passo, tentativa), só grava se a
+    linha ainda estiver em andamento naquele ponto; senão levanta SagaConflict e
+    a transação inteira (status do fluxo e outbox) é desfeita.
+    """
+    if expected is not None:
+        current = conn.execute(
+            "SELECT state, step, attempt FROM sagas WHERE saga_id = ?", (record.saga_id,)
+        ).fetchone()
+        if current is None or tuple(current) != (RUNNING, *expected):
+            raise SagaConflict(record.saga_id, expected, None if current is None else tuple(current))
+    conn.execute(
+        "INSERT OR REPLACE INTO sagas (saga_id, definition, state, step, attempt, deadline, context_json, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            record.saga_id, definition, record.state, record.step, record.attempt, record.deadline,
+            json.dumps(record.context, ensure_ascii=False, separators=(",", ":")), time.time(),
+        ),
+    )
+
+def _save_and_enqueue(
+    conn: sqlite3.Connection,
+    definition: str,
+    record: SagaRecord,
+    outbox: Sequence[OutgoingMessage],
+    expected: Optional[Tuple[int, int]] = None,
+) -> Optional[float]:
+    _save(conn, definition, record, expected)
+    return enqueue_sync(conn, outbox) if outbox else None
+
+def _row_to_record(row) -> SagaRecord:
+    saga_id, state, step, attempt, deadline, context_json = row
+    return SagaRecord(saga_id, state, step, attempt, deadline, json.loads(context_json))
+
+def _running(conn: sqlite3.Connection, definition: str) -> List[SagaRecord]:
+    return [_row_to_record(row) for row in conn.execute(
+        "SELECT saga_id, state, step, attempt, deadline, context_json FROM sagas WHERE definition = ? AND state = ?",
+        (definition, RUNNING),
+    )]
+
+def _get(conn: sqlite3.Connection, saga_id: str) -> Optional[SagaRecord]:
+    row = conn.execute(
+        "SELECT saga_id, state, step, attempt, deadline, context_json FROM sagas WHERE saga_id = ?", (saga_id,)
+    ).fetchone()
+    return None if row is None else _row_to_record(row)
+
+def _counts(conn: sqlite3.Connection) -> List[Tuple[str, int, int, int]]:
+    return conn.execute("SELECT definition, state, step, count(*) FROM sagas GROUP BY definition, state, step").fetchall()
+
+
+class SagaEngine:
+    """
+    Executa uma SagaDefinition para muitos fluxos a partir de um único worker.
+
+    Cada saga é só uma linha compacta (passo, tentativa, prazo, contexto) gravada
+    na mesma transação do status do fluxo e dos comandos no outbox; esperas entre
+    passos são mensagens com atraso no outbox. Os prazos de resposta ficam num
+    min-heap atendido por uma única tarefa, então nenhuma saga mantém uma
+    coroutine parada. Na subida, as sagas em andamento são recarregadas e os
+    prazos voltam ao heap; um prazo vencido conta como falha do passo.
+
+    Toda transição é condicional: a linha da saga precisa estar no passo e na
+    tentativa de que o engine partiu. Uma resposta que chega depois de a saga
+    terminar (falha, reserva vencida) ou de outro processo tê-la movido não
+    sobrescreve o status: o resultado órfão é compensado.
+    """
+
+    def __init__(self, definition: SagaDefinition, stores: StoreGroup):
+        self.definition = definition
+        self._stores = stores
+        self._active: Dict[str, SagaRecord] = {}
+        # (deadline, sagaId, passo, tentativa)
+        self._timers: List[Tuple[float, str, int, int]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.conflicts = 0
+
+    def __len__(self):
+        return len(self._active)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": len(self._active),
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "conflicts": self.conflicts,
+        }
+
+    async def start(self):
+        self._active, self._timers = {}, []
+        for store in self._stores:
+            for record in await store.read(_running, self.definition.name):
+                # no modo particionado, cada processo retoma só as sagas das suas partições
+                if owns(record.saga_id):
+                    self._activate(record)
+        logger.info("[Saga] %d sagas '%s' retomadas", len(self._active), self.definition.name)
+        self._task = asyncio.create_task(self._run(), name=f"saga-timers:{self.definition.name}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ---------- Transições ----------
+
+    def _command(self, record: SagaRecord, delay_s: float) -> OutgoingMessage:
+        step = self.definition.steps[record.step]
+        payload = self.definition.command_payload(step, record.saga_id, record.context)
+        # eventId determinístico por (saga, passo, tentativa): reenvios após queda repetem o id
+        parent = {"eventId": f"{record.saga_id}/{record.step}/{record.attempt}"}
+        return OutgoingMessage(step.command, with_event_id(payload, parent, step.command), delay_s)
+
+    def _schedule(self, record: SagaRecord, delay_s: float) -> List[OutgoingMessage]:
+        record.deadline = time.time() + delay_s + self.definition.steps[record.step].timeout_s
+        return [self._command(record, delay_s)]
+
+    @staticmethod
+    def _expected(record: SagaRecord) -> Tuple[int, int]:
+        return record.step, record.attempt
+
+    def _activate(self, record: SagaRecord):
+        if record.state != RUNNING:
+            self._active.pop(record.saga_id, None)
+            return
+        self._active[record.saga_id] = record
+        timer = (record.deadline, record.saga_id, record.step, record.attempt)
+        heapq.heappush(self._timers, timer)
+        if self._timers[0] is timer:
+            self._wakeup.set()
+
+    async def begin(self, event: Dict[str, Any]):
+        """
+        Inicia a saga do fluxo a partir do evento gatilho (idempotente por checkInId)
+        """
+        saga_id = event["checkInId"]
+        async with checkin_lock(saga_id):
+            if saga_id in self._active or await self._stores.for_key(saga_id).read(_get, saga_id):
+                logger.warning("[Saga] Saga %s já iniciada; gatilho ignorado", saga_id)
+                return
+            record = SagaRecord(saga_id, RUNNING, 0, 0, None, {k: event.get(k) for k in self.definition.context_keys})
+            outbox = self._schedule(record, self.definition.steps[0].delay_s)
+            await patch_status(
+                saga_id, self.definition.start_status, event, outbox=outbox,
+                in_transaction=partial(_save, definition=self.definition.name, record=record),
+            )
+            self.started += 1
+            self._activate(record)
+
+    async def on_reply(self, routing_key: str, event: Dict[str, Any]):
+        """
+        Resposta de um passo: avança a saga ou conta uma falha da tentativa corrente.
+        Respostas que não são do passo corrente (atrasadas ou repetidas) são ignoradas.
+        """
+        saga_id = event["checkInId"]
+        async with checkin_lock(saga_id):
+            record = self._active.get(saga_id)
+            if record is None or self.definition.steps[record.step].reply != routing_key:
+                logger.info("[Saga] Resposta %s fora de ordem para %s; ignorada", routing_key, saga_id)
+                return
+            step = self.definition.steps[record.step]
+            result = event.get(step.result_key)
+            if result:
+                await self._advance(record, step, result)
+            else:
+                await self._fail_attempt(record, step, "empty_result")
+
+    async def _advance(self, record: SagaRecord, step: SagaStep, result: Any):
+        context = {**record.context, step.result_key: result} if step.remember else record.context
+        nxt = SagaRecord(record.saga_id, RUNNING, record.step + 1, 0, None, context)
+        outbox: List[OutgoingMessage] = []
+        if nxt.step == len(self.definition.steps):
+            nxt.state, nxt.step = COMPLETED, record.step
+        else:
+            outbox = self._schedule(nxt, self.definition.steps[nxt.step].delay_s)
+
+        try:
+            await patch_status(
+                record.saga_id, step.status, {step.result_key: result}, outbox=outbox,
+                in_transaction=partial(_save, definition=self.definition.name, record=nxt, expected=self._expected(record)),
+            )
+        except SagaConflict as exc:
+            await self._orphaned(record, step, result, exc)
+            return
+        if nxt.state == COMPLETED:
+            self.completed += 1
+        self._activate(nxt)
+
+    async def _fail_attempt(self, record: SagaRecord, step: SagaStep, reason: str):
+        attempt = record.attempt + 1
+        if attempt < step.retry.max_attempts:
+            nxt = SagaRecord(record.saga_id, RUNNING, record.step, attempt, None, record.context)
+            outbox = self._schedule(nxt, step.retry.delay(attempt))
+            logger.warning(
+                "[Saga] Passo '%s' de %s falhou (%s); tentativa %d/%d",
+                step.name, record.saga_id, reason, attempt + 1, step.retry.max_attempts,
+            )
+            try:
+                relay.notify(await self._stores.for_key(record.saga_id).write(
+                    _save_and_enqueue, self.definition.name, nxt, outbox, self._expected(record),
+                ))
+            except SagaConflict as exc:
+                await self._orphaned(record, step, None, exc)
+                return
+            self.retries += 1
+            self._activate(nxt)
+            return
+
+        # tentativas esgotadas: compensa os passos concluídos, do último para o primeiro
+        nxt = SagaRecord(record.saga_id, FAILED, record.step, record.attempt, None, record.context)
+        token = {"eventId": f"{record.saga_id}/{record.step}/failed"}
+        outbox = [
+            OutgoingMessage(command, with_event_id(payload, token, command))
+            for command, payload in self.definition.compensations(record.step, record.saga_id, record.context)
+        ]
+        failed_event = {"checkInId": record.saga_id, "failedStep": step.name, "reason": reason}
+        outbox.append(OutgoingMessage(self.definition.failed_event, with_event_id(failed_event, token, self.definition.failed_event)))
+        logger.error("[Saga] Saga %s falhou no passo '%s' (%s); %d compensações", record.saga_id, step.name, reason, len(outbox) - 1)
+        try:
+            await patch_status(
+                record.saga_id, self.definition.failed_status, {"failedStep": step.name}, outbox=outbox,
+                in_transaction=partial(_save, definition=self.definition.name, record=nxt, expected=self._expected(record)),
+            )
+        except SagaConflict as exc:
+            await self._orphaned(record, step, None, exc)
+            return
+        self.failed += 1
+        self._activate(nxt)
+
+    async def abort(
+        self,
+        saga_id: str,
+        status: str,
+        patch: Dict[str, Any],
+        outbox: Sequence[OutgoingMessage] = (),
+        expected_version: Optional[int] = None,
+    ) -> bool:
+        """
+        Encerra como falha a saga em andamento por um evento externo (ex.: reserva
+        vencida). `status`, `patch` e `outbox` são o estado final do fluxo e as
+        mensagens da compensação que o chamador já fez; as compensações da
+        definição não são publicadas.
+
+        Grava junto com o status, sob o lock do checkInId e condicionado ao passo
+        corrente da saga (SagaConflict) e a `expected_version` do fluxo
+        (VersionConflict). Sem saga em andamento, só grava o fluxo. Retorna se
+        havia saga a encerrar.
+        """
+        async with checkin_lock(saga_id):
+            record = self._active.get(saga_id) or await self._stores.for_key(saga_id).read(_get, saga_id)
+            if record is None or record.state != RUNNING:
+                await patch_status(saga_id, status, patch, expected_version=expected_version, outbox=outbox)
+                return False
+            nxt = SagaRecord(saga_id, FAILED, record.step, record.attempt, None, record.context)
+            await patch_status(
+                saga_id, status, patch, expected_version=expected_version, outbox=outbox,
+                in_transaction=partial(_save, definition=self.definition.name, record=nxt, expected=self._expected(record)),
+            )
+            logger.warning("[Saga] Saga %s encerrada no passo '%s' (%s)", saga_id, self.definition.steps[record.step].name, status)
+            self.failed += 1
+            self._activate(nxt)
+            return True
+
+    async def _orphaned(self, record: SagaRecord, step: SagaStep, result: Any, conflict: SagaConflict):
+        """
+        A saga mudou por fora deste engine (encerrada pela expiração, movida por
+        outro processo): nada foi gravado. Um resultado que chegou tarde é
+        desfeito pela compensação do passo; o registro em memória é relido.
+        """
+        self.conflicts += 1
+        logger.warning("[Saga] Transição de %s descartada: %s", record.saga_id, conflict)
+        compensation = result and self.definition.compensation(step, record.saga_id, {**record.context, step.result_key: result})
+        if compensation:
+            command, payload = compensation
+            token = {"eventId": f"{record.saga_id}/{record.step}/{record.attempt}/orphaned"}
+            await relay.enqueue([OutgoingMessage(command, with_event_id(payload, token, command))])
+        current = await self._stores.for_key(record.saga_id).read(_get, record.saga_id)
+        if current is None or current.state != RUNNING:
+            self._active.pop(record.saga_id, None)
+        else:
+            self._activate(current)
+
+    # ---------- Prazos ----------
+
+    def _pop_expired(self, now: float) -> List[SagaRecord]:
+        expired = []
+        while self._timers and self._timers[0][0] <= now and len(expired) < TIMEOUT_BATCH:
+            deadline, saga_id, step, attempt = heapq.heappop(self._timers)
+            record = self._active.get(saga_id)
+            # descarta prazos de passos/tentativas que já avançaram
+            if record is not None and (record.step, record.attempt, record.deadline) == (step, attempt, deadline):
+                expired.append(record)
+        return expired
+
+    async def _expire(self, record: SagaRecord):
+        async with checkin_lock(record.saga_id):
+            # a resposta pode ter chegado enquanto esperava o lock
+            if self._active.get(record.saga_id) is not record:
+                return
+            self.timeouts += 1
+            await self._fail_attempt(record, self.definition.steps[record.step], "timeout")
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            expired = self._pop_expired(time.time())
+            if expired:
+                results = await asyncio.gather(*(self._expire(r) for r in expired), return_exceptions=True)
+                for record, result in zip(expired, results):
+                    if isinstance(result, Exception):
+                        logger.error("[Saga] Falha ao tratar timeout de %s: %r", record.saga_id, result)
+                        # tenta de novo mais tarde com o mesmo registro
+                        record.deadline = time.time() + 1.0
+                        heapq.heappush(self._timers, (record.deadline, record.saga_id, record.step, record.attempt))
+                continue
+
+            timeout = self._timers[0][0] - time.time() if self._timers else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+# ---------- Consulta (API) ----------
+
+async def get_saga(saga_id: str) -> Optional[Dict[str, Any]]:
+    record = await _stores.for_key(saga_id).read(_get, saga_id)
+    return None if record is None else record.to_dict()
+
+async def saga_counts() -> Dict[str, Dict[str, int]]:
+    """
+    Sagas por definição e estado; as em andamento também por passo
+    """
+    counts: Dict[str, Dict[str, int]] = {}
+    rows = [row for store in _stores for row in await store.read(_counts)]
+    for definition, state, step, count in rows:
+        by_state = counts.setdefault(definition, {})
+        key = f"{STATE_NAMES[state]}:{step}" if state == RUNNING else STATE_NAMES[state]
+        by_state[key] = by_state.get(key, 0) + count
+    return counts
@@ -7,6 +7,19 @@ sys.path.insert(0, str(root_dir))
 
 from faststream.rabbit import RabbitBroker
 from core.config import settings
+from apps.stream.messaging.partitioning import CheckInOrderingMiddleware
+from apps.stream.messaging.dedup import IdempotencyMiddleware
+from apps.stream.messaging.event_log import EventLogMiddleware
+from apps.stream.messaging.metrics import MetricsMiddleware
+from apps.stream.messaging.codec import CodecMiddleware, decode_message
 
 # NOME CORRETO: RabbitBroker (não RabbitBrokerBroker)
-broker = RabbitBroker(settings.BROKER_URL)
\ No newline at end of file
+broker = RabbitBroker(
+    settings.BROKER_URL,
+    max_consumers=settings.WORKER_PREFETCH or None,
+    # ordem importa: a checagem de duplicidade roda dentro do lock do checkInId
+    # e só eventos inéditos chegam ao log; as métricas medem só o handler; o codec
+    # serializa por último, depois que os demais viram o dict publicado
+    middlewares=[CheckInOrderingMiddleware, IdempotencyMiddleware, EventLogMiddleware, MetricsMiddleware, CodecMiddleware],
+    decoder=decode_message,
+)
\ No newline at end of file
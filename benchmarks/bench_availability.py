@@ -0,0 +1,100 @@
+"""
+Benchmark de /api/consultar-vagas: lista de vagas copiada em cada fluxo vs.
+snapshot de disponibilidade versionado por categoria.
+
+Mede o tamanho do registro do fluxo (data_json), os bytes da resposta e a
+latência das requisições (200 com o corpo, e 304 com If-None-Match) pela app
+FastAPI em processo, sem rede.
+
+Uso:
+    PYTHONPATH=. python benchmarks/bench_availability.py --flows 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+os.environ.setdefault("FLOW_STATUS_DB", os.path.join(tempfile.mkdtemp(prefix="bench-availability-"), "flow_status.db"))
+os.environ.setdefault("SPOT_SNAPSHOT_INTERVAL_S", "0")
+
+import httpx
+
+from core.config import settings
+from apps.api.main import app
+from apps.stream.inventory.availability import availability
+from apps.stream.inventory.spot_inventory import inventory
+from apps.stream.read_models.flow_status_repo import FlowPatch, patch_status_many
+
+CATEGORY = "carro"
+
+
+def _summary(samples_s, sizes):
+    ordered = sorted(samples_s)
+    return {
+        "requests": len(ordered),
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p99_ms": round(ordered[int(len(ordered) * 0.99) - 1] * 1000, 3),
+        "response_bytes": round(statistics.mean(sizes), 1),
+    }
+
+
+async def _get_all(client, cids, headers=None):
+    samples, sizes = [], []
+    for cid in cids:
+        started = time.perf_counter()
+        response = await client.get("/api/consultar-vagas", params={"checkInId": cid, "vehicleCategory": CATEGORY}, headers=headers)
+        samples.append(time.perf_counter() - started)
+        assert response.status_code in (200, 304), response.status_code
+        sizes.append(len(response.content))
+    return _summary(samples, sizes)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flows", type=int, default=2000)
+    args = parser.parse_args()
+
+    await availability.start()
+    version, total = await availability.current(CATEGORY)
+    spots = inventory.available(CATEGORY, limit=settings.SPOT_CONSULT_LIMIT)
+
+    base = {"vehicleCategory": CATEGORY, "licensePlate": "ABC1234"}
+    legacy = [str(uuid.uuid4()) for _ in range(args.flows)]
+    versioned = [str(uuid.uuid4()) for _ in range(args.flows)]
+    await patch_status_many([FlowPatch(cid, "spots_consulted", {**base, "checkInId": cid, "spots": spots}) for cid in legacy])
+    await patch_status_many([FlowPatch(cid, "spots_consulted", {**base, "checkInId": cid, "spotsVersion": version}) for cid in versioned])
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        probe = await client.get("/api/consultar-vagas", params={"checkInId": versioned[0], "vehicleCategory": CATEGORY})
+        etag = probe.headers["ETag"]
+        # cada fluxo é pedido uma vez: o status sempre vem do read model, não do cache da API
+        results = {
+            "legacy_spot_list": await _get_all(client, legacy),
+            "snapshot_200": await _get_all(client, versioned[: args.flows // 2]),
+            "snapshot_304": await _get_all(client, versioned[args.flows // 2 :], {"If-None-Match": etag}),
+        }
+
+    sample = {**base, "checkInId": legacy[0]}
+    print(json.dumps({
+        "flows": args.flows,
+        "spots_per_consult": len(spots),
+        "total_available": total,
+        "row_bytes": {
+            "legacy_spot_list": len(json.dumps({**sample, "spots": spots})),
+            "snapshot_version": len(json.dumps({**sample, "spotsVersion": version})),
+        },
+        "requests": results,
+    }, indent=2))
+    await availability.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
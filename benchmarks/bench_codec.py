@@ -0,0 +1,77 @@
+"""
+Micro-benchmark dos codecs de eventos e de dados de fluxo (json vs msgpack).
+
+Para payloads representativos de cada etapa do fluxo, mede o tamanho
+serializado e o tempo de encode e de decode por payload, pelos mesmos
+caminhos usados em produção: `Codec.encode/decode` nos eventos e
+`encode_flow_data`/`decode_stored` no data_json do read model.
+
+Uso:
+    PYTHONPATH=. python benchmarks/bench_codec.py --iterations 200000
+"""
+import argparse
+import json
+import sys
+import timeit
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from apps.stream.messaging import topic
+from apps.stream.messaging.codec import CODECS, FLOW_DATA_SCHEMA_VERSION, decode_stored, schema_version
+
+CID = str(uuid.uuid4())
+SPOT = {"spotId": "L1-CAR-001", "level": "1", "position": "A1", "isAvailable": False, "reservedUntil": "2026-01-01T12:05:00Z"}
+ROBOT = {"robotId": "R1-01", "level": "1", "position": "A1", "busyUntil": "2026-01-01T12:02:00Z"}
+EVENT_ID = uuid.uuid4().hex
+
+# tópico -> payload
+EVENTS = {
+    topic.CHECKIN_SUBMITTED: {"checkInId": CID, "vehicleCategory": "carro", "licensePlate": "ABC1D23", "eventId": EVENT_ID},
+    topic.SPOT_CONSULT_COMPLETED: {"checkInId": CID, "vehicleCategory": "carro", "spotsVersion": 1234, "totalAvailable": 380, "eventId": EVENT_ID},
+    topic.SPOT_RESERVED: {"checkInId": CID, "spot": SPOT, "eventId": EVENT_ID},
+    topic.ROBOT_ASSIGNED: {"checkInId": CID, "robot": ROBOT, "eventId": EVENT_ID},
+}
+# data_json de um fluxo concluído
+FLOW_DATA = {
+    "checkInId": CID, "vehicleCategory": "carro", "licensePlate": "ABC1D23", "eventId": EVENT_ID,
+    "spotsVersion": 1234, "spot": SPOT, "robot": ROBOT,
+}
+
+
+def _per_call_us(fn, iterations: int) -> float:
+    # melhor de 3 rodadas: tira o ruído de GC e de outros processos
+    return round(min(timeit.repeat(fn, number=iterations, repeat=3)) / iterations * 1e6, 3)
+
+
+def _case(codec, payload, version: int, iterations: int, decode) -> dict:
+    data = codec.encode(payload, version)
+    assert decode(data) == payload
+    return {
+        "bytes": len(data),
+        "encode_us": _per_call_us(lambda: codec.encode(payload, version), iterations),
+        "decode_us": _per_call_us(lambda: decode(data), iterations),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    results = {}
+    for name, codec in CODECS.items():
+        cases = {}
+        for routing_key, payload in EVENTS.items():
+            version = schema_version(routing_key)
+            cases[routing_key] = _case(codec, payload, version, args.iterations, lambda data: codec.decode(data, version))
+        # o read model decodifica sem saber o codec da linha (texto ou BLOB com cabeçalho)
+        cases["flow_data"] = _case(codec, FLOW_DATA, FLOW_DATA_SCHEMA_VERSION, args.iterations, decode_stored)
+        results[name] = cases
+
+    print(json.dumps({"iterations": args.iterations, "codecs": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
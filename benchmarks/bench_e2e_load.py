@@ -0,0 +1,315 @@
+"""
+Carga ponta a ponta: API + worker sobre um broker em memória.
+
+Sobe `apps.api.main:create_app` (chamada via httpx, sem servidor HTTP) e o
+worker de `apps.stream.main` (consumers, saga, relay do outbox, dispatcher) com
+o RabbitMQ trocado pelo TestRabbitBroker do FastStream nos dois brokers. Uma
+ponte (`InMemoryBus`) entrega cada publicação aos subscribers da API e do worker
+numa tarefa própria, como o broker real: quem publica não espera o consumer, e
+no máximo WORKER_PREFETCH mensagens ficam em processamento por processo.
+
+Para cada taxa em --rates (check-ins/s, chegadas de Poisson durante
+--duration-s) roda um processo novo com bancos novos e mede, por check-in:
+
+- submit: duração do POST /api/submeterCheckin aceito
+- consulted: do início do POST até o status spots_consulted ser gravado
+- reserved: do início do POST até spot_reserved
+- assigned: do início do POST até robot_assigned
+
+Reporta p50/p95/p99 de cada etapa (ms), vazão de submissão e de reservas,
+check-ins recusados com 429 pelo controle de admissão (shed), fluxos que não
+chegaram ao fim dentro de --drain-s e o RSS máximo do processo. Os POSTs vêm de
+--clients totens (X-Client-Id), cada um com seu token bucket.
+
+Com --max-inflight, cada taxa roda uma vez por limite de ADMISSION_MAX_INFLIGHT
+(0 = sem gate de backlog): acima da capacidade do worker, sem o gate o p99 cresce
+com a duração da carga; com ele, o excesso volta como 429 e o p99 fica limitado
+por limite / vazão.
+Com --tracemalloc reporta também o pico de memória Python, mas o rastreamento
+deixa o processo várias vezes mais lento: as latências dessa execução não
+valem como medida. A saída é JSON para comparar commits:
+
+    PYTHONPATH=. python benchmarks/bench_e2e_load.py > antes.json
+    ... (muda o código) ...
+    PYTHONPATH=. python benchmarks/bench_e2e_load.py > depois.json
+
+Os atrasos do orquestrador (ORCHESTRATOR_*_DELAY_S) são zerados, a menos que
+venham do ambiente; vagas e robôs são dimensionados para não faltarem.
+
+Uso:
+    PYTHONPATH=. python benchmarks/bench_e2e_load.py --rates 25,50,100,200 --duration-s 10
+    FLOW_STATUS_BACKEND=sharded PYTHONPATH=. python benchmarks/bench_e2e_load.py --rates 100
+    PYTHONPATH=. python benchmarks/bench_e2e_load.py --rates 100 --duration-s 20 --max-inflight 0,50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from faststream.rabbit import RabbitExchange, TestRabbitBroker
+from faststream.rabbit.testing import _is_handler_suitable
+
+CATEGORIES = ["carro", "sedan", "hatch", "suv", "picape", "caminhonete"]
+STAGES = {"consulted": "spots_consulted", "reserved": "spot_reserved", "assigned": "robot_assigned"}
+FINAL_STATUSES = {"robot_assigned", "checkin_failed"}
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(values) -> dict:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2),
+    }
+
+
+class InMemoryBus:
+    """
+    Produtor que substitui o do broker em teste: cada publicação é entregue aos
+    brokers da ponte (API e worker) que têm subscriber para ela, numa tarefa
+    separada, limitada por um semáforo de `prefetch` mensagens por broker
+    """
+
+    def __init__(self, producers, prefetch: int):
+        self._lanes = [(producer, asyncio.Semaphore(prefetch)) for producer in producers]
+        # (exchange, routing key) -> lanes com subscriber: o FakeProducer monta a
+        # mensagem (cara, cheia de mocks) antes de procurar o subscriber
+        self._routes = {}
+        self._tasks: set = set()
+        self.published = 0
+        self.errors = 0
+
+    def _lanes_for(self, exchange, routing_key: str):
+        exch = RabbitExchange.validate(exchange)
+        key = (exch.name if exch else None, routing_key)
+        lanes = self._routes.get(key)
+        if lanes is None:
+            lanes = self._routes[key] = [
+                (producer, slots) for producer, slots in self._lanes
+                if any(_is_handler_suitable(h, routing_key, {}, exch) for h in producer.broker._subscribers.values())
+            ]
+        return lanes
+
+    async def publish(self, message, exchange=None, **kwargs):
+        self.published += 1
+        for producer, slots in self._lanes_for(exchange, kwargs.get("routing_key", "")):
+            task = asyncio.create_task(self._deliver(producer, slots, message, exchange, kwargs))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _deliver(self, producer, slots, message, exchange, kwargs):
+        async with slots:
+            try:
+                await producer.publish(message, exchange, **kwargs)
+            except Exception:
+                # no broker real a mensagem voltaria para a fila; aqui só conta
+                self.errors += 1
+
+    async def drain(self):
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+
+def _checkin_body(rng: random.Random) -> dict:
+    return {
+        "vehicleCategory": rng.choice(CATEGORIES),
+        "cpf": f"{rng.randrange(10**10, 10**11)}",
+        "phone": f"119{rng.randrange(10**7, 10**8)}",
+        "licensePlate": f"ABC{rng.randrange(1000, 10000)}",
+        "securityChecks": {"doors": True, "windows": True, "handbrake": True, "seatbelt": True, "mirrors": True},
+        "termsAccepted": True,
+    }
+
+
+async def _child(args):
+    import httpx
+
+    from core.config import settings
+    from apps.api.dependencies import publisher_broker
+    from apps.api.main import create_app
+    from apps.stream import main as worker
+    from apps.stream.read_models.flow_status_repo import add_change_listener
+
+    submitted_at = {}
+    reached = {stage: {} for stage in STAGES}
+    finished = set()
+    by_status = {status: stage for stage, status in STAGES.items()}
+
+    @add_change_listener
+    async def record_transition(check_in_id: str, status: str, version: int, data: dict):
+        stage = by_status.get(status)
+        if stage is not None:
+            reached[stage].setdefault(check_in_id, time.perf_counter())
+        if status in FINAL_STATUSES:
+            finished.add(check_in_id)
+
+    app = create_app()
+    rng = random.Random(args.seed)
+    submit_s = []
+    rejected = shed = 0
+    clients = [f"totem-{n:04d}" for n in range(args.clients)]
+
+    async with TestRabbitBroker(publisher_broker) as api_broker, TestRabbitBroker(worker.broker) as stream_broker:
+        bus = InMemoryBus([api_broker._producer, stream_broker._producer], settings.WORKER_PREFETCH or 10**6)
+        # os dois lados passam a publicar pela ponte (o patch do teste é desfeito na saída)
+        api_broker._producer = stream_broker._producer = bus
+        await worker.restore_state()
+        await worker.start_relay()
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+
+            async def submit(body, client_id):
+                nonlocal rejected, shed
+                started = time.perf_counter()
+                response = await client.post("/api/submeterCheckin", json=body, headers={"X-Client-Id": client_id})
+                elapsed = time.perf_counter() - started
+                if response.status_code == 429:
+                    shed += 1
+                    return
+                payload = response.json()
+                if response.status_code != 200 or not payload.get("success"):
+                    rejected += 1
+                    return
+                submit_s.append(elapsed)
+                submitted_at[payload["data"]["checkInId"]] = started
+
+            if args.tracemalloc:
+                tracemalloc.start()
+            requests = []
+            start = time.perf_counter()
+            next_at = start
+            while next_at - start < args.duration_s:
+                await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+                # chegadas em malha aberta: o próximo POST não espera o anterior
+                requests.append(asyncio.create_task(submit(_checkin_body(rng), rng.choice(clients))))
+                next_at += rng.expovariate(args.rate)
+            await asyncio.gather(*requests)
+            submit_wall_s = time.perf_counter() - start
+
+            deadline = time.perf_counter() + args.drain_s
+            while time.perf_counter() < deadline and not set(submitted_at) <= finished:
+                await asyncio.sleep(0.05)
+            wall_s = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+            tracemalloc.stop()
+
+        await worker.stop_background_tasks()
+        await bus.drain()
+
+    stages = {"submit": summarize(submit_s)}
+    for stage, times in reached.items():
+        stages[stage] = summarize([times[cid] - t0 for cid, t0 in submitted_at.items() if cid in times])
+    reserved = reached["reserved"]
+    last_reserved = max((reserved[cid] for cid in submitted_at if cid in reserved), default=start)
+    report = {
+        "rate": args.rate,
+        "offered": len(requests),
+        "accepted": len(submitted_at),
+        "rejected": rejected,
+        "shed": shed,
+        "submitted_per_s": round(len(requests) / submit_wall_s, 1),
+        "reserved_per_s": round(stages["reserved"]["count"] / max(last_reserved - start, 1e-9), 1),
+        "unfinished": len(set(submitted_at) - finished),
+        "wall_s": round(wall_s, 2),
+        "bus_messages": bus.published,
+        "handler_errors": bus.errors,
+        "stages": stages,
+        "tracemalloc_peak_mb": round(peak / 2**20, 1) if peak is not None else None,
+        # ru_maxrss vem em KiB no Linux
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    print(json.dumps(report))
+
+
+def _run_rate(rate: float, max_inflight: Optional[str], args) -> dict:
+    work_dir = tempfile.mkdtemp(prefix=f"bench-e2e-{rate:g}-")
+    expected = int(rate * args.duration_s * 1.5) + 100
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(Path(__file__).parent.parent),
+        "FLOW_STATUS_DB": os.path.join(work_dir, "flow_status.db"),
+        "EVENT_LOG_DIR": os.path.join(work_dir, "eventlog"),
+        "FLOW_SNAPSHOT_DIR": os.path.join(work_dir, "snapshots"),
+        "FLOW_SNAPSHOT_INTERVAL_S": "0",
+        # sem falta de vagas nem de robôs: a medida é do pipeline, não da lotação
+        "SPOTS_PER_LEVEL_PER_CATEGORY": str(expected),
+        "ROBOTS_PER_LEVEL": str(expected),
+    }
+    if max_inflight is not None:
+        env["ADMISSION_MAX_INFLIGHT"] = max_inflight
+    for name in ("ORCHESTRATOR_CONSULT_DELAY_S", "ORCHESTRATOR_RESERVE_DELAY_S", "ORCHESTRATOR_ROBOT_DELAY_S"):
+        env.setdefault(name, "0")
+    child = subprocess.run(
+        [
+            sys.executable, __file__, "--child",
+            "--rate", str(rate), "--duration-s", str(args.duration_s),
+            "--drain-s", str(args.drain_s), "--seed", str(args.seed), "--clients", str(args.clients),
+            *(["--tracemalloc"] if args.tracemalloc else []),
+        ],
+        env=env, stdout=subprocess.PIPE, text=True,
+    )
+    if child.returncode:
+        raise RuntimeError(f"execução do benchmark falhou (rate={rate:g})")
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    if max_inflight is not None:
+        result["max_inflight"] = int(max_inflight)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rates", default="25,50,100,200", help="check-ins/s separados por vírgula")
+    parser.add_argument("--duration-s", type=float, default=10.0, help="tempo de chegadas por taxa")
+    parser.add_argument("--drain-s", type=float, default=30.0, help="espera pelos fluxos em andamento")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--clients", type=int, default=500, help="totens distintos (X-Client-Id)")
+    parser.add_argument("--max-inflight", default=None, help="limites de ADMISSION_MAX_INFLIGHT a comparar, ex.: 0,50")
+    parser.add_argument("--tracemalloc", action="store_true", help="mede o pico de memória Python (lento)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--rate", type=float, default=0.0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # os logs por mensagem dos consumers custariam mais que o próprio fluxo
+        logging.disable(logging.INFO)
+        asyncio.run(_child(args))
+        return
+
+    from core.config import settings
+
+    report = {
+        "duration_s": args.duration_s,
+        "backend": os.environ.get("FLOW_STATUS_BACKEND", settings.FLOW_STATUS_BACKEND),
+        "prefetch": settings.WORKER_PREFETCH,
+        "spot_batch": [settings.SPOT_BATCH_MAX_ITEMS, settings.SPOT_BATCH_WINDOW_MS],
+        "results": [
+            _run_rate(float(rate), limit, args)
+            for rate in args.rates.split(",")
+            for limit in (args.max_inflight.split(",") if args.max_inflight else [None])
+        ],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
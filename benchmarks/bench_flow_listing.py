@@ -0,0 +1,114 @@
+"""
+Benchmark da listagem de fluxos do read model (GET /api/operacao/fluxos).
+
+Para tabelas de tamanhos crescentes, mede a latência de uma página de fluxos
+parados num status: a primeira página, uma página funda pelo cursor
+(paginação por chave, a do endpoint) e a mesma página por OFFSET, além da
+busca por placa. Com os índices, a página por cursor deve ficar plana com o
+tamanho da tabela; a por OFFSET cresce com a profundidade.
+
+Uso:
+    PYTHONPATH=. python benchmarks/bench_flow_listing.py --sizes 10000,100000,500000 --page 100
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from apps.stream.read_models.backends import (
+    HOT_COLUMNS, _list_flows, create_flow_status_indexes, create_flow_status_table, encode_flow_data, hot_columns,
+)
+
+STATUSES = ["checkin_submitted", "spots_consulted", "spot_reserved", "robot_assigned", "completed"]
+PLATE = "BEN0001"
+INSERT = f"INSERT INTO flow_status (check_in_id, status, data_json, updated_at, version, updated_ms, {', '.join(HOT_COLUMNS)}) VALUES ({', '.join('?' * (6 + len(HOT_COLUMNS)))})"
+
+
+def _populate(conn: sqlite3.Connection, rows: int):
+    create_flow_status_table(conn, "flow_status")
+    started_ms = int(time.time() * 1000) - rows * 10
+    random.seed(rows)
+    batch = []
+    for i in range(rows):
+        cid = str(uuid.uuid4())
+        data = {"checkInId": cid, "vehicleCategory": "carro", "licensePlate": PLATE if i % 1000 == 0 else f"BEN{i:07d}"}
+        if i % 3:
+            data["spot"] = {"spotId": f"L1-CAR-{i % 400:03d}"}
+        hot = hot_columns(data)
+        updated_ms = started_ms + i * 10
+        batch.append((
+            cid, random.choice(STATUSES), encode_flow_data(data), f"{updated_ms}", 1, updated_ms,
+            *(hot.get(name) for name in HOT_COLUMNS),
+        ))
+        if len(batch) >= 10_000:
+            conn.executemany(INSERT, batch)
+            batch.clear()
+    conn.executemany(INSERT, batch)
+    create_flow_status_indexes(conn)
+    conn.commit()
+    conn.execute("ANALYZE")
+
+
+def _timed(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return {"p50_ms": round(statistics.median(samples) * 1000, 3), "max_ms": round(max(samples) * 1000, 3)}
+
+
+def _offset_page(conn: sqlite3.Connection, status: str, offset: int, limit: int):
+    return conn.execute(
+        "SELECT check_in_id FROM flow_status WHERE status = ? ORDER BY updated_ms, check_in_id LIMIT ? OFFSET ?",
+        (status, limit, offset),
+    ).fetchall()
+
+
+def _bench_size(rows: int, page: int, repeat: int) -> dict:
+    directory = tempfile.mkdtemp(prefix="bench-flow-listing-")
+    conn = sqlite3.connect(os.path.join(directory, "flow_status.db"))
+    _populate(conn, rows)
+    status = "spot_reserved"
+    matching = conn.execute("SELECT count(*) FROM flow_status WHERE status = ?", (status,)).fetchone()[0]
+    # chave de uma linha a ~90% do status: a página seguinte é "funda"
+    depth = int(matching * 0.9)
+    key = conn.execute(
+        "SELECT updated_ms, check_in_id FROM flow_status WHERE status = ? ORDER BY updated_ms, check_in_id LIMIT 1 OFFSET ?",
+        (status, depth),
+    ).fetchone()
+    result = {
+        "rows": rows,
+        "status_rows": matching,
+        "first_page": _timed(lambda: _list_flows(conn, status, None, None, None, False, page), repeat),
+        "deep_page_cursor": _timed(lambda: _list_flows(conn, status, None, None, key, False, page), repeat),
+        "deep_page_offset": _timed(lambda: _offset_page(conn, status, depth, page), repeat),
+        "older_than_desc": _timed(lambda: _list_flows(conn, status, None, key[0], None, True, page), repeat),
+        "by_plate": _timed(lambda: _list_flows(conn, None, PLATE, None, None, True, page), repeat),
+    }
+    conn.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,500000")
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    print(json.dumps({"page": args.page, "results": [_bench_size(rows, args.page, args.repeat) for rows in sizes]}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Vazão de escrita dos backends do read model (FLOW_STATUS_BACKEND).
+
+Para cada backend e cada número de processos em --processes, sobe P workers
+(processos) sobre um banco novo. Cada worker grava, com --concurrency escritas
+em voo, --ops/P transições com `set_status`, cada uma com uma mensagem no outbox
+(o caminho dos consumers). As transições ficam nos checkInIds da sua partição,
+como no modo WORKER_PARTITIONS.
+
+- memory: dict no processo; o outbox continua no SQLite (só faz sentido com P=1)
+- sqlite: um arquivo; os processos disputam o lock de escrita
+- sharded: --shards arquivos. Com --shards igual a P, cada worker escreve só no seu
+  arquivo, porque partição e shard usam o mesmo crc32(checkInId)
+
+Reporta escritas/s somadas de todos os processos e leituras/s (get_status).
+
+Uso:
+    PYTHONPATH=. python benchmarks/bench_flow_status_backends.py --ops 20000 --processes 1,2,4
+    PYTHONPATH=. python benchmarks/bench_flow_status_backends.py --synchronous FULL --processes 4 --shards 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def _partition_cids(partition: int, partitions: int, count: int):
+    cids, i = [], 0
+    while len(cids) < count:
+        cid = f"cid-{i:08d}"
+        if zlib.crc32(cid.encode("utf-8")) % partitions == partition:
+            cids.append(cid)
+        i += 1
+    return cids
+
+
+async def _child(args):
+    from apps.stream.messaging.outbox import OutgoingMessage
+    from apps.stream.read_models.flow_status_repo import get_status, set_status
+
+    cids = _partition_cids(args.partition, args.partitions, args.flows // args.partitions)
+    ops = args.ops // args.partitions
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def one(i):
+        cid = cids[i % len(cids)]
+        async with sem:
+            await set_status(
+                cid, "checkin_submitted", {"n": i, "vehicleCategory": "carro"},
+                outbox=[OutgoingMessage("bench.backend.v1", {"checkInId": cid, "eventId": f"evt-{args.partition}-{i}"})],
+            )
+
+    # aquece conexões e esquema antes da largada comum
+    await get_status(cids[0])
+    await asyncio.sleep(max(0.0, args.start_at - time.time()))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(ops)))
+    write_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for begin in range(0, ops, args.concurrency):
+        await asyncio.gather(*(get_status(cids[i % len(cids)]) for i in range(begin, min(ops, begin + args.concurrency))))
+    read_s = time.perf_counter() - start
+    print(json.dumps({"ops": ops, "write_s": write_s, "read_s": read_s}))
+
+
+def _run_level(name: str, processes: int, args) -> dict:
+    work_dir = tempfile.mkdtemp(prefix=f"bench-backend-{name}-")
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(Path(__file__).parent.parent),
+        "FLOW_STATUS_BACKEND": name,
+        "FLOW_STATUS_SHARDS": str(args.shards),
+        "FLOW_STATUS_DB": os.path.join(work_dir, "flow_status.db"),
+        "FLOW_STATUS_SYNCHRONOUS": args.synchronous,
+        "WORKER_PARTITIONS": str(processes),
+    }
+    start_at = time.time() + 3.0
+    children = [
+        subprocess.Popen(
+            [
+                sys.executable, __file__, "--child",
+                "--partition", str(p), "--partitions", str(processes),
+                "--ops", str(args.ops), "--flows", str(args.flows),
+                "--concurrency", str(args.concurrency), "--start-at", str(start_at),
+            ],
+            env={**env, "WORKER_PARTITION": str(p)}, stdout=subprocess.PIPE, text=True,
+        )
+        for p in range(processes)
+    ]
+    reports = []
+    for child in children:
+        out, _ = child.communicate()
+        if child.returncode:
+            raise RuntimeError(f"worker do benchmark falhou ({name}, P={processes})")
+        reports.append(json.loads(out.strip().splitlines()[-1]))
+    ops = sum(r["ops"] for r in reports)
+    return {
+        "writes_per_s": round(ops / max(r["write_s"] for r in reports)),
+        "reads_per_s": round(ops / max(r["read_s"] for r in reports)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=20000, help="escritas somando todos os processos")
+    parser.add_argument("--flows", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64, help="escritas em voo por processo")
+    parser.add_argument("--processes", default="1,2,4")
+    parser.add_argument("--backends", default="memory,sqlite,sharded")
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--synchronous", default="NORMAL")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--partition", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--partitions", type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, default=0.0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(_child(args))
+        return
+
+    report = {
+        "ops": args.ops,
+        "concurrency_per_process": args.concurrency,
+        "synchronous": args.synchronous,
+        "shards": args.shards,
+        "backends": {},
+    }
+    for name in args.backends.split(","):
+        levels = [int(p) for p in args.processes.split(",")]
+        if name == "memory":
+            # cada processo teria seu próprio dict: não há estado compartilhado a medir
+            levels = [1]
+        report["backends"][name] = {p: _run_level(name, p, args) for p in levels}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark de escrita no read model flow_status.
+
+Compara o caminho antigo (conexão nova + CREATE TABLE + commit por chamada,
+leitura e escrita separadas em `asyncio.to_thread`) com o SQLiteStore
+(pool de leitura + escritor único com group commit em WAL).
+
+Uso:
+    PYTHONPATH=. python benchmarks/bench_flow_status_writes.py --ops 5000 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+# ---------- Caminho antigo (reproduzido para comparação) ----------
+
+def _legacy_connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS flow_status (
+            check_in_id TEXT PRIMARY KEY,
+            status TEXT,
+            data_json TEXT,
+            updated_at TEXT
+        )
+    """)
+    return conn
+
+
+def _legacy_get(path, cid):
+    conn = _legacy_connect(path)
+    try:
+        row = conn.execute("SELECT data_json FROM flow_status WHERE check_in_id = ?", (cid,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+    finally:
+        conn.close()
+
+
+def _legacy_upsert(path, cid, status, data):
+    conn = _legacy_connect(path)
+    try:
+        conn.execute("""
+            INSERT INTO flow_status (check_in_id, status, data_json, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(check_in_id) DO UPDATE SET
+                status=excluded.status,
+                data_json=excluded.data_json,
+                updated_at=excluded.updated_at
+        """, (cid, status, json.dumps(data), datetime.utcnow().isoformat() + "Z"))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+async def _legacy_set_status(path, cid, status, extra):
+    data = await asyncio.to_thread(_legacy_get, path, cid) or {}
+    data.update(extra)
+    await asyncio.to_thread(_legacy_upsert, path, cid, status, data)
+
+
+# ---------- Execução ----------
+
+async def _drive(set_status, ops, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            await set_status(f"cid-{i % 1000}", "checkin_submitted", {"n": i, "vehicleCategory": "carro"})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(ops)))
+    return ops / (time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--synchronous", default="NORMAL")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="flow-bench-")
+    legacy_path = os.path.join(tmp, "legacy.db")
+    os.environ["FLOW_STATUS_DB"] = os.path.join(tmp, "pooled.db")
+    os.environ["FLOW_STATUS_SYNCHRONOUS"] = args.synchronous
+
+    from apps.stream.read_models.flow_status_repo import set_status
+
+    legacy = await _drive(lambda c, s, e: _legacy_set_status(legacy_path, c, s, e), args.ops, args.concurrency)
+    pooled = await _drive(set_status, args.ops, args.concurrency)
+
+    print(json.dumps({
+        "ops": args.ops,
+        "concurrency": args.concurrency,
+        "synchronous": args.synchronous,
+        "legacy_writes_per_s": round(legacy, 1),
+        "pooled_writes_per_s": round(pooled, 1),
+        "speedup": round(pooled / legacy, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
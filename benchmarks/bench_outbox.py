@@ -0,0 +1,186 @@
+"""
+Outbox: injeção de falhas e vazão do relay.
+
+Modo crash (padrão): um processo filho grava fluxos com `set_status(..., outbox=[...])`
+enquanto o relay publica num broker falso, que registra cada eventId entregue num
+arquivo. O filho é derrubado com os._exit em pontos aleatórios (inclusive entre a
+publicação e a marcação como enviada) e reiniciado até terminar. Ao final verifica:
+
+- todo fluxo gravado tem exatamente uma mensagem no outbox (estado + evento atômicos);
+- todo eventId do outbox foi entregue ao menos uma vez (nada perdido);
+- após a deduplicação por eventId do consumer, cada evento é processado uma vez.
+
+Modo throughput: mede o relay publicando em lote (confirms em paralelo) contra a
+publicação uma a uma, com um RTT simulado por publish.
+
+Uso:
+    PYTHONPATH=. python benchmarks/bench_outbox.py --flows 2000 --crash-every-ms 150
+    PYTHONPATH=. python benchmarks/bench_outbox.py --mode throughput --messages 5000 --rtt-ms 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+class FakeBroker:
+    """
+    Registra os eventIds publicados; opcionalmente derruba o processo logo após
+    "publicar" (antes de o relay marcar a linha como enviada)
+    """
+
+    def __init__(self, sink_path: str, rtt_s: float, crash_probability: float = 0.0):
+        self._sink = open(sink_path, "a") if sink_path else None
+        self._rtt_s = rtt_s
+        self._crash_probability = crash_probability
+        self.published = 0
+
+    async def publish(self, payload, routing_key=None, **kwargs):
+        await asyncio.sleep(self._rtt_s)
+        if self._sink:
+            self._sink.write(payload["eventId"] + "\n")
+            self._sink.flush()
+        self.published += 1
+        if random.random() < self._crash_probability:
+            os._exit(137)
+
+
+async def _child(flows: int, sink_path: str, crash_after_s: float):
+    from apps.stream.messaging.outbox import OutgoingMessage, relay
+    from apps.stream.read_models.flow_status_repo import _store, set_status
+
+    loop = asyncio.get_running_loop()
+    loop.call_later(crash_after_s, os._exit, 137)
+
+    existing = set(row[0] for row in _store.read_sync(lambda conn: conn.execute("SELECT check_in_id FROM flow_status").fetchall()))
+    broker = FakeBroker(sink_path, rtt_s=0.001, crash_probability=0.002)
+    await relay.start(broker)
+
+    async def produce(i: int):
+        cid = f"cid-{i:06d}"
+        if cid in existing:
+            return
+        event = {"checkInId": cid, "eventId": f"evt-{i:06d}"}
+        await set_status(cid, "checkin_submitted", {"n": i}, outbox=[OutgoingMessage("bench.outbox.v1", event)])
+
+    for start in range(0, flows, 64):
+        await asyncio.gather(*(produce(i) for i in range(start, min(start + 64, flows))))
+
+    # espera o relay esvaziar o outbox
+    while _store.read_sync(lambda conn: conn.execute("SELECT count(*) FROM outbox WHERE sent_at IS NULL").fetchone()[0]):
+        await asyncio.sleep(0.01)
+    await relay.stop()
+
+
+def run_crash(args):
+    work = tempfile.mkdtemp(prefix="bench-outbox-")
+    db_path = os.path.join(work, "flow_status.db")
+    sink_path = os.path.join(work, "delivered.txt")
+    env = {**os.environ, "FLOW_STATUS_DB": db_path, "PYTHONPATH": str(Path(__file__).parent.parent)}
+
+    crashes = 0
+    started = time.perf_counter()
+    while True:
+        crash_after = random.uniform(0.5, 1.5) * args.crash_every_ms / 1000
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", "--flows", str(args.flows), "--sink", sink_path, "--crash-after", str(crash_after)],
+            env=env,
+        )
+        if proc.returncode == 0:
+            break
+        crashes += 1
+
+    conn = sqlite3.connect(db_path)
+    flows = {row[0] for row in conn.execute("SELECT check_in_id FROM flow_status")}
+    outbox = Counter(json.loads(row[0])["checkInId"] for row in conn.execute("SELECT payload_json FROM outbox"))
+    enqueued = {json.loads(row[0])["eventId"] for row in conn.execute("SELECT payload_json FROM outbox")}
+    with open(sink_path) as f:
+        delivered = Counter(line.strip() for line in f if line.strip())
+
+    report = {
+        "flows": args.flows,
+        "crashes": crashes,
+        "wall_s": round(time.perf_counter() - started, 2),
+        "flows_written": len(flows),
+        "flows_without_event": len(flows - set(outbox)),
+        "events_without_flow": len(set(outbox) - flows),
+        "flows_with_duplicate_event": sum(1 for n in outbox.values() if n > 1),
+        "events_lost": len(enqueued - set(delivered)),
+        "raw_redeliveries": sum(delivered.values()) - len(delivered),
+        "processed_after_dedup": len(delivered),
+    }
+    print(json.dumps(report, indent=2))
+    ok = (
+        report["flows_written"] == args.flows
+        and not report["flows_without_event"]
+        and not report["events_without_flow"]
+        and not report["flows_with_duplicate_event"]
+        and not report["events_lost"]
+        and report["processed_after_dedup"] == args.flows
+    )
+    sys.exit(0 if ok else 1)
+
+
+async def run_throughput(args):
+    from apps.stream.messaging.outbox import OutgoingMessage, relay
+    from apps.stream.read_models.flow_status_repo import _store
+
+    messages = [OutgoingMessage("bench.outbox.v1", {"checkInId": f"cid-{i}", "eventId": f"evt-{i}"}) for i in range(args.messages)]
+
+    broker = FakeBroker("", rtt_s=args.rtt_ms / 1000)
+    t0 = time.perf_counter()
+    for message in messages:
+        await broker.publish(message.payload, routing_key=message.routing_key)
+    sequential = args.messages / (time.perf_counter() - t0)
+
+    broker = FakeBroker("", rtt_s=args.rtt_ms / 1000)
+    await relay.enqueue(messages)
+    t0 = time.perf_counter()
+    await relay.start(broker)
+    while relay.published < args.messages:
+        await asyncio.sleep(0.001)
+    relayed = args.messages / (time.perf_counter() - t0)
+    await relay.stop()
+
+    print(json.dumps({
+        "messages": args.messages,
+        "rtt_ms": args.rtt_ms,
+        "sequential_publish_per_s": round(sequential),
+        "outbox_relay_per_s": round(relayed),
+        "speedup": round(relayed / sequential, 1),
+    }, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["crash", "throughput"], default="crash")
+    parser.add_argument("--flows", type=int, default=2000)
+    parser.add_argument("--crash-every-ms", type=float, default=150)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--rtt-ms", type=float, default=2.0)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--sink", help=argparse.SUPPRESS)
+    parser.add_argument("--crash-after", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(_child(args.flows, args.sink, args.crash_after))
+    elif args.mode == "crash":
+        run_crash(args)
+    else:
+        os.environ.setdefault("FLOW_STATUS_DB", os.path.join(tempfile.mkdtemp(prefix="bench-outbox-"), "flow_status.db"))
+        asyncio.run(run_throughput(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark de escalabilidade do worker particionado.
+
+Simula N processos consumindo as partições `crc32(checkInId) % N` de um mesmo
+fluxo de mensagens. Cada mensagem passa por decode/encode JSON, reserva e
+liberação no SpotInventory e um upsert SQLite no arquivo da partição, na ordem
+de chegada dentro da partição. Mede mensagens/s para N = 1..--max-workers.
+
+Uso:
+    PYTHONPATH=. python benchmarks/bench_partitioned_workers.py --messages 40000 --max-workers 8
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def _worker(partition, partitions, messages, db_dir, start, done):
+    from apps.stream.inventory.spot_inventory import SpotInventory
+    from apps.stream.messaging.partitioning import partition_of
+
+    inventory = SpotInventory.from_layout(4, ["carro", "suv"], 250)
+    conn = sqlite3.connect(os.path.join(db_dir, f"p{partition}.db"), isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("CREATE TABLE IF NOT EXISTS flow_status (check_in_id TEXT PRIMARY KEY, status TEXT, data_json TEXT)")
+
+    owned = [
+        json.dumps({"checkInId": f"cid-{i}", "vehicleCategory": "carro", "licensePlate": "ABC1234"})
+        for i in range(messages)
+        if partition_of(f"cid-{i}", partitions) == partition
+    ]
+    start.wait()
+    t0 = time.perf_counter()
+    conn.execute("BEGIN")
+    for n, raw in enumerate(owned):
+        msg = json.loads(raw)
+        cid = msg["checkInId"]
+        spot = inventory.reserve_any(msg["vehicleCategory"], cid, time.time() + 300)
+        conn.execute(
+            "INSERT INTO flow_status VALUES (?, ?, ?) ON CONFLICT(check_in_id) DO UPDATE SET status=excluded.status, data_json=excluded.data_json",
+            (cid, "spot_reserved", json.dumps({**msg, "spot": spot})),
+        )
+        inventory.release(spot["spotId"], cid)
+        if n % 500 == 499:
+            conn.execute("COMMIT")
+            conn.execute("BEGIN")
+    conn.execute("COMMIT")
+    done.put(time.perf_counter() - t0)
+
+
+def run(partitions, messages):
+    db_dir = tempfile.mkdtemp(prefix=f"partitions-{partitions}-")
+    ctx = mp.get_context("spawn")
+    start = ctx.Barrier(partitions + 1)
+    done = ctx.Queue()
+    procs = [
+        ctx.Process(target=_worker, args=(k, partitions, messages, db_dir, start, done))
+        for k in range(partitions)
+    ]
+    for proc in procs:
+        proc.start()
+    start.wait()
+    elapsed = max(done.get() for _ in procs)
+    for proc in procs:
+        proc.join()
+    return messages / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=40000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    results = []
+    baseline = None
+    for partitions in range(1, args.max_workers + 1):
+        rate = run(partitions, args.messages)
+        baseline = baseline or rate
+        results.append({
+            "workers": partitions,
+            "messages_per_s": round(rate, 1),
+            "scaling_efficiency": round(rate / (baseline * partitions), 2),
+        })
+    print(json.dumps({"messages": args.messages, "cpu_count": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
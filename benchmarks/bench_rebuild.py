@@ -0,0 +1,77 @@
+"""
+Benchmark da reconstrução do read model a partir do log de eventos.
+
+Gera um log sintético (checkin.submitted -> spot.consult.requested ->
+spot.consult.completed -> spot.reserved por fluxo) e mede a reconstrução
+completa com 1..--max-workers processos, além da reconstrução incremental a
+partir de um snapshot com uma cauda de --tail-flows fluxos novos.
+
+Uso:
+    PYTHONPATH=. python benchmarks/bench_rebuild.py --flows 100000 --max-workers 8
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+WORK_DIR = tempfile.mkdtemp(prefix="bench-rebuild-")
+os.environ["EVENT_LOG_DIR"] = os.path.join(WORK_DIR, "eventlog")
+os.environ["FLOW_STATUS_DB"] = os.path.join(WORK_DIR, "flow_status.db")
+os.environ["FLOW_SNAPSHOT_DIR"] = os.path.join(WORK_DIR, "snapshots")
+
+from core.config import settings
+from apps.stream.messaging import topic
+from apps.stream.messaging.event_log import SegmentedEventLog
+from apps.stream.read_models.rebuild import rebuild
+
+SPOTS = [{"spotId": f"L1-CAR-{n:03d}", "level": "1", "position": f"A{n}", "isAvailable": True, "reservedUntil": None} for n in range(1, 21)]
+
+
+def write_flows(log: SegmentedEventLog, first: int, count: int):
+    for i in range(first, first + count):
+        cid = f"cid-{i:08d}"
+        for routing_key, event in (
+            (topic.CHECKIN_SUBMITTED, {"checkInId": cid, "vehicleCategory": "carro", "licensePlate": "ABC1234", "eventId": f"{i:032x}"}),
+            (topic.SPOT_CONSULT_REQUESTED, {"checkInId": cid, "vehicleCategory": "carro"}),
+            (topic.SPOT_CONSULT_COMPLETED, {"checkInId": cid, "vehicleCategory": "carro", "spotsVersion": 1 + i // 20, "totalAvailable": 20}),
+            (topic.SPOT_RESERVED, {"checkInId": cid, "spot": {**SPOTS[i % 20], "isAvailable": False}}),
+        ):
+            log.append(routing_key, json.dumps(event).encode())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flows", type=int, default=100_000)
+    parser.add_argument("--tail-flows", type=int, default=1000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    log = SegmentedEventLog(settings.EVENT_LOG_DIR, settings.EVENT_LOG_SEGMENT_BYTES, settings.EVENT_LOG_INDEX_INTERVAL_BYTES)
+    write_flows(log, 0, args.flows)
+
+    try:
+        full = []
+        for workers in sorted({1, 2, 4, args.max_workers} & set(range(1, args.max_workers + 1))):
+            report = rebuild(workers, from_scratch=True)
+            full.append({k: report[k] for k in ("workers", "events", "flows_changed", "replay_s", "wall_s", "events_per_s")})
+
+        write_flows(log, args.flows, args.tail_flows)
+        log.close()
+        incremental = rebuild(args.max_workers)
+        print(json.dumps({
+            "flows": args.flows,
+            "cpu_count": os.cpu_count(),
+            "full_rebuild": full,
+            "incremental": {k: incremental[k] for k in ("workers", "events", "flows_changed", "replay_s", "wall_s", "events_per_s")},
+        }, indent=2))
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark da retenção da flow_status ao longo de meses simulados de tráfego.
+
+Dois arquivos recebem o mesmo tráfego diário de fluxos terminados (inseridos
+direto com as colunas e triggers reais, com a data do dia simulado): um sem
+retenção e outro com a passada de retenção ao fim de cada dia (relógio
+simulado). A cada `--sample-every` dias mede, nos dois, o tamanho do arquivo,
+as linhas na tabela quente e a latência das operações do read model: leitura
+por checkInId, transição (patch), página da listagem por status e a
+recontagem completa dos contadores; no lado com retenção, também a leitura de
+um fluxo arquivado.
+
+Uso:
+    PYTHONPATH=. python benchmarks/bench_retention.py --days 120 --flows-per-day 3000 --retention-days 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+WORK_DIR = tempfile.mkdtemp(prefix="bench-retention-")
+os.environ.setdefault("FLOW_STATUS_DB", os.path.join(WORK_DIR, "flow_status.db"))
+
+from core.db import get_store
+from apps.stream.read_models.archive import FlowArchive
+from apps.stream.read_models.backends import HOT_COLUMNS, SQLiteBackend, encode_flow_data, hot_columns
+from apps.stream.read_models.retention import Retention
+
+DAY_MS = 86400 * 1000
+# (status, fração do tráfego); os concluídos já liberaram a vaga (o carro saiu)
+MIX = [("robot_assigned", 0.83), ("reservation_expired", 0.12), ("checkin_failed", 0.05)]
+INSERT = (
+    f"INSERT INTO flow_status (check_in_id, status, data_json, updated_at, version, updated_ms, {', '.join(HOT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * (6 + len(HOT_COLUMNS)))})"
+)
+
+
+def _day_rows(day_ms: int, flows: int, rng: random.Random):
+    rows = []
+    for _ in range(flows):
+        cid = str(uuid.uuid4())
+        status = rng.choices([s for s, _ in MIX], [w for _, w in MIX])[0]
+        data = {
+            "checkInId": cid, "vehicleCategory": "carro", "licensePlate": f"BEN{rng.randrange(10**7):07d}",
+            "eventId": uuid.uuid4().hex, "spotsVersion": rng.randrange(10**6), "spot": None,
+            "robot": {"robotId": "R1-01", "level": "1", "position": "A1"} if status == "robot_assigned" else None,
+        }
+        updated_ms = day_ms + rng.randrange(DAY_MS)
+        hot = hot_columns(data)
+        rows.append((cid, status, encode_flow_data(data), f"{updated_ms}", 5, updated_ms, *(hot.get(name) for name in HOT_COLUMNS)))
+    return rows
+
+
+def _insert(conn, rows):
+    conn.executemany(INSERT, rows)
+
+
+def _db_mb(path: str) -> float:
+    return round(sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p)) / 1e6, 2)
+
+
+async def _timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+async def _sample(backend: SQLiteBackend, path: str, recent_ids, repeat: int, rng: random.Random) -> dict:
+    hot_rows = sum((await backend.counters()).by_status.values())
+
+    async def patch():
+        await backend.patch(str(uuid.uuid4()), "checkin_submitted", {"vehicleCategory": "carro"}, 0, (), None)
+
+    return {
+        "hot_rows": hot_rows,
+        "db_mb": _db_mb(path),
+        "get_ms": await _timed(lambda: backend.get(rng.choice(recent_ids)), repeat),
+        "patch_ms": await _timed(patch, repeat),
+        "list_ms": await _timed(lambda: backend.list_flows("robot_assigned", None, None, None, False, 100), repeat),
+        "recount_ms": await _timed(lambda: backend.reconcile_counters(False), 3),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--flows-per-day", type=int, default=3000)
+    parser.add_argument("--retention-days", type=float, default=30)
+    parser.add_argument("--sample-every", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    plain_path = os.path.join(WORK_DIR, "plain.db")
+    kept_path = os.path.join(WORK_DIR, "retained.db")
+    plain, kept = SQLiteBackend(get_store(plain_path)), SQLiteBackend(get_store(kept_path))
+    archive = FlowArchive(os.path.join(WORK_DIR, "archive"))
+    retention = Retention(kept, archive, days=args.retention_days, batch=500, pause_ms=0, vacuum_pages=2000)
+
+    rng = random.Random(42)
+    start_ms = int(time.time() * 1000) - args.days * DAY_MS
+    samples, first_ids, retention_s = [], [], 0.0
+    for day in range(args.days):
+        day_ms = start_ms + day * DAY_MS
+        rows = _day_rows(day_ms, args.flows_per_day, rng)
+        await plain.store.write(_insert, rows)
+        await kept.store.write(_insert, rows)
+
+        # fluxos do primeiro dia: arquivados depois de retention-days
+        first_ids = first_ids or [row[0] for row in rows[:200]]
+
+        started = time.perf_counter()
+        await retention.run(now_ms=day_ms + DAY_MS)
+        retention_s += time.perf_counter() - started
+        if (day + 1) % args.sample_every == 0:
+            recent_ids = [row[0] for row in rows]
+            entry = {
+                "day": day + 1,
+                "without_retention": await _sample(plain, plain_path, recent_ids, args.repeat, rng),
+                "with_retention": await _sample(kept, kept_path, recent_ids, args.repeat, rng),
+            }
+            if day + 1 > args.retention_days:
+                entry["with_retention"]["archive_get_ms"] = await _timed(lambda: archive.get(rng.choice(first_ids)), args.repeat)
+            samples.append(entry)
+            print(json.dumps(entry), file=sys.stderr)
+
+    print(json.dumps({
+        "days": args.days,
+        "flows_per_day": args.flows_per_day,
+        "retention_days": args.retention_days,
+        "retention_s_total": round(retention_s, 2),
+        "samples": samples,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
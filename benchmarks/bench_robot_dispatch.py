@@ -0,0 +1,141 @@
+"""
+Designação de robôs: lote com emparelhamento de custo mínimo x guloso evento a evento.
+
+Para cada tamanho de lote gera pedidos em vagas aleatórias de --levels níveis e
+uma frota com um robô livre por pedido (--robot-ratio), em posições aleatórias
+(onde terminaram a tarefa anterior). Compara:
+
+- greedy: cada pedido, na ordem de chegada, leva o robô livre mais próximo;
+- batch: RobotDispatcher.plan() resolve o lote inteiro por nível.
+
+Reporta o tempo de solução e a distância total percorrida (casas do grid).
+
+Uso:
+    PYTHONPATH=. python benchmarks/bench_robot_dispatch.py --sizes 10,50,100,500,1000,5000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+os.environ.setdefault("FLOW_STATUS_DB", os.path.join(tempfile.mkdtemp(prefix="bench-dispatch-"), "flow_status.db"))
+
+import numpy as np
+
+from apps.stream.inventory.robot_dispatch import RobotDispatcher, travel_costs
+from apps.stream.inventory.robot_fleet import RobotFleet
+from apps.stream.inventory.spot_inventory import grid_label, grid_position
+
+ROWS, COLS = 10, 10
+
+
+def make_case(size: int, levels: int, robot_ratio: float, rng: np.random.Generator):
+    requests = []
+    for i in range(size):
+        level = int(rng.integers(1, levels + 1))
+        position = grid_label(int(rng.integers(ROWS)), int(rng.integers(COLS)))
+        requests.append({
+            "checkInId": f"cid-{i:06d}",
+            "eventId": f"evt-{i:06d}",
+            "spot": {"spotId": f"L{level}-CAR-{i:06d}", "level": str(level), "position": position},
+        })
+    robots = []
+    per_level = max(1, int(np.ceil(size * robot_ratio / levels)))
+    for level in range(1, levels + 1):
+        for n in range(per_level):
+            robots.append((f"R{level}-{n + 1:04d}", level, grid_label(int(rng.integers(ROWS)), int(rng.integers(COLS)))))
+    return requests, robots
+
+
+def make_fleet(robots) -> RobotFleet:
+    fleet = RobotFleet()
+    for robot_id, level, position in robots:
+        fleet.add_robot(robot_id, level, position)
+    return fleet
+
+
+def greedy(requests, robots):
+    """
+    Um pedido por vez: robô livre mais próximo do mesmo nível
+    """
+    by_level = {}
+    for robot_id, level, position in robots:
+        xy, free = by_level.setdefault(level, ([], []))
+        xy.append(grid_position(position))
+        free.append(True)
+    arrays = {level: (np.array(xy, dtype=np.int64), np.array(free)) for level, (xy, free) in by_level.items()}
+
+    total, assigned = 0.0, 0
+    for request in requests:
+        spot = request["spot"]
+        robot_xy, free = arrays[int(spot["level"])]
+        if not free.any():
+            continue
+        dist = travel_costs(robot_xy, np.array([grid_position(spot["position"])], dtype=np.int64))[:, 0]
+        dist[~free] = np.inf
+        best = int(np.argmin(dist))
+        free[best] = False
+        total += dist[best]
+        assigned += 1
+    return total, assigned
+
+
+def batched(requests, robots):
+    fleet = make_fleet(robots)
+    dispatcher = RobotDispatcher(fleet, window_s=0.05, max_batch=len(requests), max_wait_s=3600, task_s=60)
+    now = time.time()
+    for request in requests:
+        dispatcher.submit(request, now)
+    start_xy = {robot_id: fleet.position(robot_id) for robot_id, _, _ in robots}
+
+    t0 = time.perf_counter()
+    replies = dispatcher.plan(now)
+    elapsed = time.perf_counter() - t0
+
+    total, assigned = 0.0, 0
+    for request, robot in replies:
+        if robot is None:
+            continue
+        (r0, c0), (r1, c1) = start_xy[robot["robotId"]], grid_position(request["spot"]["position"])
+        total += abs(r0 - r1) + abs(c0 - c1)
+        assigned += 1
+    return total, assigned, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,50,100,500,1000,5000")
+    parser.add_argument("--levels", type=int, default=4)
+    parser.add_argument("--robot-ratio", type=float, default=1.0, help="robôs livres por pedido")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        requests, robots = make_case(size, args.levels, args.robot_ratio, rng)
+        t0 = time.perf_counter()
+        greedy_travel, greedy_assigned = greedy(requests, robots)
+        greedy_s = time.perf_counter() - t0
+        batch_travel, batch_assigned, batch_s = batched(requests, robots)
+        results.append({
+            "batch": size,
+            "robots": len(robots),
+            "greedy_ms": round(greedy_s * 1000, 2),
+            "batch_ms": round(batch_s * 1000, 2),
+            "greedy_assigned": greedy_assigned,
+            "batch_assigned": batch_assigned,
+            "greedy_travel_per_robot": round(greedy_travel / max(greedy_assigned, 1), 2),
+            "batch_travel_per_robot": round(batch_travel / max(batch_assigned, 1), 2),
+            "travel_saved_pct": round(100 * (1 - batch_travel / greedy_travel), 1) if greedy_travel else 0.0,
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Saga do check-in: muitas sagas simultâneas num único worker.
+
+Inicia --sagas sagas de uma vez contra um broker falso que responde a cada
+comando após --rtt-ms. Uma fração --drop das respostas é descartada, e esses
+passos só avançam por timeout e nova tentativa. Na metade, o motor é parado e
+um motor novo retoma as sagas do banco, como numa queda do worker.
+
+Reporta sagas/s, timeouts e novas tentativas, pico de memória Python
+(--trace-memory) e quantas tarefas asyncio existiam com todas as sagas ativas.
+Esse número não acompanha --sagas: nenhuma saga tem coroutine própria esperando.
+
+Uso:
+    PYTHONPATH=. python benchmarks/bench_saga.py --sagas 20000 --drop 0.01
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+WORK_DIR = tempfile.mkdtemp(prefix="bench-saga-")
+os.environ["FLOW_STATUS_DB"] = os.path.join(WORK_DIR, "flow_status.db")
+os.environ.setdefault("ORCHESTRATOR_CONSULT_DELAY_S", "0")
+os.environ.setdefault("ORCHESTRATOR_RESERVE_DELAY_S", "0")
+os.environ.setdefault("ORCHESTRATOR_ROBOT_DELAY_S", "0")
+# prazo curto demais para a carga gera uma tempestade de novas tentativas; ajuste pelo ambiente
+os.environ.setdefault("SAGA_STEP_TIMEOUT_S", "30")
+os.environ.setdefault("SAGA_BACKOFF_S", "0.2")
+
+from core.db import flow_stores
+from apps.stream.messaging import topic
+from apps.stream.messaging.outbox import relay
+from apps.stream.messaging.partitioning import base_topic
+from apps.stream.saga.checkin_saga import CHECKIN_SAGA
+from apps.stream.saga.engine import SagaEngine, saga_counts
+
+SPOT = {"spotId": "L1-CAR-001", "level": "1", "position": "A1", "isAvailable": False, "reservedUntil": None}
+REPLIES = {
+    topic.SPOT_CONSULT_REQUESTED: (topic.SPOT_CONSULT_COMPLETED, {"spotsVersion": 1, "totalAvailable": 1}),
+    topic.SPOT_RESERVE_REQUESTED: (topic.SPOT_RESERVED, {"spot": SPOT}),
+    topic.ROBOT_ASSIGN_REQUESTED: (topic.ROBOT_ASSIGNED, {"robot": {"robotId": "R1-01", "level": "1", "busyUntil": None}}),
+}
+
+
+class FakeBroker:
+    """
+    Responde aos comandos da saga após um RTT simulado; descarta uma fração das respostas
+    """
+
+    def __init__(self, rtt_s: float, drop: float):
+        self.engine = None
+        self._rtt_s = rtt_s
+        self._drop = drop
+        # respostas retidas enquanto o motor está "fora do ar" (como mensagens não confirmadas)
+        self._held = []
+
+    async def publish(self, payload, routing_key=None, **kwargs):
+        reply = REPLIES.get(base_topic(routing_key))
+        if reply is None or random.random() < self._drop:
+            return
+        reply_topic, result = reply
+        loop = asyncio.get_running_loop()
+        loop.call_later(self._rtt_s, self._reply, reply_topic, {"checkInId": payload["checkInId"], **result})
+
+    def _reply(self, reply_topic, event):
+        if self.engine is None:
+            self._held.append((reply_topic, event))
+            return
+        asyncio.ensure_future(self.engine.on_reply(reply_topic, event))
+
+    def resume(self, engine):
+        self.engine = engine
+        held, self._held = self._held, []
+        for reply_topic, event in held:
+            asyncio.ensure_future(engine.on_reply(reply_topic, event))
+
+
+async def wait_until(predicate, timeout_s: float):
+    deadline = time.monotonic() + timeout_s
+    while not predicate() and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+
+
+async def run(args):
+    broker = FakeBroker(args.rtt_ms / 1000, args.drop)
+    engine = broker.engine = SagaEngine(CHECKIN_SAGA, flow_stores())
+    await engine.start()
+    await relay.start(broker)
+
+    if args.trace_memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    events = [{"checkInId": f"cid-{i:08d}", "vehicleCategory": "carro", "licensePlate": "ABC1234"} for i in range(args.sagas)]
+    for start in range(0, args.sagas, 512):
+        await asyncio.gather(*(engine.begin(e) for e in events[start:start + 512]))
+    started_s = time.perf_counter() - t0
+    peak_active = len(engine)
+    # sagas esperando resposta não ocupam tarefas: só o timer do motor, o relay e as respostas em voo
+    tasks_at_peak = len(asyncio.all_tasks())
+
+    # queda no meio do caminho: um motor novo retoma as sagas a partir do banco
+    await wait_until(lambda: engine.completed >= args.sagas // 2, args.timeout_s)
+    broker.engine = None
+    await engine.stop()
+    await asyncio.sleep(0.2)  # handlers já em execução no motor antigo terminam
+    before = engine.stats()
+    resumed = SagaEngine(CHECKIN_SAGA, flow_stores())
+    await resumed.start()
+    resumed_active = len(resumed)
+    broker.resume(resumed)
+
+    await wait_until(lambda: not len(resumed), args.timeout_s)
+    wall_s = time.perf_counter() - t0
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    await resumed.stop()
+    await relay.stop()
+
+    after = resumed.stats()
+    counts = (await saga_counts()).get(CHECKIN_SAGA.name, {})
+    print(json.dumps({
+        "sagas": args.sagas,
+        "rtt_ms": args.rtt_ms,
+        "drop": args.drop,
+        "begin_per_s": round(args.sagas / started_s),
+        "peak_active": peak_active,
+        "resumed_after_restart": resumed_active,
+        "completed": counts.get("completed", 0),
+        "failed": counts.get("failed", 0),
+        "still_running": sum(v for k, v in counts.items() if k.startswith("running")),
+        "timeouts": before["timeouts"] + after["timeouts"],
+        "retries": before["retries"] + after["retries"],
+        "sagas_per_s": round(args.sagas / wall_s),
+        "wall_s": round(wall_s, 2),
+        "peak_python_mb": round(peak_bytes / 2 ** 20, 1) if args.trace_memory else None,
+        "asyncio_tasks_at_peak": tasks_at_peak,
+    }, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sagas", type=int, default=20000)
+    parser.add_argument("--rtt-ms", type=float, default=5.0)
+    parser.add_argument("--drop", type=float, default=0.01, help="fração de respostas perdidas (forçam timeout)")
+    parser.add_argument("--timeout-s", type=float, default=300.0)
+    parser.add_argument("--trace-memory", action="store_true", help="mede o pico de memória (tracemalloc deixa tudo ~3x mais lento)")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
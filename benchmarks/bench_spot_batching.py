@@ -0,0 +1,97 @@
+"""
+Consulta e reserva de vagas em micro-lotes: latência x vazão por configuração.
+
+Para cada configuração N:T (N mensagens por lote, janela de T ms) passa
+--messages check-ins pela consulta e depois pela reserva, com --inflight
+mensagens em voo (o prefetch do canal), chamando os mesmos handlers de lote
+dos consumers. N=1 é o modo antigo: uma transação e um evento por mensagem.
+
+Reporta msgs/s e latência p50/p99 de cada fase (entrega da mensagem até o
+commit do lote em que ela entrou) e o tamanho médio dos lotes. Com --inflight 1
+(carga baixa) aparece o custo da janela: cada mensagem espera T ms sozinha.
+
+Uso:
+    PYTHONPATH=. python benchmarks/bench_spot_batching.py --messages 5000 --configs 1:0,8:2,32:5,128:10
+    PYTHONPATH=. python benchmarks/bench_spot_batching.py --messages 300 --inflight 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+CATEGORIES = ["carro", "sedan", "hatch", "suv", "picape", "caminhonete"]
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def drive(batcher, msgs, inflight: int):
+    latencies = []
+    gate = asyncio.Semaphore(inflight)
+
+    async def one(msg):
+        async with gate:
+            t0 = time.perf_counter()
+            await batcher.submit(msg)
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(m) for m in msgs))
+    wall_s = time.perf_counter() - t0
+    return {
+        "msgs_per_s": round(len(msgs) / wall_s),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "mean_batch": batcher.stats()["mean_batch"],
+    }
+
+
+async def run(args):
+    from apps.stream.consumers.spot_consumer import _consult_batch, _reserve_batch
+    from apps.stream.messaging.batching import MicroBatcher
+
+    results = []
+    for n, config in enumerate(args.configs.split(",")):
+        max_items, window_ms = config.split(":")
+        msgs = [
+            {"checkInId": f"cid-{n}-{i:06d}", "eventId": f"evt-{n}-{i:06d}", "vehicleCategory": random.choice(CATEGORIES)}
+            for i in range(args.messages)
+        ]
+        consult = MicroBatcher("bench-consult", _consult_batch, int(max_items), float(window_ms))
+        reserve = MicroBatcher("bench-reserve", _reserve_batch, int(max_items), float(window_ms))
+        results.append({
+            "max_items": int(max_items),
+            "window_ms": float(window_ms),
+            "consult": await drive(consult, msgs, args.inflight),
+            "reserve": await drive(reserve, msgs, args.inflight),
+        })
+    print(json.dumps({"messages": args.messages, "inflight": args.inflight, "results": results}, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--configs", default="1:0,8:2,32:5,128:10", help="N:T separados por vírgula")
+    parser.add_argument("--inflight", type=int, default=128, help="mensagens em voo (prefetch)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench-spot-batch-")
+    os.environ["FLOW_STATUS_DB"] = os.path.join(work_dir, "flow_status.db")
+    # vagas suficientes para todas as reservas de todas as configurações
+    per_level = args.messages * len(args.configs.split(",")) // len(CATEGORIES) + args.messages
+    os.environ.setdefault("SPOTS_PER_LEVEL_PER_CATEGORY", str(per_level))
+    random.seed(7)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+import asyncio
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from core.config import settings
+
+_SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+_STOP = object()
+
+
+class _SchemaOp:
+    """
+    DDL registrado depois do escritor iniciado: roda fora do group commit
+    """
+
+    __slots__ = ("fn", "done")
+
+    def __init__(self, fn: Callable[[sqlite3.Connection], None], done: Callable[[Any, Optional[BaseException]], None]):
+        self.fn = fn
+        self.done = done
+
+
+class SQLiteStore:
+    """
+    Acesso ao SQLite com conexões de longa duração.
+
+    - Leituras usam um pool de conexões reaproveitadas (modo WAL permite
+      leitores concorrentes com o escritor).
+    - Escritas passam por uma única thread escritora, que agrupa as operações
+      pendentes numa só transação por janela de flush (group commit).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        pool_size: int = 4,
+        synchronous: str = "NORMAL",
+        flush_ms: float = 2.0,
+        max_batch: int = 512,
+    ):
+        synchronous = synchronous.upper()
+        if synchronous not in _SYNCHRONOUS_LEVELS:
+            raise ValueError(f"Nível de durabilidade inválido: {synchronous}")
+
+        self.path = path
+        self.pool_size = pool_size
+        self.synchronous = synchronous
+        self.flush_s = max(flush_ms, 0.0) / 1000
+        self.max_batch = max_batch
+
+        self._schema: List[Callable[[sqlite3.Connection], None]] = []
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._writes: "queue.Queue[Any]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    # ---------- Conexões ----------
+
+    def _open(self) -> sqlite3.Connection:
+        # isolation_level=None: transações controladas explicitamente
+        conn = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        # só vale em arquivo novo (antes do WAL e da primeira tabela): páginas liberadas
+        # por remoções voltam ao SO com incremental_vacuum. Bases antigas precisam de um VACUUM
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        return conn
+
+    def add_schema(self, fn: Callable[[sqlite3.Connection], None]) -> Callable[[sqlite3.Connection], None]:
+        """
+        Registra uma função de DDL, executada uma única vez pela conexão escritora.
+
+        Roda sempre em autocommit, fora das transações de grupo: a função pode
+        abrir e fechar a sua própria (BEGIN IMMEDIATE ... COMMIT). Registrada
+        depois do escritor iniciado, entra na fila entre dois lotes e a chamada
+        aguarda a execução.
+        """
+        with self._lock:
+            if self._writer is None:
+                self._schema.append(fn)
+                return fn
+        fut: Future = Future()
+
+        def done(result: Any, exc: Optional[BaseException]):
+            if exc is not None:
+                fut.set_exception(exc)
+            else:
+                fut.set_result(result)
+
+        self._writes.put(_SchemaOp(fn, done))
+        fut.result()
+        return fn
+
+    def _ensure_started(self):
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is not None:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = self._open()
+            for fn in self._schema:
+                fn(conn)
+            self._writer_conn = conn
+            self._writer = threading.Thread(
+                target=self._writer_loop, name=f"sqlite-writer:{self.path}", daemon=True
+            )
+            self._writer.start()
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        self._ensure_started()
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._open()
+        try:
+            yield conn
+        finally:
+            if self._pool.qsize() < self.pool_size:
+                self._pool.put(conn)
+            else:
+                conn.close()
+
+    # ---------- Leitura ----------
+
+    def read_sync(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self.reader() as conn:
+            return fn(conn, *args)
+
+    async def read(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.to_thread(self.read_sync, fn, *args)
+
+    # ---------- Escrita (group commit) ----------
+
+    def _submit(self, fn: Callable[..., Any], args: tuple, done: Callable[[Any, Optional[BaseException]], None]):
+        self._ensure_started()
+        self._writes.put((fn, args, done))
+
+    def write_sync(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Executa `fn(conn, *args)` dentro da próxima transação do escritor e aguarda o commit
+        """
+        fut: Future = Future()
+
+        def done(result: Any, exc: Optional[BaseException]):
+            if exc is not None:
+                fut.set_exception(exc)
+            else:
+                fut.set_result(result)
+
+        self._submit(fn, args, done)
+        return fut.result()
+
+    async def write(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Versão assíncrona de `write_sync`: não ocupa threads do loop enquanto aguarda o commit
+        """
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+
+        def resolve(result: Any, exc: Optional[BaseException]):
+            if fut.done():
+                return
+            if exc is not None:
+                fut.set_exception(exc)
+            else:
+                fut.set_result(result)
+
+        def done(result: Any, exc: Optional[BaseException]):
+            try:
+                loop.call_soon_threadsafe(resolve, result, exc)
+            except RuntimeError:
+                # loop já encerrado; não há quem aguarde o resultado
+                pass
+
+        self._submit(fn, args, done)
+        return await fut
+
+    def _collect(self, first: Any) -> Tuple[List[Any], Any]:
+        """
+        Junta as escritas da janela de flush. Devolve o lote e o item que o
+        encerrou fora de ordem (parada ou DDL), a tratar depois do commit
+        """
+        batch = [first]
+        deadline = time.monotonic() + self.flush_s
+        while len(batch) < self.max_batch:
+            try:
+                item = self._writes.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._writes.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is _STOP or isinstance(item, _SchemaOp):
+                # parada e DDL ficam para depois do commit deste lote
+                return batch, item
+            batch.append(item)
+        return batch, None
+
+    def _commit(self, conn: sqlite3.Connection, batch: List[Any]):
+        results = []
+        conn.execute("BEGIN IMMEDIATE")
+        for fn, args, done in batch:
+            # savepoint por operação: uma falha não derruba o lote inteiro
+            conn.execute("SAVEPOINT op")
+            try:
+                result = fn(conn, *args)
+            except Exception as exc:
+                conn.execute("ROLLBACK TO op")
+                conn.execute("RELEASE op")
+                results.append((done, None, exc))
+            else:
+                conn.execute("RELEASE op")
+                results.append((done, result, None))
+        try:
+            conn.execute("COMMIT")
+        except Exception as exc:
+            conn.execute("ROLLBACK")
+            results = [(done, None, exc) for done, _, _ in results]
+
+        for done, result, exc in results:
+            done(result, exc)
+
+    def _apply_schema(self, conn: sqlite3.Connection, op: _SchemaOp):
+        try:
+            op.fn(conn)
+        except Exception as exc:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            op.done(None, exc)
+        else:
+            op.done(None, None)
+
+    def _writer_loop(self):
+        conn = self._writer_conn
+        item = None
+        while True:
+            if item is None:
+                item = self._writes.get()
+            if item is _STOP:
+                break
+            if isinstance(item, _SchemaOp):
+                self._apply_schema(conn, item)
+                item = None
+                continue
+            batch, item = self._collect(item)
+            try:
+                self._commit(conn, batch)
+            except Exception as exc:
+                for _, _, done in batch:
+                    done(None, exc)
+        conn.close()
+
+    # ---------- Encerramento ----------
+
+    def close(self):
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._writes.put(_STOP)
+            writer.join()
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_stores: Dict[str, SQLiteStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path: Optional[str] = None) -> SQLiteStore:
+    """
+    Devolve o SQLiteStore compartilhado para `path` (padrão: FLOW_STATUS_DB)
+    """
+    path = path or settings.FLOW_STATUS_DB
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = SQLiteStore(
+                path,
+                pool_size=settings.FLOW_STATUS_POOL_SIZE,
+                synchronous=settings.FLOW_STATUS_SYNCHRONOUS,
+                flush_ms=settings.FLOW_STATUS_FLUSH_MS,
+                max_batch=settings.FLOW_STATUS_MAX_BATCH,
+            )
+            _stores[path] = store
+        return store
+
+
+@atexit.register
+def close_stores():
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
+
+
+# ---------- Fluxos: um ou vários arquivos ----------
+
+def shard_of(key: str, shards: int) -> int:
+    # crc32 é estável entre processos (hash() do Python não é)
+    return zlib.crc32(key.encode("utf-8")) % shards
+
+
+class StoreGroup:
+    """
+    Stores que guardam os fluxos. Cada checkInId pertence a um único store (por
+    hash), que recebe na mesma transação o fluxo, a saga e as mensagens do outbox.
+    Com um só store, é o FLOW_STATUS_DB.
+    """
+
+    def __init__(self, stores: Sequence[SQLiteStore]):
+        self.stores = list(stores)
+
+    def __len__(self):
+        return len(self.stores)
+
+    def __iter__(self) -> Iterator[SQLiteStore]:
+        return iter(self.stores)
+
+    def for_key(self, key: str) -> SQLiteStore:
+        if len(self.stores) == 1:
+            return self.stores[0]
+        return self.stores[shard_of(key, len(self.stores))]
+
+    def add_schema(self, fn: Callable[[sqlite3.Connection], None]) -> Callable[[sqlite3.Connection], None]:
+        for store in self.stores:
+            store.add_schema(fn)
+        return fn
+
+
+def flow_store_paths() -> List[str]:
+    """
+    Arquivos dos fluxos: FLOW_STATUS_DB ou, no backend `sharded`, FLOW_STATUS_SHARDS
+    arquivos ao lado dele (`flow_status.shard0.db`, ...)
+    """
+    if settings.FLOW_STATUS_BACKEND != "sharded":
+        return [settings.FLOW_STATUS_DB]
+    base, ext = os.path.splitext(settings.FLOW_STATUS_DB)
+    return [f"{base}.shard{n}{ext or '.db'}" for n in range(settings.FLOW_STATUS_SHARDS)]
+
+
+_flow_stores: Optional[StoreGroup] = None
+
+
+def flow_stores() -> StoreGroup:
+    """
+    StoreGroup compartilhado dos fluxos (criado na primeira chamada, na importação dos módulos)
+    """
+    global _flow_stores
+    if _flow_stores is None:
+        _flow_stores = StoreGroup([get_store(path) for path in flow_store_paths()])
+    return _flow_stores
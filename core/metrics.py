@@ -0,0 +1,211 @@
+import asyncio
+import bisect
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Limites (segundos) dos buckets: de 0,5 ms a 1 min
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """
+    Contador monotônico por combinação de rótulos
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.label_names, values)} {_number(total)}"
+            for values, total in sorted(self._values.items())
+        ]
+
+
+class Histogram:
+    """
+    Histograma de buckets fixos por combinação de rótulos.
+
+    `observe` custa uma busca binária e dois incrementos; os acumulados do
+    formato Prometheus só são calculados na exportação.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._le = [f'le="{_number(bound)}"' for bound in self.buckets] + ['le="+Inf"']
+        # rótulos -> [contagem por bucket (+Inf por último), soma]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        # bucket `le`: primeiro limite >= valor
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    @contextmanager
+    def time(self, *label_values: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = []
+        for values, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for le, count in zip(self._le, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, values)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, values)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Métricas do processo. Tudo roda no loop asyncio (uma thread), então não há locks.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica já registrada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """
+        Exposição no formato texto do Prometheus (0.0.4)
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Métricas compartilhadas por API e worker (cada processo exporta as suas)
+handler_duration = registry.histogram(
+    "handler_duration_seconds", "Duração do processamento de uma mensagem pelo consumer", ("topic",),
+)
+queue_delay = registry.histogram(
+    "queue_delay_seconds", "Tempo entre a publicação da mensagem e o início do consumer", ("topic",),
+)
+publish_latency = registry.histogram(
+    "publish_latency_seconds", "Duração da publicação no broker", ("topic",),
+)
+read_model_latency = registry.histogram(
+    "read_model_latency_seconds", "Duração das chamadas ao read model de fluxos", ("op",),
+)
+flow_status_transitions = registry.counter(
+    "flow_status_transitions_total", "Gravações de status no read model (a saga regrava o status que o consumer já gravou)", ("status",),
+)
+flow_counter_drift = registry.counter(
+    "flow_counter_drift_total", "Chaves dos contadores do painel corrigidas pela reconciliação", ("kind",),
+)
+
+
+class MetricsServer:
+    """
+    Servidor HTTP mínimo do worker: responde GET /metrics com `registry.render()`.
+    Uma requisição por conexão, sem keep-alive; é só para o scrape do Prometheus.
+    """
+
+    def __init__(self, registry: Registry):
+        self._registry = registry
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def port(self) -> Optional[int]:
+        if self._server is None or not self._server.sockets:
+            return None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self, host: str, port: int):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        logger.info("[Metrics] Exportando métricas em http://%s:%d/metrics", host, self.port)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5.0)
+            # descarta os headers da requisição
+            while (await asyncio.wait_for(reader.readline(), 5.0)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, content_type, body = "200 OK", CONTENT_TYPE, self._registry.render().encode("utf-8")
+            else:
+                status, content_type, body = "404 Not Found", "text/plain; charset=utf-8", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+metrics_server = MetricsServer(registry)
@@ -0,0 +1,14 @@
+# tests/conftest.py
+"""
+Os módulos da aplicação leem as settings e abrem os stores na importação: os
+arquivos de dados apontam para um diretório temporário antes de qualquer import.
+"""
+import os
+import tempfile
+
+_DATA_DIR = tempfile.mkdtemp(prefix="event-driven-app-tests-")
+
+os.environ.setdefault("FLOW_STATUS_DB", os.path.join(_DATA_DIR, "flow_status.db"))
+os.environ.setdefault("EVENT_LOG_DIR", os.path.join(_DATA_DIR, "eventlog"))
+os.environ.setdefault("FLOW_SNAPSHOT_DIR", os.path.join(_DATA_DIR, "snapshots"))
+os.environ.setdefault("FLOW_ARCHIVE_DIR", os.path.join(_DATA_DIR, "archive"))
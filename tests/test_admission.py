@@ -0,0 +1,86 @@
+# tests/test_admission.py
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from apps.api.routes import checkin
+from apps.api.utils.admission import AdmissionController
+from tests.test_checkin_idempotency import CHECKIN, FakePublisher
+
+
+def _controller(**overrides) -> AdmissionController:
+    options = dict(rate=1.0, burst=10, max_clients=100, max_inflight=0, inflight_ttl_s=60, retry_after_max_s=30)
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+def test_client_rate_is_off_by_default():
+    assert checkin.settings.ADMISSION_CLIENT_RATE == 0
+    controller = _controller(rate=checkin.settings.ADMISSION_CLIENT_RATE)
+    assert all(controller.check("gateway", 500, now=0.0) is None for _ in range(10))
+
+
+def test_batch_debt_is_capped_at_one_burst():
+    controller = _controller()
+    assert controller.check("gateway", 500, now=0.0) is None
+
+    rejection = controller.check("gateway", 1, now=0.0)
+    assert rejection.reason == "rate"
+    # saldo em -10: 11 s até o próximo check-in, não ~490 s
+    assert rejection.retry_after_s == 11
+    assert controller.check("gateway", 1, now=11.0) is None
+
+
+def test_rejection_consumes_nothing():
+    controller = _controller(burst=2)
+    assert controller.check("a", 2, now=0.0) is None
+    assert controller.check("a", 1, now=0.5) is not None
+    assert controller.check("a", 1, now=1.0) is None
+
+
+@pytest.fixture
+def api(monkeypatch):
+    controller = _controller(burst=3, rate=0.001)
+    monkeypatch.setattr(checkin, "admission", controller)
+    publisher = FakePublisher()
+    app = FastAPI()
+    app.include_router(checkin.router, prefix="/api")
+    app.dependency_overrides[checkin.get_publisher] = lambda: publisher
+
+    def post(path, body):
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post(path, json=body, headers={"X-Client-Id": "gateway"})
+        return asyncio.run(scenario())
+
+    return post, publisher
+
+
+def test_invalid_submissions_do_not_consume_quota(api):
+    post, publisher = api
+    unsafe = {**CHECKIN, "securityChecks": {**CHECKIN["securityChecks"], "doors": False}}
+    for _ in range(5):
+        assert post("/api/submeterCheckin", unsafe).json()["success"] is False
+    assert post("/api/submeterCheckin", {**CHECKIN, "cpf": "1"}).status_code == 422
+
+    assert post("/api/submeterCheckin", CHECKIN).status_code == 200
+    assert len(publisher.published) == 1
+
+
+def test_batch_is_charged_only_for_valid_items(api):
+    post, publisher = api
+    items = [CHECKIN, {**CHECKIN, "cpf": "1"}, {**CHECKIN, "licensePlate": ""}, CHECKIN]
+    response = post("/api/submeterCheckinLote", {"items": items})
+
+    body = response.json()
+    assert response.status_code == 200
+    assert (body["accepted"], body["rejected"]) == (2, 2)
+    assert [r["success"] for r in body["results"]] == [True, False, False, True]
+    assert [r["index"] for r in body["results"]] == [0, 1, 2, 3]
+    # cota de 3: sobrou um check-in
+    assert post("/api/submeterCheckin", CHECKIN).status_code == 200
+    assert post("/api/submeterCheckin", CHECKIN).status_code == 429
+    assert len(publisher.published) == 3
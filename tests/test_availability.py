@@ -0,0 +1,41 @@
+# tests/test_availability.py
+import asyncio
+import uuid
+
+import httpx
+from fastapi import FastAPI
+
+from apps.api.routes import vagas
+from apps.stream.inventory.availability import Availability, AvailabilitySnapshots
+from apps.stream.inventory.spot_inventory import SpotInventory
+from apps.stream.read_models.availability_repo import get_snapshot
+
+
+def test_unknown_category_gets_no_snapshot():
+    snapshots = AvailabilitySnapshots(SpotInventory.from_layout(1, ["moto"], 3), limit=10, interval_s=0)
+    category = f"foguete-{uuid.uuid4().hex[:8]}"
+
+    async def scenario():
+        await snapshots.warm_up()
+        known = await snapshots.current("Moto")
+        unknown = await snapshots.current(category)
+        return known, unknown, await get_snapshot(category)
+
+    known, unknown, stored = asyncio.run(scenario())
+    assert known.version >= 1 and known.total == 3
+    assert unknown == Availability(0, 0)
+    assert stored is None
+    assert snapshots.snapshots == 1
+
+
+def test_consultar_vagas_rejects_unknown_category():
+    app = FastAPI()
+    app.include_router(vagas.router, prefix="/api")
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            params = {"checkInId": str(uuid.uuid4()), "vehicleCategory": "foguete"}
+            return await client.get("/api/consultar-vagas", params=params)
+
+    assert asyncio.run(scenario()).status_code == 404
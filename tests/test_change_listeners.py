@@ -0,0 +1,30 @@
+# tests/test_change_listeners.py
+import asyncio
+import uuid
+
+from apps.stream.read_models import flow_status_repo
+from apps.stream.read_models.flow_status_repo import FlowPatch
+
+
+def test_failing_listener_does_not_fail_a_committed_transition(monkeypatch):
+    notified = []
+
+    async def broker_down(check_in_id, status, version, patch):
+        raise ConnectionError("broker indisponível")
+
+    async def recorder(check_in_id, status, version, patch):
+        notified.append((check_in_id, status, version))
+
+    monkeypatch.setattr(flow_status_repo, "_listeners", [broker_down, recorder])
+    single, batched = str(uuid.uuid4()), str(uuid.uuid4())
+
+    async def scenario():
+        version = await flow_status_repo.patch_status(single, "checkin_submitted", {"vehicleCategory": "carro"})
+        results = await flow_status_repo.patch_status_many([FlowPatch(batched, "checkin_submitted", {})])
+        return version, results, await flow_status_repo.get_status(single)
+
+    version, results, stored = asyncio.run(scenario())
+    assert version == 1 and results == [1]
+    assert stored["status"] == "checkin_submitted"
+    # os demais ouvintes continuam sendo chamados
+    assert notified == [(single, "checkin_submitted", 1), (batched, "checkin_submitted", 1)]
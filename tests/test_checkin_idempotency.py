@@ -0,0 +1,109 @@
+# tests/test_checkin_idempotency.py
+import asyncio
+import time
+import uuid
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from apps.api.routes import checkin
+from apps.api.utils import idempotency
+from apps.api.utils.admission import AdmissionController
+
+CHECKIN = {
+    "vehicleCategory": "carro",
+    "cpf": "123.456.789-00",
+    "phone": "(11) 99999-9999",
+    "licensePlate": "ABC-1234",
+    "securityChecks": {"doors": True, "windows": True, "handbrake": True, "seatbelt": True, "mirrors": True},
+    "termsAccepted": True,
+}
+
+
+class FakePublisher:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, payload, routing_key):
+        self.published.append((routing_key, payload))
+
+
+@pytest.fixture
+def publisher(monkeypatch):
+    # cota de um check-in por cliente, sem reposição durante o teste
+    monkeypatch.setattr(checkin, "admission", AdmissionController(
+        rate=0.001, burst=1, max_clients=100, max_inflight=0, inflight_ttl_s=60, retry_after_max_s=30,
+    ))
+    return FakePublisher()
+
+
+def _post(publisher, *requests):
+    app = FastAPI()
+    app.include_router(checkin.router, prefix="/api")
+    app.dependency_overrides[checkin.get_publisher] = lambda: publisher
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.post("/api/submeterCheckin", json=body, headers=headers) for body, headers in requests]
+
+    return asyncio.run(scenario())
+
+
+def test_retry_with_accepted_key_is_replayed_before_admission(publisher):
+    key = {"Idempotency-Key": str(uuid.uuid4()), "X-Client-Id": "totem-1"}
+    first, retry, other = _post(publisher, (CHECKIN, key), (CHECKIN, key), (CHECKIN, {"X-Client-Id": "totem-1"}))
+
+    assert first.status_code == 200
+    assert retry.status_code == 200
+    assert retry.json()["data"]["checkInId"] == first.json()["data"]["checkInId"]
+    assert len(publisher.published) == 1
+    # a cota do cliente foi gasta só pela primeira submissão
+    assert other.status_code == 429
+
+
+def test_key_reused_with_other_payload_is_rejected(publisher):
+    key = {"Idempotency-Key": str(uuid.uuid4())}
+    first, reused = _post(publisher, (CHECKIN, key), ({**CHECKIN, "licensePlate": "XYZ-9876"}, key))
+
+    assert first.status_code == 200
+    assert reused.status_code == 422
+
+
+def test_expired_key_opens_a_new_flow(publisher, monkeypatch):
+    key = str(uuid.uuid4())
+    fingerprint = idempotency.request_fingerprint(checkin.VehicleCheckInData.model_validate(CHECKIN).model_dump())
+    old = str(uuid.uuid4())
+    stale_at = time.time() - idempotency.settings.IDEMPOTENCY_KEY_TTL_S - 1
+    idempotency._store.write_sync(
+        lambda conn: conn.execute(
+            "INSERT INTO idempotency_keys (idem_key, check_in_id, fingerprint, created_at) VALUES (?, ?, ?, ?)",
+            (key, old, fingerprint, stale_at),
+        )
+    )
+
+    (response,) = _post(publisher, (CHECKIN, {"Idempotency-Key": key}))
+
+    assert response.json()["message"] == "Check-in submetido com sucesso"
+    assert response.json()["data"]["checkInId"] != old
+    assert len(publisher.published) == 1
+
+
+def test_pruner_removes_only_expired_keys():
+    now = time.time()
+    prefix = str(uuid.uuid4())
+    rows = [(f"{prefix}-old-{n}", str(uuid.uuid4()), "fp", now - 7200) for n in range(5)]
+    rows.append((f"{prefix}-new", str(uuid.uuid4()), "fp", now))
+    idempotency._store.write_sync(
+        lambda conn: conn.executemany(
+            "INSERT INTO idempotency_keys (idem_key, check_in_id, fingerprint, created_at) VALUES (?, ?, ?, ?)", rows,
+        )
+    )
+    pruner = idempotency.ExpiredKeyPruner(idempotency._store, retention_s=3600, interval_s=0, batch=2)
+
+    assert asyncio.run(pruner.prune()) >= 5
+    left = idempotency._store.read_sync(
+        lambda conn: [r[0] for r in conn.execute("SELECT idem_key FROM idempotency_keys WHERE idem_key LIKE ?", (f"{prefix}%",))]
+    )
+    assert left == [f"{prefix}-new"]
@@ -0,0 +1,68 @@
+# tests/test_dedup.py
+import asyncio
+import time
+
+from core.db import get_store
+from apps.stream.messaging.dedup import ProcessedEventIndex
+
+
+def _index(tmp_path, **kwargs):
+    options = {"capacity": 100, "fp_rate": 0.01, "retention_s": 3600, "prune_batch": 2, **kwargs}
+    return ProcessedEventIndex(get_store(str(tmp_path / "dedup.db")), **options)
+
+
+def test_periodic_prune_removes_records_out_of_retention(tmp_path):
+    index = _index(tmp_path, prune_interval_s=0.01)
+    stale = time.time() - 7200
+    index._store.write_sync(lambda conn: conn.executemany(
+        "INSERT INTO processed_events (event_key, processed_at) VALUES (?, ?)",
+        [(f"t:old-{n}", stale) for n in range(5)],
+    ))
+
+    async def scenario():
+        await index.start()
+        try:
+            await index.mark("t:fresh")
+            # registros antigos gravados depois da subida: só a tarefa periódica os remove
+            index._store.write_sync(lambda conn: conn.execute(
+                "INSERT INTO processed_events (event_key, processed_at) VALUES ('t:late', ?)", (stale,),
+            ))
+            await asyncio.sleep(0.1)
+        finally:
+            await index.stop()
+        return index._store.read_sync(lambda conn: [r[0] for r in conn.execute("SELECT event_key FROM processed_events")])
+
+    assert asyncio.run(scenario()) == ["t:fresh"]
+
+
+def test_events_from_dropped_generations_are_still_detected(tmp_path):
+    # 50 eventos dentro da retenção para 3 gerações de 10: as mais antigas são descartadas antes da hora
+    index = _index(tmp_path, capacity=10, generations=3)
+
+    async def scenario():
+        await index.start()
+        for n in range(50):
+            await index.mark(f"t:{n}")
+        seen = [await index.seen(f"t:{n}") for n in range(50)]
+        # reinício: só as gerações que cabem voltam ao filtro
+        restarted = _index(tmp_path, capacity=10, generations=3)
+        await restarted.start()
+        return seen, await restarted.seen("t:0"), await restarted.seen("t:unknown")
+
+    seen, after_restart, unknown = asyncio.run(scenario())
+    assert all(seen)
+    assert after_restart
+    assert not unknown
+
+
+def test_generations_out_of_retention_leave_without_disk_fallback(tmp_path):
+    index = _index(tmp_path, capacity=10, generations=2)
+    now = time.time()
+    for n in range(10):
+        index._remember(f"t:old-{n}", now - 7200)
+    for n in range(15):
+        index._remember(f"t:new-{n}", now)
+
+    assert asyncio.run(index.seen("t:unknown")) is False
+    # a geração antiga saiu por idade: a resposta negativa não foi ao disco
+    assert index.filter_negatives == 1 and index.disk_lookups == 0
@@ -0,0 +1,41 @@
+# tests/test_event_log.py
+import asyncio
+import uuid
+
+from faststream.rabbit import RabbitBroker, TestRabbitBroker
+
+from apps.stream.messaging.event_log import EventLogMiddleware, event_log
+from apps.stream.messaging.partitioning import SUBSCRIBED_TOPICS
+
+
+def _logged(topic, event_id):
+    return [r for r in event_log.read(0, None, topic) if r.event().get("eventId") == event_id]
+
+
+def test_failed_delivery_is_logged_once_after_success(monkeypatch):
+    topic = f"test.event-log.{uuid.uuid4().hex}.v1"
+    # como partitioned_subscriber: tópico consumido neste processo, gravado só no consumo
+    monkeypatch.setattr("apps.stream.messaging.event_log.SUBSCRIBED_TOPICS", SUBSCRIBED_TOPICS | {topic})
+    broker = RabbitBroker(middlewares=[EventLogMiddleware])
+    attempts = []
+
+    @broker.subscriber(topic)
+    async def handler(msg: dict):
+        attempts.append(msg["eventId"])
+        if len(attempts) == 1:
+            raise RuntimeError("falha transitória")
+
+    async def scenario():
+        event = {"checkInId": str(uuid.uuid4()), "eventId": str(uuid.uuid4())}
+        async with TestRabbitBroker(broker) as br:
+            try:
+                await br.publish(event, routing_key=topic)
+            except RuntimeError:
+                pass
+            assert _logged(topic, event["eventId"]) == []
+            # reentrega
+            await br.publish(event, routing_key=topic)
+        assert len(attempts) == 2
+        assert len(_logged(topic, event["eventId"])) == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,162 @@
+# tests/test_flow_cache.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from apps.api.utils import flow_cache as flow_cache_module
+from apps.api.utils.flow_cache import FlowStatusCache
+
+
+class FakeReadModel:
+    """
+    Loader com status por checkInId; `gate` segura a próxima leitura até ser liberado
+    """
+
+    def __init__(self):
+        self.flows = {}
+        self.loads = 0
+        self.gate = None
+        self.started = asyncio.Event()
+
+    async def load(self, check_in_id):
+        self.loads += 1
+        snapshot = dict(self.flows[check_in_id]) if check_in_id in self.flows else None
+        if self.gate is not None:
+            self.started.set()
+            await self.gate.wait()
+        return snapshot
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # só o relógio do cache: o do event loop continua o real
+    now = [1000.0]
+    monkeypatch.setattr(flow_cache_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_hit_after_first_read():
+    async def scenario():
+        model = FakeReadModel()
+        model.flows["a"] = {"status": "checkin_submitted", "version": 1}
+        cache = FlowStatusCache(model.load, max_entries=10, ttl_s=60)
+
+        assert (await cache.get("a"))["version"] == 1
+        assert (await cache.get("a"))["version"] == 1
+        assert model.loads == 1
+        assert cache.stats()["hits"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_invalidate_then_read_returns_new_transition():
+    async def scenario():
+        model = FakeReadModel()
+        model.flows["a"] = {"status": "checkin_submitted", "version": 1}
+        cache = FlowStatusCache(model.load, max_entries=10, ttl_s=60)
+        await cache.get("a")
+
+        model.flows["a"] = {"status": "spots_consulted", "version": 2}
+        cache.invalidate("a")
+
+        assert (await cache.get("a"))["status"] == "spots_consulted"
+        assert model.loads == 2
+        assert cache.stats()["invalidations"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_invalidation_during_load_does_not_store_stale_value():
+    async def scenario():
+        model = FakeReadModel()
+        model.flows["a"] = {"status": "checkin_submitted", "version": 1}
+        cache = FlowStatusCache(model.load, max_entries=10, ttl_s=60)
+
+        model.gate = asyncio.Event()
+        reader = asyncio.create_task(cache.get("a"))
+        await model.started.wait()
+        # a transição é gravada e notificada enquanto a leitura antiga está em voo
+        model.flows["a"] = {"status": "spots_consulted", "version": 2}
+        cache.invalidate("a")
+        model.gate.set()
+
+        # quem já esperava recebe o valor que leu, mas ele não fica no cache
+        assert (await reader)["version"] == 1
+        assert len(cache) == 0
+
+        model.gate = None
+        assert (await cache.get("a"))["version"] == 2
+        assert (await cache.get("a"))["version"] == 2
+        assert model.loads == 2
+
+    asyncio.run(scenario())
+
+
+def test_load_started_after_invalidation_is_stored():
+    async def scenario():
+        model = FakeReadModel()
+        model.flows["a"] = {"status": "checkin_submitted", "version": 1}
+        cache = FlowStatusCache(model.load, max_entries=10, ttl_s=60)
+
+        cache.invalidate("a")
+        await cache.get("a")
+        await cache.get("a")
+        assert model.loads == 1
+
+    asyncio.run(scenario())
+
+
+def test_ttl_expiry_reloads(clock):
+    async def scenario():
+        model = FakeReadModel()
+        model.flows["a"] = {"status": "checkin_submitted", "version": 1}
+        cache = FlowStatusCache(model.load, max_entries=10, ttl_s=5)
+        await cache.get("a")
+
+        # notificação perdida: só o TTL traz a transição
+        model.flows["a"] = {"status": "spots_consulted", "version": 2}
+        clock[0] += 4.9
+        assert (await cache.get("a"))["version"] == 1
+
+        clock[0] += 0.2
+        assert (await cache.get("a"))["version"] == 2
+        assert model.loads == 2
+        assert cache.stats()["expirations"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_views_are_dropped_with_the_entry():
+    async def scenario():
+        model = FakeReadModel()
+        model.flows["a"] = {"status": "checkin_submitted", "version": 1}
+        cache = FlowStatusCache(model.load, max_entries=10, ttl_s=60)
+
+        assert await cache.view("a", "status", lambda s: s["status"]) == "checkin_submitted"
+        model.flows["a"] = {"status": "spots_consulted", "version": 2}
+        cache.invalidate("a")
+        assert await cache.view("a", "status", lambda s: s["status"]) == "spots_consulted"
+
+    asyncio.run(scenario())
+
+
+def test_lru_eviction():
+    async def scenario():
+        model = FakeReadModel()
+        for cid in "abc":
+            model.flows[cid] = {"status": "checkin_submitted", "version": 1}
+        cache = FlowStatusCache(model.load, max_entries=2, ttl_s=60)
+
+        await cache.get("a")
+        await cache.get("b")
+        await cache.get("a")  # "b" passa a ser o menos usado
+        await cache.get("c")
+
+        assert cache.stats()["evictions"] == 1
+        await cache.get("a")
+        assert model.loads == 3
+        await cache.get("b")
+        assert model.loads == 4
+
+    asyncio.run(scenario())
@@ -0,0 +1,82 @@
+# tests/test_outbox_crash.py
+import asyncio
+import os
+import subprocess
+import sys
+import textwrap
+import uuid
+
+from faststream.rabbit import RabbitBroker, TestRabbitBroker
+
+from apps.stream.messaging import outbox
+from apps.stream.messaging.outbox import relay
+from apps.stream.read_models import flow_status_repo
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# grava o estado e a mensagem na mesma transação e morre antes de o relay publicar
+CRASH_AFTER_COMMIT = textwrap.dedent("""
+    import asyncio, os, sys
+    from apps.stream.messaging.outbox import OutgoingMessage
+    from apps.stream.read_models import flow_status_repo
+
+    async def main(cid, topic):
+        await flow_status_repo.patch_status(
+            cid, "checkin_submitted", {"vehicleCategory": "carro"}, expected_version=0,
+            outbox=[OutgoingMessage(topic, {"checkInId": cid, "eventId": cid})],
+        )
+        os._exit(9)
+
+    asyncio.run(main(*sys.argv[1:]))
+""")
+
+
+async def _deliveries(topic, until):
+    broker = RabbitBroker()
+    received = []
+
+    @broker.subscriber(topic)
+    async def handler(msg: dict):
+        received.append(msg["checkInId"])
+
+    async with TestRabbitBroker(broker) as br:
+        await relay.start(br)
+        try:
+            for _ in range(200):
+                if until(received):
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await relay.stop()
+    return received
+
+
+def test_message_committed_before_a_crash_is_delivered_after_restart():
+    cid, topic = str(uuid.uuid4()), f"test.outbox.{uuid.uuid4().hex}.v1"
+    proc = subprocess.run([sys.executable, "-c", CRASH_AFTER_COMMIT, cid, topic], cwd=ROOT, env=os.environ.copy())
+    assert proc.returncode == 9
+
+    # "reinício": o estado ficou gravado e o relay deste processo entrega a mensagem pendente
+    assert asyncio.run(flow_status_repo.get_status(cid))["status"] == "checkin_submitted"
+    assert asyncio.run(_deliveries(topic, lambda received: cid in received)) == [cid]
+
+
+def test_relay_keeps_running_after_a_failed_round(monkeypatch):
+    cid, topic = str(uuid.uuid4()), f"test.outbox.{uuid.uuid4().hex}.v1"
+    due, calls = outbox._due, []
+
+    def flaky_due(*args):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        return due(*args)
+
+    monkeypatch.setattr(outbox, "_due", flaky_due)
+    monkeypatch.setattr(outbox, "RETRY_DELAY_S", 0.01)
+
+    async def scenario():
+        await relay.enqueue([outbox.OutgoingMessage(topic, {"checkInId": cid, "eventId": cid})])
+        return await _deliveries(topic, lambda received: cid in received)
+
+    assert asyncio.run(scenario()) == [cid]
+    assert len(calls) >= 2
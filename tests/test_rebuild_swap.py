@@ -0,0 +1,53 @@
+# tests/test_rebuild_swap.py
+import sqlite3
+
+from apps.stream.read_models.backends import HOT_COLUMNS, create_flow_status_table
+from apps.stream.read_models.rebuild import FLOW_COLUMNS, _swap_into
+
+INSERT = f"INSERT INTO flow_status ({FLOW_COLUMNS}) VALUES ({', '.join('?' * (6 + len(HOT_COLUMNS)))})"
+
+
+def _row(cid, status, version, updated_ms):
+    return (cid, status, "{}", str(updated_ms), version, updated_ms, "carro", None, None, None, None)
+
+
+def _db(path, rows):
+    conn = sqlite3.connect(path)
+    create_flow_status_table(conn)
+    conn.executemany(INSERT, rows)
+    conn.commit()
+    conn.close()
+
+
+def _flows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {cid: (status, version) for cid, status, version in conn.execute("SELECT check_in_id, status, version FROM flow_status")}
+    finally:
+        conn.close()
+
+
+def test_swap_keeps_live_rows_newer_than_the_snapshot(tmp_path):
+    live, snapshot = str(tmp_path / "live.db"), str(tmp_path / "snapshot.db")
+    _db(snapshot, [
+        _row("stale-live", "spot_reserved", 3, 2_000),
+        _row("newer-live", "spot_reserved", 3, 1_000),
+        _row("only-log", "completed", 5, 1_000),
+    ])
+    _db(live, [
+        _row("stale-live", "spots_consulted", 4, 1_500),
+        # transição gravada depois do corte do log
+        _row("newer-live", "robot_assigned", 4, 3_000),
+        # fluxo que o snapshot não conhece
+        _row("only-live", "checkin_submitted", 1, 3_000),
+    ])
+
+    _swap_into(live, snapshot)
+
+    assert _flows(live) == {
+        # o snapshot vale, sem regredir a versão
+        "stale-live": ("spot_reserved", 4),
+        "newer-live": ("robot_assigned", 4),
+        "only-log": ("completed", 5),
+        "only-live": ("checkin_submitted", 1),
+    }